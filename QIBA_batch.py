@@ -0,0 +1,428 @@
+# this package evaluates the calculated DRO data without the graphical user interface, for batch processing on computers without a display.
+# no wx module is imported. the figures are rendered with the non-interactive Agg backend of matplotlib, the results are exported to Excel and PDF.
+import getopt
+import os.path
+import sys
+import csv
+import json
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+import time
+import traceback
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from xlwt import Workbook
+
+import QIBA_functions
+import QIBA_model
+import QIBA_report
+import QIBA_cache
+import QIBA_database
+
+patchLen = 10
+
+def ProbeDimension(paths, nrOfHeadRows):
+    # the dimension [nrOfRows, nrOfColumns] of the patches to evaluate, probed from the headers of the reference files as the main windows do.
+    # nrOfHeadRows is the number of patch rows which are not evaluated (2 for GKM, 1 for T1)
+    agree, nrOfRow, nrOfColumn = QIBA_functions.ProbeGrid(paths, patchLen)
+    if not agree:
+        raise ValueError('The dimensions of the reference files do not agree.')
+    if not (nrOfRow and nrOfColumn):
+        raise ValueError('The dimension of the reference files can not be read from their headers, please give the dimension.')
+    return [nrOfRow - nrOfHeadRows, nrOfColumn]
+
+def GenerateModel(mode, calFiles, refFiles, dimension = None, memoryMap = False, bandSize = 0):
+    # create the model of the mode ('GKM' or 'T1'). for GKM the calculated and reference files are given as 'Ktrans,Ve', as on the command line.
+    # with memoryMap, the binary files are mapped instead of being read into memory, and the model is evaluated in bands.
+    # bandSize is the number of patch rows in a band, a band size maps the files as well.
+    if mode == 'GKM':
+        path_ref_K, path_ref_V = refFiles.split(',')
+        path_cal_K, path_cal_V = calFiles.split(',')
+        if dimension is None:
+            dimension = ProbeDimension([path_ref_K, path_ref_V], 2)
+        return QIBA_model.Model_KV(path_ref_K, path_ref_V, path_cal_K, path_cal_V, dimension, memoryMap = memoryMap, bandSize = bandSize)
+    elif mode == 'T1':
+        if dimension is None:
+            dimension = ProbeDimension([refFiles], 1)
+        return QIBA_model.Model_T1(refFiles, calFiles, dimension, memoryMap = memoryMap, bandSize = bandSize)
+    else:
+        raise ValueError('Unknown mode: ' + str(mode))
+
+def NewFigure(width = 16, height = 9):
+    # a figure drawn on an Agg canvas, which needs no display
+    figure = Figure(figsize = (width, height))
+    FigureCanvasAgg(figure)
+    return figure
+
+def SaveFigures(model, mode, saveDir):
+    # render the figures of the evaluated model into png files, with the names of the files exported by the main windows.
+    # return the paths of the figures by name, for the html report.
+    if mode == 'GKM':
+        figures = {'maps': NewFigure(), 'scatters': NewFigure(), 'hist_K': NewFigure(), 'hist_V': NewFigure(), 'LoA_K': NewFigure(), 'LoA_V': NewFigure(), 'boxplot': NewFigure()}
+        QIBA_report.DrawHistograms([figures['hist_K'], figures['hist_V']], model, mode)
+        QIBA_report.DrawBlandAltmanPlots([figures['LoA_K'], figures['LoA_V']], model)
+    else:
+        figures = {'maps': NewFigure(), 'scatters': NewFigure(), 'histogram': NewFigure(24, 6), 'boxplot': NewFigure(24, 6)}
+        QIBA_report.DrawHistograms([figures['histogram']], model, mode)
+    QIBA_report.DrawMaps(figures['maps'], model, mode)
+    QIBA_report.DrawScatter(figures['scatters'], model, mode)
+    QIBA_report.DrawBoxPlot(figures['boxplot'], model, mode)
+
+    paths = {}
+    for name, figure in figures.items():
+        paths[name] = os.path.join(saveDir, name + '.png')
+        figure.savefig(paths[name])
+    return paths
+
+def ExportToExcel(model, mode, savePath):
+    # export the result tables of the evaluated model to an Excel file
+    nrOfRow, nrOfColumn = model.nrOfRows, model.nrOfColumns
+    book = Workbook()
+    if mode == 'GKM':
+        sheetNaN = book.add_sheet('NaN percentage')
+        sheetMean = book.add_sheet('Mean')
+        sheetStd = book.add_sheet('Standard deviation')
+        sheetMedian = book.add_sheet('Median')
+        sheet1Qtl = book.add_sheet('1st quartiel')
+        sheet3Qtl = book.add_sheet('3rd quartiel')
+        sheetMin = book.add_sheet('Minimum')
+        sheetMax = book.add_sheet('Maximum')
+        sheetCov = book.add_sheet('Covariance')
+        sheetCor = book.add_sheet('Correlation')
+        sheetRMS = book.add_sheet('RMS')
+        sheetCCC = book.add_sheet('CCC')
+        sheetFit = book.add_sheet('Model fitting')
+        sheetT = book.add_sheet('T-test results')
+        sheetU = book.add_sheet('U-test results')
+        sheetChiq = book.add_sheet('Chi-square test results')
+        sheetA = book.add_sheet('ANOVA results')
+
+        QIBA_functions.WriteToExcelSheet_GKM_percentage(sheetNaN, model.headersHorizontal, model.headersVertical, [model.Ktrans_NaN_percentage, model.Ve_NaN_percentage], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        for sheet, name in ((sheetMean, 'mean'), (sheetStd, 'deviation'), (sheetMedian, 'median'), (sheet1Qtl, '1stQuartile'), (sheet3Qtl, '3rdQuartile'), (sheetMin, 'min'), (sheetMax, 'max')):
+            QIBA_functions.WriteToExcelSheet_GKM_statistics(sheet, model.headersHorizontal, model.headersVertical, [getattr(model, 'Ktrans_cal_patch_' + name), getattr(model, 'Ve_cal_patch_' + name)], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_co(sheetCor, model.headersHorizontal, model.headersVertical, [model.corr_KK, model.corr_KV, model.corr_VK, model.corr_VV], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_co(sheetCov, model.headersHorizontal, model.headersVertical, [model.cov_KK, model.cov_KV, model.cov_VK, model.cov_VV], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetCCC, model.headersHorizontal, model.headersVertical, [model.Ktrans_ccc, model.Ve_ccc], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetRMS, model.headersHorizontal, model.headersVertical, [model.Ktrans_rms, model.Ve_rms], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_fit(sheetFit, model.headersHorizontal, model.headersVertical, [model.a_lin_Ktrans, model.b_lin_Ktrans, model.r_squared_lin_K, model.a_log_Ktrans, model.b_log_Ktrans, model.a_lin_Ve, model.b_lin_Ve, model.r_squared_lin_V, model.a_log_Ve, model.b_log_Ve], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_test(sheetT, model.headersHorizontal, model.headersVertical, [model.Ktrans_cal_patch_ttest_t, model.Ktrans_cal_patch_ttest_p, model.Ve_cal_patch_ttest_t, model.Ve_cal_patch_ttest_p], int(nrOfColumn/2), nrOfRow, nrOfColumn, 'T-statistics')
+        QIBA_functions.WriteToExcelSheet_GKM_test(sheetU, model.headersHorizontal, model.headersVertical, [model.Ktrans_cal_patch_Utest_u, model.Ktrans_cal_patch_Utest_p, model.Ve_cal_patch_Utest_u, model.Ve_cal_patch_Utest_p], int(nrOfColumn/2), nrOfRow, nrOfColumn, 'U-value')
+        QIBA_functions.WriteToExcelSheet_GKM_A(sheetA, model.headersHorizontal, model.headersVertical, [model.Ktrans_cal_patch_ANOVA_f, model.Ktrans_cal_patch_ANOVA_p, model.Ve_cal_patch_ANOVA_f, model.Ve_cal_patch_ANOVA_p], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_GKM_test(sheetChiq, model.headersHorizontal, model.headersVertical, [model.Ktrans_cal_patch_Chisquare_c, model.Ktrans_cal_patch_Chisquare_p, model.Ve_cal_patch_Chisquare_c, model.Ve_cal_patch_Chisquare_p], int(nrOfColumn/2), nrOfRow, nrOfColumn, 'Chiq')
+    else:
+        sheetNaN = book.add_sheet('NaN percentage')
+        sheetMean = book.add_sheet('Mean')
+        sheetStd = book.add_sheet('Standard deviation')
+        sheetMedian = book.add_sheet('Median')
+        sheet1Qtl = book.add_sheet('1st quartiel')
+        sheet3Qtl = book.add_sheet('3rd quartiel')
+        sheetMin = book.add_sheet('Minimum')
+        sheetMax = book.add_sheet('Maximum')
+        sheetCov = book.add_sheet('Covariance')
+        sheetCor = book.add_sheet('Correlation')
+        sheetCCC = book.add_sheet('CCC')
+        sheetFit = book.add_sheet('Model fitting')
+        sheetT = book.add_sheet('T-test results')
+        sheetU = book.add_sheet('U-test results')
+        sheetChiq = book.add_sheet('Chi-square-test results')
+
+        QIBA_functions.WriteToExcelSheet_T1_percentage(sheetNaN, model.headersHorizontal, model.headersVertical, [model.T1_NaN_percentage], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        for sheet, name in ((sheetMean, 'mean'), (sheetStd, 'deviation'), (sheetMedian, 'median'), (sheet1Qtl, '1stQuartile'), (sheet3Qtl, '3rdQuartile'), (sheetMin, 'min'), (sheetMax, 'max')):
+            QIBA_functions.WriteToExcelSheet_T1_statistics(sheet, model.headersHorizontal, model.headersVertical, [getattr(model, 'T1_cal_patch_' + name)], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_T1_co(sheetCor, model.headersHorizontal, model.headersVertical, [model.corr_T1T1], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_T1_co(sheetCov, model.headersHorizontal, model.headersVertical, [model.cov_T1T1], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetCCC, model.headersHorizontal, model.headersVertical, [model.T1_ccc], int(nrOfColumn/2), nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_T1_fit(sheetFit, model.headersHorizontal, model.headersVertical, [model.a_lin_T1, model.b_lin_T1, model.r_squared_lin_T1, model.a_log_T1, model.b_log_T1], 1, nrOfRow, nrOfColumn)
+        QIBA_functions.WriteToExcelSheet_T1_test(sheetT, model.headersHorizontal, model.headersVertical, [model.T1_cal_patch_ttest_t, model.T1_cal_patch_ttest_p], int(nrOfColumn/2), nrOfRow, nrOfColumn, 'T-statistics')
+        QIBA_functions.WriteToExcelSheet_T1_test(sheetU, model.headersHorizontal, model.headersVertical, [model.T1_cal_patch_Utest_u, model.T1_cal_patch_Utest_p], int(nrOfColumn/2), nrOfRow, nrOfColumn, 'U-value')
+        QIBA_functions.WriteToExcelSheet_T1_test(sheetChiq, model.headersHorizontal, model.headersVertical, [model.T1_cal_patch_chisquare_c, model.T1_cal_patch_chisquare_p], int(nrOfColumn/2), nrOfRow, nrOfColumn, 'Chiq')
+    book.save(savePath)
+
+def WkhtmltopdfPath():
+    # the path of the html to pdf converter shipped in the folder 'tools'
+    if getattr(sys, 'frozen', False):
+        baseDir = os.path.dirname(sys.executable)
+    else:
+        baseDir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(baseDir, 'tools', 'wkhtmltopdf', 'bin', 'wkhtmltopdf')
+
+def ExportToPDF(html, htmlPath, savePath):
+    # convert the html document to a pdf file with wkhtmltopdf. return False if the converter is not available.
+    with open(htmlPath, 'w') as htmlFile:
+        htmlFile.write(html)
+    try:
+        return subprocess.call([WkhtmltopdfPath(), htmlPath, savePath]) == 0
+    except OSError:
+        return False
+
+def EvaluateHeadless(mode, calFiles, refFiles, desDir, dimension = None, nrOfWorkers = 1, resultCache = None, storePath = None, name = None, memoryMap = False, bandSize = 0):
+    '''
+    evaluate the calculated files against the reference files and export the results (results.xls, results.pdf and the figures) to the destination folder.
+    with a result cache (QIBA_cache.ResultCache), the results of an earlier evaluation of the same files are taken from the cache.
+    with storePath, the metrics are also stored in the SQLite result store (QIBA_database.ResultStore) as the submission of the name,
+    by default the name of the destination folder. with memoryMap, the binary files are mapped and evaluated in bands of bandSize patch rows.
+    return the evaluated model.
+    '''
+    if not os.path.isdir(desDir):
+        os.makedirs(desDir)
+    model = GenerateModel(mode, calFiles, refFiles, dimension, memoryMap, bandSize)
+    print 'files loaded...'
+    print 'start to evaluate...'
+    model.Evaluate(nrOfWorkers = nrOfWorkers, resultCache = resultCache)
+    print 'evaluation finished.'
+    print 'exporting result...'
+    figurePaths = SaveFigures(model, mode, desDir)
+    ExportToExcel(model, mode, os.path.join(desDir, 'results.xls'))
+    tempDir = tempfile.mkdtemp() # each evaluation has its own temporary folder, so that several evaluations can run at the same time
+    try:
+        if not ExportToPDF(QIBA_report.GetResultInHtml(model, mode, figurePaths), os.path.join(tempDir, 'results.html'), os.path.join(desDir, 'results.pdf')):
+            print 'wkhtmltopdf is not available, the PDF report is skipped.'
+    finally:
+        shutil.rmtree(tempDir, ignore_errors = True)
+    if storePath:
+        store = QIBA_database.ResultStore(storePath)
+        try:
+            store.Store(name or os.path.basename(os.path.normpath(desDir)), mode, model, calFiles, refFiles)
+        finally:
+            store.Close()
+    print 'results exported.'
+    return model
+
+def ReadManifest(manifestPath):
+    '''
+    read the submissions to evaluate from a manifest, in CSV (with a header line) or in JSON (a list of objects). each submission has the fields
+    'mode' ('GKM' or 'T1'), 'calculated' and 'reference' (the files, for GKM as 'Ktrans,Ve' or as a list) and 'destination', and optionally a 'name'.
+    relative paths are relative to the folder of the manifest.
+    '''
+    with open(manifestPath, 'rb') as manifestFile:
+        if os.path.splitext(manifestPath)[1].lower() == '.json':
+            entries = json.load(manifestFile)
+        else:
+            entries = list(csv.DictReader(manifestFile))
+
+    baseDir = os.path.dirname(os.path.abspath(manifestPath))
+    def ResolvePaths(paths):
+        if not isinstance(paths, list):
+            paths = paths.split(',')
+        return ','.join(os.path.join(baseDir, path.strip()) for path in paths)
+
+    submissions = []
+    for i, entry in enumerate(entries):
+        try:
+            submission = {'mode': entry['mode'].strip(),
+                          'calculated': ResolvePaths(entry['calculated']),
+                          'reference': ResolvePaths(entry['reference']),
+                          'destination': os.path.join(baseDir, entry['destination'].strip())}
+        except (KeyError, AttributeError):
+            raise ValueError('Submission ' + str(i + 1) + ' of the manifest needs the fields mode, calculated, reference and destination.')
+        submission['name'] = (entry.get('name') or '').strip() or os.path.basename(os.path.normpath(submission['destination']))
+        submission['index'] = i # the position in the manifest, as the submissions are finished in any order
+        submissions.append(submission)
+    return submissions
+
+def EvaluateSubmission(submission):
+    # evaluate one submission of a manifest in a worker process. the errors are caught, so that one bad submission does not stop the others.
+    # return the submission with its 'status' ('done' or 'failed'), the 'error' and the 'wallTime' in seconds.
+    result = dict(submission)
+    startTime = time.time()
+    try:
+        EvaluateHeadless(submission['mode'], submission['calculated'], submission['reference'], submission['destination'],
+                         resultCache = submission.get('resultCache'), storePath = submission.get('storePath'), name = submission['name'],
+                         memoryMap = submission.get('memoryMap', False), bandSize = submission.get('bandSize', 0), nrOfWorkers = submission.get('nrOfThreads', 1))
+        result['status'] = 'done'
+        result['error'] = ''
+    except Exception as error:
+        result['status'] = 'failed'
+        result['error'] = str(error) or traceback.format_exc().splitlines()[-1]
+    result['wallTime'] = time.time() - startTime
+    return result
+
+def WriteSummary(results, summaryPath):
+    # write the status and the wall time of each submission to a CSV file
+    with open(summaryPath, 'wb') as summaryFile:
+        writer = csv.writer(summaryFile)
+        writer.writerow(['name', 'mode', 'destination', 'status', 'wall time [s]', 'error'])
+        for result in results:
+            writer.writerow([result['name'], result['mode'], result['destination'], result['status'], '%.2f' % result['wallTime'], result['error']])
+
+def WriteFileAtomically(path, content):
+    # write the content to a temporary file next to the file and rename it, so that the file is either the old or the new one, never incomplete
+    tempPath = path + '.tmp'
+    with open(tempPath, 'wb') as tempFile:
+        tempFile.write(content)
+        tempFile.flush()
+        os.fsync(tempFile.fileno())
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path) # os.rename does not replace files on Windows. on POSIX the rename replaces the file atomically
+    os.rename(tempPath, path)
+
+class Journal():
+    '''
+    the journal of a batch run, which records for each submission of a manifest whether it is 'pending', 'done' or 'failed'.
+    it is saved after each finished submission, so that a run which is stopped can be resumed.
+    '''
+    def __init__(self, path):
+        # initializes the class, with the records of an earlier run if the journal exists
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as journalFile:
+                    self.records = json.load(journalFile)['submissions']
+            except (IOError, ValueError, KeyError, TypeError):
+                print 'The journal ' + path + ' can not be read, all submissions are evaluated again.'
+                self.records = {}
+
+    def Key(self, submission):
+        # the key of a submission in the journal: its mode, files and destination
+        return json.dumps([submission['mode'], submission['calculated'], submission['reference'], submission['destination']])
+
+    def Get(self, submission):
+        # return the record of the submission, or None if it is not in the journal
+        return self.records.get(self.Key(submission))
+
+    def Record(self, result):
+        # record the status of a submission
+        self.records[self.Key(result)] = {'name': result['name'], 'status': result['status'], 'error': result.get('error', ''),
+                                          'wallTime': result.get('wallTime', 0.0), 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    def Save(self):
+        # write the journal to its file
+        WriteFileAtomically(self.path, json.dumps({'submissions': self.records}, indent = 1, sort_keys = True))
+
+def EvaluateManifest(manifestPath, nrOfWorkers = None, summaryPath = None, journalPath = None, resultCache = None, storePath = None, memoryMap = False, bandSize = 0, nrOfThreads = 1):
+    '''
+    evaluate all the submissions of a manifest on a pool of processes, one submission per process at a time. the number of processes is the number
+    of CPUs unless it is given. the summary is written to summaryPath, by default 'summary.csv' next to the manifest. return the results.
+    the run is recorded in the journal at journalPath, by default next to the manifest. the submissions which are done in the journal are skipped,
+    so a run which is stopped or has failed submissions can be resumed by running it again. the result cache is shared by all the processes,
+    and with storePath the metrics of all the submissions are stored in one SQLite result store, by the names of the submissions.
+    with memoryMap, the binary files of the submissions are mapped and evaluated in bands of bandSize patch rows. each submission calculates its metrics
+    on nrOfThreads threads, 1 by default as the processes already keep the CPUs busy.
+    '''
+    submissions = ReadManifest(manifestPath)
+    if summaryPath is None:
+        summaryPath = os.path.join(os.path.dirname(os.path.abspath(manifestPath)), 'summary.csv')
+    if journalPath is None:
+        journalPath = os.path.splitext(os.path.abspath(manifestPath))[0] + '.journal.json'
+
+    journal = Journal(journalPath)
+    results = []
+    pending = []
+    for submission in submissions:
+        record = journal.Get(submission)
+        if record and record['status'] == 'done':
+            result = dict(submission)
+            result.update(status = 'done', error = '', wallTime = record['wallTime'])
+            results.append(result)
+        else:
+            journal.Record(dict(submission, status = 'pending'))
+            pending.append(dict(submission, resultCache = resultCache, storePath = storePath, memoryMap = memoryMap, bandSize = bandSize, nrOfThreads = nrOfThreads))
+    journal.Save()
+    if results:
+        print str(len(results)) + ' submissions are already done in the journal ' + journalPath + ', they are skipped.'
+
+    startTime = time.time()
+    if pending:
+        pool = multiprocessing.Pool(min(nrOfWorkers or multiprocessing.cpu_count(), len(pending)))
+        try:
+            for result in pool.imap_unordered(EvaluateSubmission, pending):
+                results.append(result)
+                journal.Record(result)
+                journal.Save()
+                print '[' + str(len(results)) + '/' + str(len(submissions)) + '] ' + result['name'] + ': ' + result['status'] + ' (' + '%.1f' % result['wallTime'] + ' s)'
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    results.sort(key = lambda result: result['index'])
+    WriteSummary(results, summaryPath)
+    nrOfFailed = len([result for result in results if result['status'] != 'done'])
+    print str(len(results) - nrOfFailed) + ' submissions evaluated, ' + str(nrOfFailed) + ' failed, in ' + '%.1f' % (time.time() - startTime) + ' s. summary: ' + summaryPath
+    return results
+
+def main(argv):
+    # evaluate from the command line, e.g. QIBA_batch.py -m GKM -c cal_Ktrans.dcm,cal_Ve.dcm -r ref_Ktrans.dcm,ref_Ve.dcm -d results
+    # or all the submissions of a manifest, e.g. QIBA_batch.py -f submissions.csv -w 4
+    usage = 'usage: QIBA_batch.py -m <GKM|T1> -c <calculated files> -r <reference files> -d <destination folder>\n' \
+            '       QIBA_batch.py -f <manifest (.csv or .json)> [-w <number of worker processes>] [-s <summary file>] [-j <journal file>]\n' \
+            '       the metrics of an evaluation are calculated on -t <number of threads> (by default 1 with a manifest, the number of CPUs otherwise)\n' \
+            '       the evaluated results are cached with -C <cache folder> [--cache-size <MB>] [--cache-age <days>]\n' \
+            '       and the metrics are stored in a SQLite database with -D <database file>\n' \
+            '       large binary files are mapped instead of read into memory, and evaluated in bands of patch rows, with --memory-map [--band-size <rows>]'
+    mode = 'GKM'
+    calFiles = ''
+    refFiles = ''
+    desDir = ''
+    manifestPath = ''
+    nrOfWorkers = None
+    nrOfThreads = None
+    summaryPath = None
+    journalPath = None
+    cacheDir = ''
+    cacheSize = None
+    cacheAge = None
+    storePath = None
+    memoryMap = False
+    bandSize = 0
+    try:
+        opts, args = getopt.getopt(argv, "hm:c:r:d:f:w:t:s:j:C:D:", ["help", "mode=", "cfile=", "rfile=", "destination=", "manifest=", "workers=", "threads=", "summary=", "journal=", "cache=", "cache-size=", "cache-age=", "database=", "memory-map", "band-size="])
+        for opt, arg in opts:
+            if opt in ('-h', '--help'):
+                print usage
+                return 0
+            elif opt in ('-m', '--mode'):
+                mode = arg
+            elif opt in ('-c', '--cfile'):
+                calFiles = arg
+            elif opt in ('-r', '--rfile'):
+                refFiles = arg
+            elif opt in ('-d', '--destination'):
+                desDir = arg
+            elif opt in ('-f', '--manifest'):
+                manifestPath = arg
+            elif opt in ('-w', '--workers'):
+                nrOfWorkers = int(arg)
+            elif opt in ('-t', '--threads'):
+                nrOfThreads = int(arg)
+            elif opt in ('-s', '--summary'):
+                summaryPath = arg
+            elif opt in ('-j', '--journal'):
+                journalPath = arg
+            elif opt in ('-C', '--cache'):
+                cacheDir = arg
+            elif opt == '--cache-size':
+                cacheSize = int(float(arg) * 1024 * 1024)
+            elif opt == '--cache-age':
+                cacheAge = float(arg) * 24 * 3600
+            elif opt in ('-D', '--database'):
+                storePath = arg
+            elif opt == '--memory-map':
+                memoryMap = True
+            elif opt == '--band-size':
+                bandSize = int(arg)
+    except (getopt.GetoptError, ValueError):
+        print usage
+        return 2
+    if not (manifestPath or (calFiles and refFiles and desDir)):
+        print usage
+        return 2
+    resultCache = QIBA_cache.ResultCache(cacheDir, cacheSize, cacheAge) if cacheDir else None
+    try:
+        if manifestPath:
+            results = EvaluateManifest(manifestPath, nrOfWorkers, summaryPath, journalPath, resultCache, storePath, memoryMap, bandSize, nrOfThreads or 1)
+            return 1 if [result for result in results if result['status'] != 'done'] else 0
+        EvaluateHeadless(mode, calFiles, refFiles, desDir, nrOfWorkers = nrOfThreads or multiprocessing.cpu_count(), resultCache = resultCache, storePath = storePath,
+                         memoryMap = memoryMap, bandSize = bandSize)
+    except Exception as error:
+        print 'Error occurs. Evaluation terminated: ' + str(error)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
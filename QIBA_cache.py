@@ -0,0 +1,187 @@
+# this package contains the caches which keep imported maps between evaluations, so that the same reference data is not decoded again for every evaluation.
+# the maps are kept in memory for the running process, and in cache files on disk for later runs.
+# the complete results of evaluations are kept in a cache on disk as well, so that the same evaluation is not calculated again.
+from collections import OrderedDict
+import hashlib
+import json
+import numpy
+import os.path
+import threading
+import time
+
+def FileKey(path, *settings):
+    # the key of a file in the caches: the path, the time of last modification and the size of the file, followed by the settings the file was imported with.
+    # a file which is changed on disk gets a new key.
+    path = os.path.abspath(path)
+    fileStat = os.stat(path)
+    return (path, fileStat.st_mtime, fileStat.st_size) + tuple(settings)
+
+class ReferenceCache():
+    '''
+    the in-process cache of the imported reference maps, with their patch values. when the cache is full, the least recently used map is dropped.
+    '''
+    def __init__(self, maxEntries = 8):
+        # initializes the class
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock() # the maps can be imported from several threads at the same time
+
+    def Get(self, key):
+        # return the cached map of the key, or None if it is not in the cache
+        with self.lock:
+            if key not in self.entries:
+                return None
+            value = self.entries.pop(key)
+            self.entries[key] = value # the most recently used map goes to the end
+            return value
+
+    def Put(self, key, value):
+        # add a map to the cache, and drop the least recently used maps if the cache is full
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last = False)
+
+    def Clear(self):
+        # drop all cached maps
+        with self.lock:
+            self.entries.clear()
+
+# the cache shared by all the models in this process
+referenceCache = ReferenceCache()
+
+def DiskCachePath(path, mode):
+    # the cache file of a source file, in the folder '.cache' next to the source file
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), '.cache', os.path.basename(path) + '.' + mode + '.cache')
+
+def SaveToDiskCache(cachePath, key, arrays):
+    # write the arrays to a cache file. the file begins with a line of header in JSON, which holds the key and the type, shape and position of each array,
+    # followed by the arrays in binary. the file is written to a temporary file first, so that no incomplete cache file can be read.
+    # a cache file which can not be written (e.g. in a read-only folder) is skipped.
+    alignment = 16
+    descriptions = {}
+    offset = 0
+    contiguousArrays = []
+    for name in sorted(arrays):
+        array = numpy.ascontiguousarray(arrays[name])
+        descriptions[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        contiguousArrays.append(array)
+        offset += -(-array.nbytes // alignment) * alignment
+    header = json.dumps({'key': list(key), 'arrays': descriptions})
+    header += ' ' * (-(len(header) + 1) % alignment) + '\n'
+
+    tempPath = cachePath + '.' + str(os.getpid()) + '.' + str(threading.current_thread().ident) + '.tmp' # one temporary file per writer, as several processes can share the cache
+    try:
+        if not os.path.isdir(os.path.dirname(cachePath)):
+            os.makedirs(os.path.dirname(cachePath))
+        with open(tempPath, 'wb') as cacheFile:
+            cacheFile.write(header.encode('ascii'))
+            for array in contiguousArrays:
+                cacheFile.write(array.tostring())
+                cacheFile.write(b'\0' * (-array.nbytes % alignment))
+        if os.name == 'nt' and os.path.exists(cachePath):
+            os.remove(cachePath) # os.rename does not replace files on Windows. on POSIX the rename replaces the file atomically
+        os.rename(tempPath, cachePath)
+    except (IOError, OSError):
+        pass
+
+def LoadFromDiskCache(cachePath, key):
+    # load the arrays from a cache file with one read-only memory map. return None if there is no valid cache file for the key.
+    try:
+        with open(cachePath, 'rb') as cacheFile:
+            headerLine = cacheFile.readline()
+        header = json.loads(headerLine.decode('ascii'))
+        if header['key'] != json.loads(json.dumps(list(key))):
+            return None
+        data = numpy.memmap(cachePath, dtype = numpy.uint8, mode = 'r', offset = len(headerLine))
+        arrays = {}
+        for name, description in header['arrays'].items():
+            dataType = numpy.dtype(str(description['dtype']))
+            shape = tuple(description['shape'])
+            nbytes = dataType.itemsize * int(numpy.prod(shape))
+            arrays[str(name)] = data[description['offset']:description['offset'] + nbytes].view(dataType).reshape(shape)
+        return arrays
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+# the digests of the file contents, by the key of the file, so that an unchanged file is hashed once per process
+fileDigests = {}
+fileDigestsLock = threading.Lock()
+
+def FileDigest(path):
+    # the SHA-1 digest of the content of a file, together with its MetaImage sidecar (.mhd) if there is one, as the sidecar decides how the file is decoded
+    key = FileKey(path)
+    with fileDigestsLock:
+        if key in fileDigests:
+            return fileDigests[key]
+    digest = hashlib.sha1()
+    paths = [path]
+    sidecarPath = os.path.splitext(path)[0] + '.mhd'
+    if os.path.abspath(sidecarPath) != os.path.abspath(path) and os.path.isfile(sidecarPath):
+        paths.append(sidecarPath)
+    for filePath in paths:
+        with open(filePath, 'rb') as digestFile:
+            for block in iter(lambda: digestFile.read(1 << 20), b''):
+                digest.update(block)
+    with fileDigestsLock:
+        fileDigests[key] = digest.hexdigest()
+    return fileDigests[key]
+
+class ResultCache():
+    '''
+    the cache of complete evaluation results on disk, addressed by the content of the evaluated files and the evaluation settings.
+    each result is one cache file in the folder of the cache, in the format of SaveToDiskCache. the least recently used results are dropped
+    when the files of the cache are larger than maxBytes in total, and the results not used for maxAge seconds are dropped. None means no limit.
+    '''
+    def __init__(self, directory, maxBytes = None, maxAge = None):
+        # initializes the class
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+
+    def Path(self, key):
+        # the cache file of a key
+        return os.path.join(self.directory, hashlib.sha1(json.dumps(list(key))).hexdigest() + '.result')
+
+    def Get(self, key):
+        # return the cached arrays of the key, or None if the result is not in the cache
+        path = self.Path(key)
+        arrays = LoadFromDiskCache(path, key)
+        if arrays is not None:
+            try:
+                os.utime(path, None) # the time of last modification is the time of last use
+            except OSError:
+                pass
+        return arrays
+
+    def Put(self, key, arrays):
+        # add the arrays of a result to the cache, and drop the old results if the cache is full
+        SaveToDiskCache(self.Path(key), key, arrays)
+        self.Evict()
+
+    def Evict(self):
+        # drop the results which are too old, then the least recently used results until the cache is small enough
+        if self.maxBytes is None and self.maxAge is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if name.endswith('.result'):
+                path = os.path.join(self.directory, name)
+                try:
+                    fileStat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((fileStat.st_mtime, fileStat.st_size, path))
+        entries.sort()
+        totalBytes = sum(size for lastUsed, size, path in entries)
+        now = time.time()
+        for lastUsed, size, path in entries:
+            if not ((self.maxAge is not None and now - lastUsed > self.maxAge) or (self.maxBytes is not None and totalBytes > self.maxBytes)):
+                break
+            try:
+                os.remove(path)
+                totalBytes -= size
+            except OSError:
+                pass
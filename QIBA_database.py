@@ -0,0 +1,131 @@
+# this package contains the result store, a local SQLite database which keeps the metrics of evaluated models of many submissions,
+# so that the results of different submissions can be compared with queries instead of reading the exported files.
+import sqlite3
+import time
+import numpy
+
+def PatchMetrics(parameter, prefix, chiSquare):
+    # the metrics with one value per patch of a parameter map
+    return [(parameter, 'reference', prefix + '_ref_patchValue', 'patch'),
+            (parameter, 'patch value', prefix + '_cal_patchValue', 'patch'),
+            (parameter, 'NaN percentage', prefix + '_NaN_percentage', 'patch'),
+            (parameter, 'mean', prefix + '_cal_patch_mean', 'patch'),
+            (parameter, 'median', prefix + '_cal_patch_median', 'patch'),
+            (parameter, 'std. deviation', prefix + '_cal_patch_deviation', 'patch'),
+            (parameter, '1st quartile', prefix + '_cal_patch_1stQuartile', 'patch'),
+            (parameter, '3rd quartile', prefix + '_cal_patch_3rdQuartile', 'patch'),
+            (parameter, 'min', prefix + '_cal_patch_min', 'patch'),
+            (parameter, 'max', prefix + '_cal_patch_max', 'patch'),
+            (parameter, 'CCC', prefix + '_ccc', 'patch'),
+            (parameter, 'RMS', prefix + '_rms', 'patch'),
+            (parameter, 'bias', prefix + '_bias', 'patch'),
+            (parameter, 'TDI', prefix + '_TDI', 'patch'),
+            (parameter, 'exact TDI', prefix + '_TDI_exact', 'patch'),
+            (parameter, 't-statistic', prefix + '_cal_patch_ttest_t', 'patch'),
+            (parameter, 't-test p-value', prefix + '_cal_patch_ttest_p', 'patch'),
+            (parameter, 'U-value', prefix + '_cal_patch_Utest_u', 'patch'),
+            (parameter, 'U-test p-value', prefix + '_cal_patch_Utest_p', 'patch'),
+            (parameter, 'chi-square', prefix + '_cal_patch_' + chiSquare + '_c', 'patch'),
+            (parameter, 'chi-square p-value', prefix + '_cal_patch_' + chiSquare + '_p', 'patch')]
+
+def FitMetrics(parameter, prefix, suffix, axis):
+    # the metrics of the fittings of a parameter, with one value per row or column of patches
+    return [(parameter, 'linear fit slope', 'a_lin_' + prefix, axis),
+            (parameter, 'linear fit intercept', 'b_lin_' + prefix, axis),
+            (parameter, 'linear fit R-squared', 'r_squared_lin_' + suffix, axis),
+            (parameter, 'linear fit slope std. error', 'a_lin_' + prefix + '_stderr', axis),
+            (parameter, 'linear fit intercept std. error', 'b_lin_' + prefix + '_stderr', axis),
+            (parameter, 'linear fit slope 95% CI', 'a_lin_' + prefix + '_CI', axis + ' CI'),
+            (parameter, 'linear fit intercept 95% CI', 'b_lin_' + prefix + '_CI', axis + ' CI'),
+            (parameter, 'logarithmic fit a', 'a_log_' + prefix, axis),
+            (parameter, 'logarithmic fit b', 'b_log_' + prefix, axis),
+            (parameter, 'logarithmic fit a std. error', 'a_log_' + prefix + '_stderr', axis),
+            (parameter, 'logarithmic fit b std. error', 'b_log_' + prefix + '_stderr', axis),
+            (parameter, 'logarithmic fit R-squared', 'r_squared_log_' + suffix, axis)]
+
+# the metrics of the models to store: (parameter, metric, attribute of the model, arrangement). the arrangement is 'patch' for one value per patch,
+# 'row' for one value per row of patches and 'column' for one value per column of patches. 'row CI' and 'column CI' are confidence intervals,
+# which are stored as the metrics '<metric> lower' and '<metric> upper'.
+storedMetrics = {
+    'GKM': PatchMetrics('Ktrans', 'Ktrans', 'Chisquare') + PatchMetrics('Ve', 'Ve', 'Chisquare') +
+           FitMetrics('Ktrans', 'Ktrans', 'K', 'column') + FitMetrics('Ve', 'Ve', 'V', 'row') +
+           [('Ktrans', 'correlation with ref. Ktrans', 'corr_KK', 'column'), ('Ktrans', 'covariance with ref. Ktrans', 'cov_KK', 'column'),
+            ('Ve', 'correlation with ref. Ktrans', 'corr_VK', 'column'), ('Ve', 'covariance with ref. Ktrans', 'cov_VK', 'column'),
+            ('Ve', 'correlation with ref. Ve', 'corr_VV', 'row'), ('Ve', 'covariance with ref. Ve', 'cov_VV', 'row'),
+            ('Ktrans', 'correlation with ref. Ve', 'corr_KV', 'row'), ('Ktrans', 'covariance with ref. Ve', 'cov_KV', 'row'),
+            ('Ktrans', 'ANOVA f-value', 'Ktrans_cal_patch_ANOVA_f', 'row'), ('Ktrans', 'ANOVA p-value', 'Ktrans_cal_patch_ANOVA_p', 'row'),
+            ('Ve', 'ANOVA f-value', 'Ve_cal_patch_ANOVA_f', 'column'), ('Ve', 'ANOVA p-value', 'Ve_cal_patch_ANOVA_p', 'column')],
+    'T1': PatchMetrics('T1', 'T1', 'chisquare') + FitMetrics('T1', 'T1', 'T1', 'row') +
+          [('T1', 'correlation with ref. T1', 'corr_T1T1', 'row'), ('T1', 'covariance with ref. T1', 'cov_T1T1', 'row'),
+           ('T1', 'ANOVA f-value', 'T1_cal_patch_ANOVA_f', 'column'), ('T1', 'ANOVA p-value', 'T1_cal_patch_ANOVA_p', 'column')]}
+
+def MetricRows(model, mode):
+    # the rows of the metrics of an evaluated model: (parameter, patch row, patch column, metric, value). the patch column of a metric of a whole row,
+    # and the patch row of a metric of a whole column, is -1. the metrics which are not evaluated are skipped.
+    nrOfRows, nrOfColumns = model.nrOfRows, model.nrOfColumns
+    rows = []
+    for parameter, metric, attribute, arrangement in storedMetrics[mode]:
+        try:
+            values = numpy.asarray(getattr(model, attribute), dtype = numpy.float64)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if arrangement == 'patch' and values.shape == (nrOfRows, nrOfColumns):
+            rows.extend((parameter, i, j, metric, values[i, j]) for i in range(nrOfRows) for j in range(nrOfColumns))
+        elif arrangement == 'row' and values.shape == (nrOfRows,):
+            rows.extend((parameter, i, -1, metric, values[i]) for i in range(nrOfRows))
+        elif arrangement == 'column' and values.shape == (nrOfColumns,):
+            rows.extend((parameter, -1, j, metric, values[j]) for j in range(nrOfColumns))
+        elif arrangement == 'row CI' and values.shape == (nrOfRows, 2):
+            rows.extend((parameter, i, -1, metric + bound, values[i, k]) for i in range(nrOfRows) for k, bound in enumerate((' lower', ' upper')))
+        elif arrangement == 'column CI' and values.shape == (nrOfColumns, 2):
+            rows.extend((parameter, -1, j, metric + bound, values[j, k]) for j in range(nrOfColumns) for k, bound in enumerate((' lower', ' upper')))
+    return [(parameter, i, j, metric, None if numpy.isnan(value) else float(value)) for parameter, i, j, metric, value in rows]
+
+class ResultStore():
+    '''
+    the store of the metrics of the evaluated submissions in a SQLite database. each metric value is one row of the table 'metrics',
+    keyed by the submission, the parameter, the row and the column of the patch and the metric. the reference value of each patch is stored as
+    the metric 'reference', so that the metrics can be selected by the reference value, see MetricAtReference.
+    '''
+    def __init__(self, path, timeout = 60):
+        # initializes the class, and creates the tables if the database is new. the timeout is how long to wait for another process writing the database.
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout = timeout)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS submissions (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, mode TEXT NOT NULL, '
+                                    'calculated TEXT, reference TEXT, stored TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS metrics (submission INTEGER NOT NULL REFERENCES submissions (id) ON DELETE CASCADE, '
+                                    'parameter TEXT NOT NULL, patchRow INTEGER NOT NULL, patchColumn INTEGER NOT NULL, metric TEXT NOT NULL, value REAL, '
+                                    'PRIMARY KEY (submission, parameter, patchRow, patchColumn, metric))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS metricsByMetric ON metrics (parameter, metric, value)')
+
+    def Store(self, name, mode, model, calculated = '', reference = ''):
+        # store the metrics of an evaluated model as the submission of the name, in one transaction. the metrics stored before for the name are replaced.
+        rows = MetricRows(model, mode)
+        with self.connection:
+            self.connection.execute('DELETE FROM submissions WHERE name = ?', (name,))
+            submission = self.connection.execute('INSERT INTO submissions (name, mode, calculated, reference, stored) VALUES (?, ?, ?, ?, ?)',
+                                                 (name, mode, calculated, reference, time.strftime('%Y-%m-%d %H:%M:%S'))).lastrowid
+            self.connection.executemany('INSERT INTO metrics (submission, parameter, patchRow, patchColumn, metric, value) VALUES (?, ?, ?, ?, ?, ?)',
+                                        ((submission,) + row for row in rows))
+        return len(rows)
+
+    def Query(self, sql, parameters = ()):
+        # run a query on the database, and return all its rows
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def MetricAtReference(self, parameter, metric, referenceParameter, referenceValue, tolerance = 1e-6):
+        # the values of a metric of a parameter in the patches whose reference value of referenceParameter is referenceValue, for every submission,
+        # e.g. MetricAtReference('Ktrans', 'CCC', 'Ktrans', 0.1). return the rows (submission name, patch row, patch column, value).
+        return self.Query('SELECT submissions.name, metrics.patchRow, metrics.patchColumn, metrics.value FROM metrics '
+                          'JOIN metrics AS reference ON reference.submission = metrics.submission AND reference.patchRow = metrics.patchRow '
+                          'AND reference.patchColumn = metrics.patchColumn '
+                          'JOIN submissions ON submissions.id = metrics.submission '
+                          'WHERE reference.parameter = ? AND reference.metric = \'reference\' AND reference.value BETWEEN ? AND ? '
+                          'AND metrics.parameter = ? AND metrics.metric = ? ORDER BY submissions.name, metrics.patchRow, metrics.patchColumn',
+                          (referenceParameter, referenceValue - tolerance, referenceValue + tolerance, parameter, metric))
+
+    def Close(self):
+        # close the database
+        self.connection.close()
@@ -42,20 +42,19 @@ from sys import argv, exit
 import getopt
 import wx
 import wx.html
-import numpy
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 from matplotlib.figure import Figure
 from mpl_toolkits.axes_grid1 import make_axes_locatable
-import matplotlib.ticker as ticker
 import time
 import subprocess
 from matplotlib.backends.backend_wxagg import NavigationToolbar2WxAgg as NavigationToolbar
 import wx.lib.scrolledpanel as scrolled
-from xlwt import Workbook
 
 
 import QIBA_functions
 import QIBA_model
+import QIBA_report
+import QIBA_batch
 
 class MainWindow(wx.Frame):
     '''
@@ -459,28 +458,8 @@ class MainWindow(wx.Frame):
             pass
 
     def DrawMaps(self):
-        pass
-
-    def DrawScatter(self):
-        pass
-
-    def PlotPreview(self, dataList, titleList, colorMapList, unitList):
-        # show calculated images and the error images
-        nrOfSubFigRows = len(dataList)
-        nrOfSubFigColumns = len(dataList[0])
-        # subplot = [[] for i in range(nrOfSubFigRows)]
-
-        for i in range(nrOfSubFigRows):
-            for j in range(nrOfSubFigColumns):
-                subplot = self.figureImagePreview.add_subplot(nrOfSubFigRows, nrOfSubFigColumns, i * nrOfSubFigColumns + j + 1)
-                lmin = numpy.nanmin(dataList[i][j])-0.01
-                lmax = numpy.nanmax(dataList[i][j])+0.01
-                handler = subplot.imshow(dataList[i][j], cmap = colorMapList[i][j], interpolation='nearest', vmin = lmin, vmax = lmax)
-                divider = make_axes_locatable(subplot.get_figure().gca()) # for tight up the color bar
-                cax = divider.append_axes("right", "5%", pad="3%")
-                subplot.get_figure().colorbar(handler, cax = cax).set_label(unitList[i][j]) # show color bar and the label
-                subplot.set_title(titleList[i][j])
-
+        # draw the maps of the preview and error
+        QIBA_report.DrawMaps(self.figureImagePreview, self.newModel, self.mode)
 
         # setup the toolbar
         self.toolbar_maps = NavigationToolbar(self.canvasImagePreview)
@@ -508,7 +487,6 @@ class MainWindow(wx.Frame):
         # double click
         wx.EVT_LEFT_DCLICK(self.canvasImagePreview, self.toolbar_maps.home)
 
-        self.figureImagePreview.tight_layout()
         self.canvasImagePreview.draw()
 
     def enter_axes(self, event):
@@ -526,26 +504,9 @@ class MainWindow(wx.Frame):
         else:
             pass
 
-    def PlotScatter(self, dataList, refDataList, xLabelList, yLabelList, titleList, xLim, yLim):
-        '''
-        the scatter plots to show the distribution of the calculated values
-        '''
-        nrOfSubFigRows = len(dataList)
-        nrOfSubFigColumns = len(dataList[0])
-        self.figureScatter.clear()
-
-        for i in range(nrOfSubFigRows):
-            for j in range(nrOfSubFigColumns):
-                subPlot = self.figureScatter.add_subplot(nrOfSubFigRows, nrOfSubFigColumns, i * nrOfSubFigColumns + j + 1)
-                subPlot.scatter(refDataList[i][j], dataList[i][j], color = 'b', alpha = 1, label = 'calculated value')
-                subPlot.scatter(refDataList[i][j], refDataList[i][j], color = 'r', alpha = 1, label = 'reference value')
-                subPlot.legend(loc = 'upper left')
-                subPlot.set_xlim(xLim[i])
-                subPlot.set_ylim(yLim[i])
-                subPlot.set_xlabel(xLabelList[i][j])
-                subPlot.set_ylabel(yLabelList[i][j])
-                subPlot.set_title(titleList[i][j])
-
+    def DrawScatter(self):
+        # draw the scatters, limited to the pixels or to the patch values
+        QIBA_report.DrawScatter(self.figureScatter, self.newModel, self.mode, self.SCATTER_SWITCH)
         # setup the toolbar
         self.toolbar_scatters = NavigationToolbar(self.canvasScatter)
         self.toolbar_scatters.Hide()
@@ -572,7 +533,6 @@ class MainWindow(wx.Frame):
         # double click
         wx.EVT_LEFT_DCLICK(self.canvasScatter, self.toolbar_scatters.home)
 
-        self.figureScatter.tight_layout()
         self.canvasScatter.draw()
 
     def rightDown_scatters(self, event):
@@ -757,6 +717,7 @@ class MainWindow_KV(MainWindow):
         MainWindow.__init__(self, None, appName, calFiles, refFiles, desDir)
 
         self.patchLen = 10
+        self.mode = 'GKM'
         self.WARNINGTEXT = False
 
         # default files' paths
@@ -843,13 +804,14 @@ class MainWindow_KV(MainWindow):
         '''
         load the reference data, and get the image size
         '''
-        self.ref_K, nrOfRow1, nrOfColumn1, fileType = QIBA_functions.ImportRawFile(self.path_ref_K, self.patchLen)
-        self.ref_V, nrOfRow2, nrOfColumn2, fileType = QIBA_functions.ImportRawFile(self.path_ref_V, self.patchLen)
-        if (nrOfRow1 == nrOfRow2) and (nrOfColumn1 == nrOfColumn2):
-            self.nrOfRow = nrOfRow1 - 2
-            self.nrOfColumn = nrOfColumn1
+        # the image size is read from the file headers, the images are only imported for showing them
+        agree, nrOfRow, nrOfColumn = QIBA_functions.ProbeGrid([self.path_ref_K, self.path_ref_V], self.patchLen)
+        if agree:
+            self.nrOfRow = nrOfRow - 2
+            self.nrOfColumn = nrOfColumn
         else:
             self.SetStatusText('Please load suitable reference data!')
+        (self.ref_K, nrOfRow1, nrOfColumn1, fileType), (self.ref_V, nrOfRow2, nrOfColumn2, fileType) = QIBA_functions.MapConcurrently(QIBA_functions.ImportRawFile, [(self.path_ref_K, self.patchLen), (self.path_ref_V, self.patchLen)])
 
     def SetupStartPage(self):
         '''
@@ -1202,70 +1164,7 @@ class MainWindow_KV(MainWindow):
     def DrawHistograms(self):
         # draw histograms of imported calculated Ktrans and Ve maps, so that the user can have a look of the distribution of each patch.
 
-        pixelCountInPatch = self.newModel.patchLen ** 2
-        nrOfBins = 10
-
-        self.figureHist_Ktrans.suptitle('The histogram of the calculated Ktrans',) # fontsize = 18)
-        self.figureHist_Ve.suptitle('The histogram of the calculated Ve') # , fontsize = 18)
-
-        for i in range(self.newModel.nrOfRows):
-            for j in range(self.newModel.nrOfColumns):
-                subPlot_K = self.figureHist_Ktrans.add_subplot(self.newModel.nrOfRows, self.newModel.nrOfColumns, i * self.newModel.nrOfColumns + j + 1)
-                processedData_Ktrans = QIBA_functions.DealNaN(self.newModel.Ktrans_cal[i][j])[0]
-                processedData_Ktrans = QIBA_functions.DropNaN(processedData_Ktrans)
-                if len(processedData_Ktrans)==0:
-                    subPlot_K.plot([])
-                    subPlot_K.xaxis.set_ticks([])
-                    subPlot_K.yaxis.set_ticks([])
-                else:
-                    subPlot_K.hist(processedData_Ktrans, nrOfBins)
-                    minPatch_K = numpy.min(processedData_Ktrans)
-                    maxPatch_K = numpy.max(processedData_Ktrans)
-                    meanPatch_K = numpy.mean(processedData_Ktrans)
-
-                    minPatch_K = QIBA_functions.formatFloatTo2DigitsString(minPatch_K)
-                    maxPatch_K = QIBA_functions.formatFloatTo2DigitsString(maxPatch_K)
-                    meanPatch_K = QIBA_functions.formatFloatTo2DigitsString(meanPatch_K)
-
-                    subPlot_K.set_xticks([float(minPatch_K), float(maxPatch_K)])
-
-                    subPlot_K.set_xticklabels([minPatch_K, maxPatch_K])
-                    subPlot_K.axvline(float(meanPatch_K), color = 'r', linestyle = 'dashed', linewidth = 1) # draw a vertical line at the mean value
-                    subPlot_K.set_ylim([0, pixelCountInPatch])
-                    subPlot_K.text(float(meanPatch_K) + 0.01 * float(meanPatch_K), 0.9 * pixelCountInPatch, meanPatch_K, size = 'x-small') # parameters: location_x, location_y, text, size
-                if i == 0:
-                    subPlot_K.set_xlabel(self.newModel.headersHorizontal[j])
-                    subPlot_K.xaxis.set_label_position('top')
-                if j == 0:
-                    subPlot_K.set_ylabel(self.newModel.headersVertical[i])
-
-                subPlot_V = self.figureHist_Ve.add_subplot(self.newModel.nrOfRows, self.newModel.nrOfColumns, i * self.newModel.nrOfColumns + j + 1 )
-                # subPlot_V.clear()
-                processedData_Ve = QIBA_functions.DealNaN(self.newModel.Ve_cal[i][j])[0]
-                processedData_Ve = QIBA_functions.DropNaN(processedData_Ve)
-                if len(processedData_Ve)==0:
-                    subPlot_V.plot([])
-                    subPlot_V.xaxis.set_ticks([])
-                    subPlot_V.yaxis.set_ticks([])
-                else:
-                    subPlot_V.hist(processedData_Ve, nrOfBins)
-                    minPatch_V = numpy.min(processedData_Ve)
-                    maxPatch_V = numpy.max(processedData_Ve)
-                    meanPatch_V = numpy.mean(processedData_Ve)
-                    minPatch_V = QIBA_functions.formatFloatTo2DigitsString(minPatch_V)
-                    maxPatch_V = QIBA_functions.formatFloatTo2DigitsString(maxPatch_V)
-                    meanPatch_V = QIBA_functions.formatFloatTo2DigitsString(meanPatch_V)
-
-                    subPlot_V.set_xticks([float(minPatch_V), float(maxPatch_V)])
-                    subPlot_V.set_xticklabels([minPatch_V, maxPatch_V])
-                    subPlot_V.axvline(float(meanPatch_V), color = 'r', linestyle = 'dashed', linewidth = 1) # draw a vertical line at the mean value
-                    subPlot_V.set_ylim([0, pixelCountInPatch])
-                    subPlot_V.text(float(meanPatch_V) + 0.01 * float(meanPatch_V), 0.9 * pixelCountInPatch, meanPatch_V, size = 'x-small') # parameters: location_x, location_y, text, size
-                if i == 0:
-                    subPlot_V.set_xlabel(self.newModel.headersHorizontal[j])
-                    subPlot_V.xaxis.set_label_position('top')
-                if j == 0:
-                    subPlot_V.set_ylabel(self.newModel.headersVertical[i])
+        QIBA_report.DrawHistograms([self.figureHist_Ktrans, self.figureHist_Ve], self.newModel, self.mode)
 
         # setup the toolbar
         self.toolbar_hist_K = NavigationToolbar(self.canvasHist_Ktrans)
@@ -1315,13 +1214,6 @@ class MainWindow_KV(MainWindow):
         wx.EVT_LEFT_DCLICK(self.canvasHist_Ktrans, self.toolbar_hist_K.home)
         wx.EVT_LEFT_DCLICK(self.canvasHist_Ve, self.toolbar_hist_V.home)
 
-
-        self.figureHist_Ve.tight_layout()
-        self.figureHist_Ktrans.tight_layout()
-
-        self.figureHist_Ktrans.subplots_adjust(top = 0.94, right = 0.95)
-        self.figureHist_Ve.subplots_adjust(top = 0.94, right = 0.95)
-
         self.canvasHist_Ktrans.draw()
         self.canvasHist_Ve.draw()
 
@@ -1348,69 +1240,7 @@ class MainWindow_KV(MainWindow):
         draw Bland-Altman plots of imported calculated Ktrans and Ve maps, for viewing limits of agreement.
         '''
 
-        pixelCountInPatch = self.newModel.patchLen ** 2
-
-        self.figureLoA_Ktrans.suptitle('The Bland-Altman plots between the calculated and reference Ktrans' )  # fontsize = 18)
-        self.figureLoA_Ve.suptitle('The Bland-Altman plots between the calculated and reference Ve')  # , fontsize = 18)
-
-        for i in range(self.newModel.nrOfRows):
-            for j in range(self.newModel.nrOfColumns):
-                subPlot_K = self.figureLoA_Ktrans.add_subplot(self.newModel.nrOfRows, self.newModel.nrOfColumns, i * self.newModel.nrOfColumns + j + 1)
-
-                diff = numpy.asarray(self.newModel.Ktrans_cal[i][j]) - numpy.asarray(self.newModel.Ktrans_ref[i][j])
-                mean = (numpy.asarray(self.newModel.Ktrans_cal[i][j]) + numpy.asarray(self.newModel.Ktrans_ref[i][j]))/2
-                md = numpy.mean(diff)
-                sd = numpy.std(diff, axis=0)
-
-                # subPlot_K.scatter(self.newModel.Ktrans_ref[i][j], diff, color='b')
-                subPlot_K.scatter(mean, diff, color='b', alpha=0.2)
-
-                refPatch_K = QIBA_functions.formatFloatTo2DigitsString(numpy.median(mean))
-
-                subPlot_K.set_xticks([float(numpy.median(mean))])
-                subPlot_K.set_xticklabels([refPatch_K])
-
-                subPlot_K.axhline(float(md), color='g', linestyle='solid',
-                                  linewidth=1)  # draw a horizontal line at the mean of difference
-                subPlot_K.axhline(float(md + 1.96*sd), color='r', linestyle='dashed',
-                                  linewidth=1)  # draw a horizontal line for limits of agreement
-                subPlot_K.axhline(float(md - 1.96 * sd), color='r', linestyle='dashed',
-                                  linewidth=1)  # draw a horizontal line for limits of agreement
-                # subPlot_K.set_ylim([0, pixelCountInPatch])
-                # subPlot_K.text(float(meanPatch_K) + 0.01 * float(meanPatch_K), 0.9 * pixelCountInPatch, meanPatch_K, size='x-small')  # parameters: location_x, location_y, text, size
-                if i == 0:
-                    subPlot_K.set_xlabel(self.newModel.headersHorizontal[j])
-                    subPlot_K.xaxis.set_label_position('top')
-                if j == 0:
-                    subPlot_K.set_ylabel(self.newModel.headersVertical[i])
-
-                # draw for the calculated Ve
-                subPlot_V = self.figureLoA_Ve.add_subplot(self.newModel.nrOfRows, self.newModel.nrOfColumns, i * self.newModel.nrOfColumns + j + 1)
-                mean = (numpy.asarray(self.newModel.Ve_cal[i][j]) + numpy.asarray(self.newModel.Ve_ref[i][j])) / 2
-                diff = numpy.asarray(self.newModel.Ve_cal[i][j]) - numpy.asarray(self.newModel.Ve_ref[i][j])
-                md = numpy.mean(diff)
-                sd = numpy.std(diff, axis=0)
-
-                subPlot_V.scatter(mean, diff, color='b', alpha=0.2)
-
-                refPatch_V = QIBA_functions.formatFloatTo2DigitsString(numpy.median(mean))
-
-                subPlot_V.set_xticks([float(numpy.median(mean))])
-
-                subPlot_V.set_xticklabels([refPatch_V])
-                subPlot_V.axhline(float(md), color='g', linestyle='solid',
-                                  linewidth=1)  # draw a horizontal line at the mean of difference
-                subPlot_V.axhline(float(md + 1.96*sd), color='r', linestyle='dashed',
-                                  linewidth=1)  # draw a horizontal line for limits of agreement
-                subPlot_V.axhline(float(md - 1.96 * sd), color='r', linestyle='dashed',
-                                  linewidth=1)  # draw a horizontal line for limits of agreement
-                # subPlot_K.set_ylim([0, pixelCountInPatch])
-                # subPlot_K.text(float(meanPatch_K) + 0.01 * float(meanPatch_K), 0.9 * pixelCountInPatch, meanPatch_K, size='x-small')  # parameters: location_x, location_y, text, size
-                if i == 0:
-                    subPlot_V.set_xlabel(self.newModel.headersHorizontal[j])
-                    subPlot_V.xaxis.set_label_position('top')
-                if j == 0:
-                    subPlot_V.set_ylabel(self.newModel.headersVertical[i])
+        QIBA_report.DrawBlandAltmanPlots([self.figureLoA_Ktrans, self.figureLoA_Ve], self.newModel)
 
         # setup the toolbar
         self.toolbar_hist_K = NavigationToolbar(self.canvasHist_Ktrans)
@@ -1462,13 +1292,6 @@ class MainWindow_KV(MainWindow):
         wx.EVT_LEFT_DCLICK(self.canvasHist_Ve, self.toolbar_hist_V.home)
         '''
 
-
-        self.figureLoA_Ve.tight_layout()
-        self.figureLoA_Ktrans.tight_layout()
-
-        self.figureLoA_Ktrans.subplots_adjust(top=0.94, right=0.95)
-        self.figureLoA_Ve.subplots_adjust(top=0.94, right=0.95)
-
         self.canvasLoA_Ktrans.draw()
         self.canvasLoA_Ve.draw()
 
@@ -1477,51 +1300,7 @@ class MainWindow_KV(MainWindow):
         draw box plots of each patch
         '''
 
-        subPlotK = self.figureBoxPlot.add_subplot(2, 1, 1)
-        subPlotK.clear()
-        temp = []
-        referValueK = []
-        for i in range(self.newModel.nrOfRows):
-            temp_temp = []
-            for element in self.newModel.Ktrans_cal[i]:
-                temp_temp.append(QIBA_functions.DealNaN(element)[0])
-            temp.extend(temp_temp)
-            referValueK.append(float('{0:.2f}'.format(self.newModel.Ktrans_ref[i][0][0])))
-        subPlotK.boxplot(temp, notch = 1, sym = 'r+', whis=1.5)
-
-
-        subPlotV = self.figureBoxPlot.add_subplot(2, 1, 2)
-        subPlotV.clear()
-        temp = []
-        referValueV = []
-        for j in range(self.newModel.nrOfColumns):
-            for i in range(self.newModel.nrOfRows):
-                # temp.append(self.newModel.Ve_cal[i][j])
-                temp.append(QIBA_functions.DealNaN(self.newModel.Ve_cal[i][j])[0])
-            referValueV.append(float('{0:.2f}'.format(zip(*self.newModel.Ve_ref)[j][0][0])))
-        subPlotV.boxplot(temp, notch = 1, sym = 'r+', whis=1.5)
-
-        # decorate Ktrans plot
-        subPlotK.set_title('Box plot of calculated Ktrans')
-        subPlotK.set_xlabel('In each column, each box plot denotes Ve = ' + str(referValueV) + ' respectively')
-        subPlotK.set_ylabel('Calculated values in patches')
-
-        subPlotK.xaxis.set_major_formatter(ticker.NullFormatter())
-        subPlotK.xaxis.set_minor_locator(ticker.FixedLocator([3, 8, 13, 18, 23, 28]))
-        subPlotK.xaxis.set_minor_formatter(ticker.FixedFormatter(['Ktrans = ' + str(referValueK[0]), 'Ktrans = ' + str(referValueK[1]), 'Ktrans = ' + str(referValueK[2]), 'Ktrans = ' + str(referValueK[3]), 'Ktrans = ' + str(referValueK[4]), 'Ktrans = ' + str(referValueK[5])]))
-        for i in range(self.newModel.nrOfRows):
-            subPlotK.axvline(x = self.newModel.nrOfColumns * i + 0.5, color = 'green', linestyle = 'dashed')
-
-        # decorate Ve plot
-        subPlotV.set_title('Box plot of calculated Ve')
-        subPlotV.set_xlabel('In each column, each box plot denotes Ktrans = ' + str(referValueK) + ' respectively')
-        subPlotV.set_ylabel('Calculated values in patches')
-
-        subPlotV.xaxis.set_major_formatter(ticker.NullFormatter())
-        subPlotV.xaxis.set_minor_locator(ticker.FixedLocator([3.5, 9.5, 15.5, 21.5, 27.5]))
-        subPlotV.xaxis.set_minor_formatter(ticker.FixedFormatter(['Ve = ' + str(referValueV[0]), 'Ve = ' + str(referValueV[1]), 'Ve = ' + str(referValueV[2]), 'Ve = ' + str(referValueV[3]), 'Ve = ' + str(referValueV[4])]))
-        for i in range(self.newModel.nrOfColumns):
-            subPlotV.axvline(x = self.newModel.nrOfRows * i + 0.5, color = 'green', linestyle = 'dashed')
+        QIBA_report.DrawBoxPlot(self.figureBoxPlot, self.newModel, self.mode)
 
         # setup the toolbar
         self.toolbar_box = NavigationToolbar(self.canvasBoxPlot)
@@ -1549,8 +1328,6 @@ class MainWindow_KV(MainWindow):
         # double click
         wx.EVT_LEFT_DCLICK(self.canvasBoxPlot, self.toolbar_box.home)
 
-
-        self.figureBoxPlot.tight_layout()
         self.canvasBoxPlot.draw()
         self.rightPanel.Layout()
 
@@ -1563,60 +1340,6 @@ class MainWindow_KV(MainWindow):
         else:
             pass
 
-    def DrawMaps(self):
-        # draw the maps of the preview and error
-        self.PlotPreview([[self.newModel.Ktrans_cal_inRow, self.newModel.Ktrans_error, self.newModel.Ktrans_error_normalized],
-                                  [self.newModel.Ve_cal_inRow, self.newModel.Ve_error, self.newModel.Ve_error_normalized]],
-
-                                [['Calculated Ktrans', 'Error map of Ktrans', 'Normalized Error map of Ktrans'],
-                                 ['Calculated Ve', 'Error map of Ve', 'Normalized Error map of Ve']],
-
-                                [['bone', 'rainbow', 'rainbow'], ['bone', 'rainbow', 'rainbow']],
-
-                                [['Ktrans[1/min]', 'Delta Ktrans[1/min.]', 'Normalized error[%]'], ['Ve[]', 'Delta Ve[]', 'Normalized error[%]']])
-
-    def DrawScatter(self):
-        # draw the scatters
-        if self.SCATTER_SWITCH:
-            minLim_x_K = numpy.nanmin(self.newModel.Ktrans_ref_inRow)
-            maxLim_x_K = numpy.nanmax(self.newModel.Ktrans_ref_inRow)
-            minLim_y_K = numpy.nanmin( [numpy.min(self.newModel.Ktrans_ref_inRow), numpy.min(self.newModel.Ktrans_cal_inRow)])
-            maxLim_y_K = numpy.nanmax( [numpy.max(self.newModel.Ktrans_ref_inRow), numpy.max(self.newModel.Ktrans_cal_inRow)])
-
-            minLim_x_V = numpy.nanmin(self.newModel.Ve_ref_inRow)
-            maxLim_x_V = numpy.nanmax(self.newModel.Ve_ref_inRow)
-            minLim_y_V = numpy.nanmin( [numpy.min(self.newModel.Ve_ref_inRow), numpy.min(self.newModel.Ve_cal_inRow)])
-            maxLim_y_V = numpy.nanmax( [numpy.max(self.newModel.Ve_ref_inRow), numpy.max(self.newModel.Ve_cal_inRow)])
-        else:
-            minLim_x_K = numpy.nanmin(self.newModel.Ktrans_ref_patchValue)
-            maxLim_x_K = numpy.nanmax(self.newModel.Ktrans_ref_patchValue)
-            minLim_y_K = numpy.nanmin( [numpy.min(self.newModel.Ktrans_ref_patchValue), numpy.min(self.newModel.Ktrans_cal_patchValue)])
-            maxLim_y_K = numpy.nanmax( [numpy.max(self.newModel.Ktrans_ref_patchValue), numpy.max(self.newModel.Ktrans_cal_patchValue)])
-
-            minLim_x_V = numpy.nanmin(self.newModel.Ve_ref_patchValue)
-            maxLim_x_V = numpy.nanmax(self.newModel.Ve_ref_patchValue)
-            minLim_y_V = numpy.nanmin( [numpy.min(self.newModel.Ve_ref_patchValue), numpy.min(self.newModel.Ve_cal_patchValue)])
-            maxLim_y_V = numpy.nanmax( [numpy.max(self.newModel.Ve_ref_patchValue), numpy.max(self.newModel.Ve_cal_patchValue)])
-        spacing_x_K = (maxLim_x_K - minLim_x_K) * 0.05
-        spacing_y_K = (maxLim_y_K - minLim_y_K) * 0.05
-
-        spacing_x_V = (maxLim_x_V - minLim_x_V) * 0.05
-        spacing_y_V = (maxLim_y_V - minLim_y_V) * 0.05
-        self.PlotScatter([[self.newModel.Ktrans_cal], [self.newModel.Ve_cal]],
-
-                            [[self.newModel.Ktrans_ref], [self.newModel.Ve_ref]],
-
-                            [['Reference Ktrans'], ['Reference Ve']],
-
-                            [['Calculated Ktrans'], ['Calculated Ve']],
-
-                            [['Distribution plot of Ktrans'], ['Distribution plot of Ve']],
-
-                            [[minLim_x_K - spacing_x_K, maxLim_x_K + spacing_x_K], [minLim_x_V - spacing_x_V, maxLim_x_V + spacing_x_V]],
-
-                            [[minLim_y_K - spacing_y_K, maxLim_y_K + 2*spacing_y_K], [minLim_y_V - spacing_y_V, maxLim_y_V + 2*spacing_y_V]])
-
-
     def OnExportToFolder(self, desDir):
         '''
         export the files as .png, excel
@@ -1656,13 +1379,13 @@ class MainWindow_KV(MainWindow):
             return
 
         try:
-            self.figureHist_Ktrans.savefig(os.path.join(saveDir, 'LoA_K.png'))
+            self.figureLoA_Ktrans.savefig(os.path.join(saveDir, 'LoA_K.png'))
         except:
             self.SetStatusText('Please close related files and try to export again.')
             return
 
         try:
-            self.figureHist_Ve.savefig(os.path.join(saveDir, 'LoA_V.png'))
+            self.figureLoA_Ve.savefig(os.path.join(saveDir, 'LoA_V.png'))
         except:
             self.SetStatusText('Please close related files and try to export again.')
             return
@@ -1674,52 +1397,8 @@ class MainWindow_KV(MainWindow):
             return
 
         # export the table to excel
-        book = Workbook()
-        sheetNaN = book.add_sheet('NaN percentage')
-        sheetMean = book.add_sheet('Mean')
-        sheetStd = book.add_sheet('Standard deviation')
-        sheetMedian = book.add_sheet('Median')
-        sheet1Qtl = book.add_sheet('1st quartiel')
-        sheet3Qtl = book.add_sheet('3rd quartiel')
-        sheetMin = book.add_sheet('Minimum')
-        sheetMax = book.add_sheet('Maximum')
-        sheetCov = book.add_sheet('Covariance')
-        sheetCor = book.add_sheet('Correlation')
-        sheetRMS = book.add_sheet('RMS')
-        sheetCCC = book.add_sheet('CCC')
-        sheetFit = book.add_sheet('Model fitting')
-        sheetT = book.add_sheet('T-test results')
-        sheetU = book.add_sheet('U-test results')
-        sheetChiq = book.add_sheet('Chi-square test results')
-        sheetA = book.add_sheet('ANOVA results')
-
-        QIBA_functions.WriteToExcelSheet_GKM_percentage(sheetNaN, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_NaN_percentage, self.newModel.Ve_NaN_percentage], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetMean, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_mean, self.newModel.Ve_cal_patch_mean], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetStd, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_deviation, self.newModel.Ve_cal_patch_deviation], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetMedian, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_median, self.newModel.Ve_cal_patch_median], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheet1Qtl, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_1stQuartile, self.newModel.Ve_cal_patch_1stQuartile], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheet3Qtl, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_3rdQuartile, self.newModel.Ve_cal_patch_3rdQuartile], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetMin, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_min, self.newModel.Ve_cal_patch_min], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetMax, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_max, self.newModel.Ve_cal_patch_max], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_GKM_co(sheetCor, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.corr_KK,self.newModel.corr_KV,self.newModel.corr_VK,self.newModel.corr_VV], 1, self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_co(sheetCov, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.cov_KK,self.newModel.cov_KV,self.newModel.cov_VK,self.newModel.cov_VV], 1, self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetCCC, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_ccc, self.newModel.Ve_ccc], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_GKM_statistics(sheetRMS, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_rms, self.newModel.Ve_rms], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-
-
-        QIBA_functions.WriteToExcelSheet_GKM_fit(sheetFit, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.a_lin_Ktrans, self.newModel.b_lin_Ktrans, self.newModel.r_squared_lin_K, self.newModel.a_log_Ktrans,self.newModel.b_log_Ktrans,self.newModel.a_lin_Ve, self.newModel.b_lin_Ve, self.newModel.r_squared_lin_V, self.newModel.a_log_Ve,self.newModel.b_log_Ve], 1, self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_GKM_test(sheetT, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_ttest_t, self.newModel.Ktrans_cal_patch_ttest_p, self.newModel.Ve_cal_patch_ttest_t, self.newModel.Ve_cal_patch_ttest_p], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn, 'T-statistics')
-        QIBA_functions.WriteToExcelSheet_GKM_test(sheetU, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_Utest_u, self.newModel.Ktrans_cal_patch_Utest_p, self.newModel.Ve_cal_patch_Utest_u, self.newModel.Ve_cal_patch_Utest_p], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn, 'U-value')
-
-        QIBA_functions.WriteToExcelSheet_GKM_A(sheetA, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_ANOVA_f,self.newModel.Ktrans_cal_patch_ANOVA_p,self.newModel.Ve_cal_patch_ANOVA_f,self.newModel.Ve_cal_patch_ANOVA_p], 1, self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_GKM_test(sheetChiq, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.Ktrans_cal_patch_Chisquare_c, self.newModel.Ktrans_cal_patch_Chisquare_p, self.newModel.Ve_cal_patch_Chisquare_c, self.newModel.Ve_cal_patch_Chisquare_p], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn, 'Chiq')
-
         try:
-            book.save(os.path.join(saveDir, 'results.xls'))
+            QIBA_batch.ExportToExcel(self.newModel, 'GKM', os.path.join(saveDir, 'results.xls'))
         except:
             self.SetStatusText('Please close related files and try to export again.')
             return
@@ -1730,68 +1409,13 @@ class MainWindow_KV(MainWindow):
 
     def GetResultInHtml(self):
         # render the figures, tables into html, for exporting to pdf
-        htmlContent = ''
-        self.figureImagePreview.savefig(os.path.join(os.getcwd(), 'temp', 'figureImages.png'))
-        self.figureScatter.savefig(os.path.join(os.getcwd(), 'temp', 'figureScatters.png'))
-        self.figureHist_Ktrans.savefig(os.path.join(os.getcwd(), 'temp', 'figureHist_K.png'))
-        self.figureHist_Ve.savefig(os.path.join(os.getcwd(), 'temp', 'figureHist_V.png'))
-        self.figureHist_Ktrans.savefig(os.path.join(os.getcwd(), 'temp', 'figureLoA_K.png'))
-        self.figureHist_Ve.savefig(os.path.join(os.getcwd(), 'temp', 'figureLoA_V.png'))
-        self.figureBoxPlot.savefig(os.path.join(os.getcwd(), 'temp', 'figureBoxPlots.png'))
-
-        htmlContent += self.newModel.packInHtml('<h1 align="center">QIBA DRO Evaluation Tool Results Report<br>(Ktrans-Ve)</h1>')
-
-        htmlContent += self.newModel.packInHtml('''
-        <h2 align="center">The image view of calculated Ktrans and Ve</h2>''' +\
-        '''<img src="''' + os.path.join(os.getcwd(), 'temp', 'figureImages.png') + '''" style="width:100%"> <br>'''+\
-        '''<p><font face="verdana">* The first column shows the calculated Ktrans and Ve in black and white. You can have a general impression of the value distribution according to the changing of the parameters. Generally the brighter the pixel is, the higher the calculated value is.<br>
-        <br>The Second column shows the error map between calculated and reference data. Each pixel is the result of corresponding pixel in calculated data being subtracted with that in the reference data. Generally the more the color approaches to the red direction, the larger the error is.<br>
-        <br>The third column shows the normalized error. This is out of the consideration that the error could be related with the original value itself. Therefore normalized error may give a more uniformed standard of the error level. Each pixel's value comes from the division of the error by the reference pixel value. Similarly as the error map, the more the color approaches to the red direction, the larger the normalized error is.
-        </p>''' )
-
-        htmlContent += self.newModel.packInHtml( '''
-        <h2 align="center">The scatter plots of calculated Ktrans and Ve</h2>
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureScatters.png') + '''" style="width:100%"> <br>'''+\
-        '''<p><font face="verdana">* For the reference data, the pixel values in one row (for Ktrans) or column (for Ve) share the same constant value. Therefore in the scatter plot it shows that all green dots of a row (or column) overlap to each other. For the calculated data, as they share the same parameter, the blue dots align to the same x-axis. But they may scatter vertically, showing there's variance of the value in a row (or column).<br>
-        <br>From these plots you can see the trend of the values, which offer some information of which model (e.g. linear or logarithmic) the calculated parameter may fit. For example, with the artificial calculated data which were generated from the reference data by adding Gaussian noise, scaling by two and adding 0.5, it can be easily read from the plots that the calculated data follow the linear model, and have scaling factor and extra bias value.
-        </p>''' )
-
-        htmlContent += self.newModel.packInHtml('''
-        <h2 align="center">The histograms of calculated Ktrans and Ve</h2>
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureHist_K.png') + '''" style="width:50%" align="left">''' + '''
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureHist_V.png') + '''" style="width:50%" align="right"> <br>'''+\
-        '''<p><font face="verdana">* All histograms have the uniformed y-axis limits, so that the comparison among different patched is easier.  The minimum and maximum values of a patch are denoted on the x-axis for reference.
-        </p>''')
-
-        htmlContent += self.newModel.packInHtml('''
-        <h2 align="center">The box plots of calculated Ktrans and Ve</h2>
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureBoxPlots.png') + '''" style="width:100%"> <br>'''+\
-        '''<p><font face="verdana">* The vertical dash lines are used to separate the rows (or columns), as each box plot is responsible for one patch. From these plots you could see (roughly) the statistics of each patch, like the mean value, the 1st and 3rd quartile, the minimum and maximum value. The more precise value of those statistics could be found in the tab "Result in HTML viewer".
-        </p>''')
-
-        htmlContent += self.newModel.NaNPercentageInHTML
-
-        htmlContent += self.newModel.StatisticsInHTML
-
-        htmlContent += self.newModel.covCorrResultsInHtml
-
-        htmlContent += self.newModel.CCCResultInHTML
-
-        htmlContent += self.newModel.RMSResultInHTML
-
-        htmlContent += self.newModel.TDIResultInHTML
-
-        htmlContent += self.newModel.ModelFittingInHtml
-
-        htmlContent += self.newModel.T_testResultInHTML
-
-        htmlContent += self.newModel.U_testResultInHTML
-
-        htmlContent += self.newModel.Chiq_testResultInHTML
-
-        htmlContent += self.newModel.ANOVAResultInHTML
-
-        return htmlContent
+        figures = {'maps': self.figureImagePreview, 'scatters': self.figureScatter, 'hist_K': self.figureHist_Ktrans, 'hist_V': self.figureHist_Ve,
+                   'LoA_K': self.figureLoA_Ktrans, 'LoA_V': self.figureLoA_Ve, 'boxplot': self.figureBoxPlot}
+        figurePaths = {}
+        for name, figure in figures.items():
+            figurePaths[name] = os.path.join(os.getcwd(), 'temp', name + '.png')
+            figure.savefig(figurePaths[name])
+        return QIBA_report.GetResultInHtml(self.newModel, self.mode, figurePaths)
 
 class MainWindow_T1(MainWindow):
     '''
@@ -1801,6 +1425,7 @@ class MainWindow_T1(MainWindow):
         MainWindow.__init__(self, None, appName, calFiles, refFiles, desDir)
 
         self.patchLen = 10
+        self.mode = 'T1'
         self.WARNINGTEXT = False
 
         # default files' paths
@@ -1856,9 +1481,11 @@ class MainWindow_T1(MainWindow):
         '''
         load the reference data, and get the image size
         '''
-        self.ref_T1, nrOfRow, nrOfColumn, fileType = QIBA_functions.ImportRawFile(self.path_ref_T1, self.patchLen)
+        # the image size is read from the file header, the image is only imported for showing it
+        agree, nrOfRow, nrOfColumn = QIBA_functions.ProbeGrid([self.path_ref_T1], self.patchLen)
         self.nrOfRow = nrOfRow - 1
         self.nrOfColumn = nrOfColumn
+        self.ref_T1 = QIBA_functions.ImportRawFile(self.path_ref_T1, self.patchLen)[0]
 
     def SetupStartPage(self):
         '''
@@ -2068,36 +1695,7 @@ class MainWindow_T1(MainWindow):
     def DrawHistograms(self):
         # draw histograms of imported calculated maps, so that the user can have a look of the distribution of each patch.
 
-        pixelCountInPatch = self.newModel.patchLen ** 2
-        nrOfBins = 10
-
-        self.figureHist_T1.suptitle('The histogram of the calculated T1',) # fontsize = 18)
-
-        for i in range(self.newModel.nrOfRows):
-            for j in range(self.newModel.nrOfColumns):
-                subPlot_T1 = self.figureHist_T1.add_subplot(self.newModel.nrOfRows, self.newModel.nrOfColumns, i * self.newModel.nrOfColumns + j + 1)
-                # subPlot_K.clear()
-                processedData_T1 = QIBA_functions.DealNaN(self.newModel.T1_cal[i][j])[0]
-                subPlot_T1.hist(processedData_T1, nrOfBins) # normed=True if want the bars to be normalized
-                minPatch_T1 = numpy.min(processedData_T1)
-                maxPatch_T1 = numpy.max(processedData_T1)
-                meanPatch_T1 = numpy.mean(processedData_T1)
-
-                minPatch_T1 = QIBA_functions.formatFloatTo2DigitsString(minPatch_T1)
-                maxPatch_T1 = QIBA_functions.formatFloatTo2DigitsString(maxPatch_T1)
-                meanPatch_T1 = QIBA_functions.formatFloatTo2DigitsString(meanPatch_T1)
-
-                subPlot_T1.set_xticks([float(minPatch_T1), float(maxPatch_T1)])
-
-                subPlot_T1.set_xticklabels([minPatch_T1, maxPatch_T1])
-                subPlot_T1.axvline(float(meanPatch_T1), color = 'r', linestyle = 'dashed', linewidth = 1) # draw a vertical line at the mean value
-                subPlot_T1.set_ylim([0, pixelCountInPatch])
-                subPlot_T1.text(float(meanPatch_T1), 0.9 * pixelCountInPatch, meanPatch_T1, size = 'x-small') # parameters: location_x, location_y, text, size
-                if i == 0:
-                    subPlot_T1.set_xlabel(self.newModel.headersHorizontal[j])
-                    subPlot_T1.xaxis.set_label_position('top')
-                if j == 0:
-                    subPlot_T1.set_ylabel(self.newModel.headersVertical[i])
+        QIBA_report.DrawHistograms([self.figureHist_T1], self.newModel, self.mode)
         self.pageHistogram.Layout()
         self.pageHistogram.SetupScrolling()
 
@@ -2128,8 +1726,6 @@ class MainWindow_T1(MainWindow):
         # double click
         wx.EVT_LEFT_DCLICK(self.canvasHist_T1, self.toolbar_hist.home)
 
-        self.figureHist_T1.tight_layout(pad=0.4, w_pad=0.1, h_pad=1.0)
-        self.figureHist_T1.subplots_adjust(top = 0.94)
         self.canvasHist_T1.draw()
 
 
@@ -2147,29 +1743,7 @@ class MainWindow_T1(MainWindow):
         draw box plots of each patch
         '''
 
-        subPlot_R1 = self.figureBoxPlot.add_subplot(1, 1, 1)
-        subPlot_R1.clear()
-        temp = []
-        # referValue_R1 = []
-        for j in range(self.newModel.nrOfColumns):
-            temp_temp = []
-            for element in zip(*self.newModel.R1_cal)[j]:
-                temp_temp.append(QIBA_functions.DealNaN(element)[0])
-            temp.extend(temp_temp)
-            # referValue_R1.append(QIBA_functions.formatFloatTo2DigitsString(self.newModel.T1_ref[j][0][0]))
-        subPlot_R1.boxplot(temp, notch = 1, sym = 'r+', whis=1.5)
-
-        # decorate R1 plot
-        subPlot_R1.set_title('Box plot of R1 from calculated T1')
-        subPlot_R1.set_xlabel('The result shows the R1 patches from calculated T1, concatenated in columns')
-        subPlot_R1.set_ylabel('Calculated values in patches')
-
-        subPlot_R1.xaxis.set_major_formatter(ticker.NullFormatter())
-        # subPlot_R1.xaxis.set_minor_locator(ticker.FixedLocator([8, 23, 38, 53, 68, 83]))
-        subPlot_R1.xaxis.set_minor_locator(ticker.FixedLocator([4, 11, 18, 25, 32, 39, 46, 53, 60, 67, 74, 81, 88, 95, 102]))
-        subPlot_R1.xaxis.set_minor_formatter(ticker.FixedFormatter(self.newModel.headersHorizontal))
-        for j in range(self.newModel.nrOfColumns):
-            subPlot_R1.axvline(x = self.newModel.nrOfRows * j + 0.5, color = 'green', linestyle = 'dashed')
+        QIBA_report.DrawBoxPlot(self.figureBoxPlot, self.newModel, self.mode)
 
         # setup the toolbar
         self.toolbar_box = NavigationToolbar(self.canvasBoxPlot)
@@ -2197,7 +1771,6 @@ class MainWindow_T1(MainWindow):
         # double click
         wx.EVT_LEFT_DCLICK(self.canvasBoxPlot, self.toolbar_box.home)
 
-        self.figureBoxPlot.tight_layout()
         self.canvasBoxPlot.draw()
         self.rightPanel.Layout()
 
@@ -2210,45 +1783,6 @@ class MainWindow_T1(MainWindow):
         else:
             pass
 
-    def DrawMaps(self):
-        # draw the maps of the preview and error
-        self.PlotPreview([[self.newModel.T1_cal_inRow], [self.newModel.T1_error], [self.newModel.T1_error_normalized],],
-
-                                [['Calculated T1'], ['Error map of T1'], ['Normalized Error map of T1'],],
-
-                                [['bone'], ['rainbow'], ['rainbow'], ],
-
-                                [['T1[ms]'], ['Delta T1[ms]'], ['Normalized error[%]'],])
-
-    def DrawScatter(self):
-        # draw the scatters
-        if self.SCATTER_SWITCH:
-            minLim_x = numpy.min(self.newModel.T1_ref_inRow)
-            maxLim_x = numpy.max(self.newModel.T1_ref_inRow)
-            minLim_y = numpy.min([numpy.min(self.newModel.T1_ref_inRow), numpy.min(self.newModel.T1_cal_inRow)])
-            maxLim_y = numpy.max([numpy.max(self.newModel.T1_ref_inRow), numpy.max(self.newModel.T1_cal_inRow)])
-        else:
-            minLim_x = numpy.min(self.newModel.T1_ref_patchValue)
-            maxLim_x = numpy.max(self.newModel.T1_ref_patchValue)
-            minLim_y = numpy.min([numpy.min(self.newModel.T1_ref_patchValue), numpy.min(self.newModel.T1_cal_patchValue)])
-            maxLim_y = numpy.max([numpy.max(self.newModel.T1_ref_patchValue), numpy.max(self.newModel.T1_cal_patchValue)])
-
-        spacing_x = (maxLim_x - minLim_x) * 0.05
-        spacing_y = (maxLim_y - minLim_y) * 0.05
-        self.PlotScatter([[self.newModel.T1_cal],],
-
-                            [[self.newModel.T1_ref],],
-
-                            [['Reference T1'],],
-
-                            [['Calculated T1'],],
-
-                            [['Distribution plot of T1'],],
-
-                            [[minLim_x - spacing_x, maxLim_x + spacing_x],],
-
-                            [[minLim_y - spacing_y, maxLim_y + spacing_y],])
-
     def OnExportToFolder(self, desDir):
         '''
         export the files as .png, excel
@@ -2288,46 +1822,8 @@ class MainWindow_T1(MainWindow):
             return
 
         # export to excel
-        book = Workbook()
-        sheetNaN = book.add_sheet('NaN percentage')
-        sheetMean = book.add_sheet('Mean')
-        sheetStd = book.add_sheet('Standard deviation')
-        sheetMedian = book.add_sheet('Median')
-        sheet1Qtl = book.add_sheet('1st quartiel')
-        sheet3Qtl = book.add_sheet('3rd quartiel')
-        sheetMin = book.add_sheet('Minimum')
-        sheetMax = book.add_sheet('Maximum')
-        sheetCov = book.add_sheet('Covariance')
-        sheetCor = book.add_sheet('Correlation')
-        sheetCCC = book.add_sheet('CCC')
-        sheetFit = book.add_sheet('Model fitting')
-        sheetT = book.add_sheet('T-test results')
-        sheetU = book.add_sheet('U-test results')
-        sheetChiq = book.add_sheet('Chi-square-test results')
-
-        QIBA_functions.WriteToExcelSheet_T1_percentage(sheetNaN, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_NaN_percentage], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetMean, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_mean], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetStd, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_deviation], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetMedian, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_median], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheet1Qtl, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_1stQuartile], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheet3Qtl, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_3rdQuartile], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetMin, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_min], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetMax, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_max], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_T1_co(sheetCor, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.corr_T1T1], 1, self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_co(sheetCov, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.cov_T1T1], 1, self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_T1_statistics(sheetCCC, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_ccc], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn)
-
-        QIBA_functions.WriteToExcelSheet_T1_fit(sheetFit, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.a_lin_T1, self.newModel.b_lin_T1, self.newModel.r_squared_lin_T1, self.newModel.a_log_T1,self.newModel.b_log_T1], 1, self.nrOfRow, self.nrOfColumn)
-        QIBA_functions.WriteToExcelSheet_T1_test(sheetT, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_ttest_t, self.newModel.T1_cal_patch_ttest_p], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn, 'T-statistics')
-        QIBA_functions.WriteToExcelSheet_T1_test(sheetU, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_Utest_u, self.newModel.T1_cal_patch_Utest_p], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn, 'U-value')
-
-        QIBA_functions.WriteToExcelSheet_T1_test(sheetChiq, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_chisquare_c, self.newModel.T1_cal_patch_chisquare_p], int(self.nrOfColumn/2), self.nrOfRow, self.nrOfColumn, 'Chiq')
-
-        # QIBA_functions.WriteToExcelSheet_T1_A(sheetA, self.newModel.headersHorizontal, self.newModel.headersVertical, [self.newModel.T1_cal_patch_ANOVA_f,self.newModel.T1_cal_patch_ANOVA_p], 1, self.nrOfRow, self.nrOfColumn)
         try:
-            book.save(os.path.join(saveDir, 'results.xls'))
+            QIBA_batch.ExportToExcel(self.newModel, 'T1', os.path.join(saveDir, 'results.xls'))
         except:
             self.SetStatusText('Please close related files and try to export again.')
             return
@@ -2335,58 +1831,12 @@ class MainWindow_T1(MainWindow):
 
     def GetResultInHtml(self):
         # render the figures, tables into html, for exporting to pdf
-        htmlContent = ''
-        self.figureImagePreview.savefig(os.path.join(os.getcwd(), 'temp', 'figureImages.png'))
-        self.figureScatter.savefig(os.path.join(os.getcwd(), 'temp', 'figureScatters.png'))
-        self.figureHist_T1.savefig(os.path.join(os.getcwd(), 'temp', 'figureHist_T1.png'))
-        self.figureBoxPlot.savefig(os.path.join(os.getcwd(), 'temp', 'figureBoxPlots.png'))
-
-        htmlContent += self.newModel.packInHtml('<h1 align="center">QIBA DRO Evaluation Tool Results Report<br>(T1)</h1>')
-
-        htmlContent += self.newModel.packInHtml('''
-        <h2 align="center">The image view of calculated T1''' +\
-        '''<img src="''' + os.path.join(os.getcwd(), 'temp', 'figureImages.png') + '''" style="width:100%"> <br>'''+\
-        '''<p><font face="verdana">* The first row shows the calculated T1 in black and white. You can have a general impression of the value distribution according to the changing of the parameters. Generally the brighter the pixel is, the higher the calculated value is.<br>
-        <br>The Second row shows the error map between calculated and reference data. Each pixel is the result of corresponding pixel in calculated data being subtracted with that in the reference data. Generally the more the color approaches to the red direction, the larger the error is.<br>
-        <br>The third row shows the normalized error. This is out of the consideration that the error could be related with the original value itself. Therefore normalized error may give a more uniformed standard of the error level. Each pixel's value comes from the division of the error by the reference pixel value. Similarly as the error map, the more the color approaches to the red direction, the larger the normalized error is.
-        </p>''' )
-
-        htmlContent += self.newModel.packInHtml( '''
-        <h2 align="center">The scatter plots of calculated T1</h2>
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureScatters.png') + '''" style="width:100%"> <br>'''+\
-        '''<p><font face="verdana">* For the reference data, the pixel values in rows contains different values(details please refer to the file description). Therefore in the scatter plot it shows that all green dots of a row (or column) overlap to each other. For the calculated data, as they share the same parameter, the blue dots align to the same x-axis. But they may scatter vertically, showing there's variance of the value in a row (or column).<br>
-        <br>From these plots you can see the trend of the values, which offer some information of which model (e.g. linear or logarithmic) the calculated parameter may fit. For example, with the artificial calculated data which were generated from the reference data by adding Gaussian noise, scaling by two and adding 0.5, it can be easily read from the plots that the calculated data follow the linear model, and have scaling factor and extra bias value.
-        </p>''' )
-
-        htmlContent += self.newModel.packInHtml('''
-        <h2 align="center">The histograms of calculated T1</h2>
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureHist_T1.png') + '''" style="width:100%" align="right"> <br>'''+\
-        '''<p><font face="verdana">* All histograms have the uniformed y-axis limits, so that the comparison among different patched is easier.  The minimum and maximum values of a patch are denoted on the x-axis for reference.
-        </p>''')
-
-        htmlContent += self.newModel.packInHtml('''
-        <h2 align="center">The box plots of calculated T1</h2>
-        <img src="''' + os.path.join(os.getcwd(), 'temp', 'figureBoxPlots.png') + '''" style="width:100%"> <br>'''+\
-        '''<p><font face="verdana">* The vertical dash lines are used to separate the rows (or columns), as each box plot is responsible for one patch. From these plots you could see (roughly) the statistics of each patch, like the mean value, the 1st and 3rd quartile, the minimum and maximum value. The more precise value of those statistics could be found in the tab "Result in HTML viewer".
-        </p>''')
-
-        htmlContent += self.newModel.NaNPercentageInHTML
-
-        htmlContent += self.newModel.StatisticsInHTML
-
-        htmlContent += self.newModel.covCorrResultsInHtml
-
-        htmlContent += self.newModel.CCCResultInHTML
-
-        htmlContent += self.newModel.ModelFittingInHtml
-
-        htmlContent += self.newModel.T_testResultInHTML
-
-        htmlContent += self.newModel.U_testResultInHTML
-
-        htmlContent += self.newModel.ChiSquareTestResultInHTML
-
-        return htmlContent
+        figures = {'maps': self.figureImagePreview, 'scatters': self.figureScatter, 'histogram': self.figureHist_T1, 'boxplot': self.figureBoxPlot}
+        figurePaths = {}
+        for name, figure in figures.items():
+            figurePaths[name] = os.path.join(os.getcwd(), 'temp', name + '.png')
+            figure.savefig(figurePaths[name])
+        return QIBA_report.GetResultInHtml(self.newModel, self.mode, figurePaths)
 
 class MySelectionDialog(wx.Dialog):
     '''
@@ -2431,34 +1881,25 @@ def ProcessWithoutGUI(mode, calFiles, refFiles, desDir):
     '''
     evaluate without GUI, for purpose of batch processing
     '''
-    patchLen = 10
-    if mode == 'GKM':
-        window = MainWindow_KV("QIBA evaluate tool (GKM)", calFiles, refFiles, desDir)
-        print 'files loaded...'
-        window.Show()
-        window.Maximize(True)
-        window.Hide()
-        print 'start to eveluate...'
-        window.OnEvaluate(None)
-        print 'evaluation finished.'
-        print 'exporting result...'
-        window.OnExportToFolder(desDir)
-        window.OnExportToPDF(desDir)
-        print 'results exported.'
-
-    elif mode == "T1":
-        window = MainWindow_T1("QIBA evaluate tool (T1)", calFiles, refFiles, desDir)
-        window.Show()
-        window.Maximize(True)
-        window.Hide()
-        window.OnEvaluate(None)
-        window.OnExportToFolder(desDir)
-        window.OnExportToPDF(desDir)
+    QIBA_batch.EvaluateHeadless(mode, calFiles, refFiles, desDir)
 
 def main(argv):
+    # the batch processing needs no display, so it is done before the application object is generated
+    try:
+        opts, args = getopt.getopt(argv, "hb:m:c:r:d:", ["batch", "mode=", "cfile=", "rfile=", "destination="])
+    except getopt.GetoptError:
+        opts = []
+    if '-b' in [opt for opt, arg in opts]:
+        options = dict(opts)
+        try:
+            ProcessWithoutGUI(options.get('-m', 'GKM'), options.get('-c', ''), options.get('-r', ''), options.get('-d', ''))
+        except Exception as error:
+            print "Error occurs. Evaluation terminated: " + str(error)
+            exit(1)
+        return
+
     # generate the application object
     Application = wx.App()
-    ISCOMMAND = False
 
     # show the splash window
     DEBUG = True
@@ -2496,15 +1937,6 @@ def main(argv):
                     refFiles = arg
                 elif opt == "-d":
                     desDir = arg
-                elif opt == '-b':
-                    ISCOMMAND = True
-            if ISCOMMAND:
-                try:
-                    ProcessWithoutGUI(mode, calFiles, refFiles, desDir)
-                    return
-                except:
-                    print "Error occurs. Evaluation terminated."
-                    return
 
             # initialize the main window
             try:
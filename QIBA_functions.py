@@ -1,9 +1,9 @@
-from scipy import stats, optimize
+from scipy import stats
 from scipy.stats import norm
-import struct
 import dicom
 import numpy
 import os.path
+from multiprocessing.pool import ThreadPool
 import Image
 import TiffImagePlugin
 import ImageFile
@@ -29,6 +29,10 @@ def formatFloatTo4DigitsString(input):
     else:
         return  str('{:5.4f}'.format(float(input)))
 
+def formatIntervalTo4DigitsString(interval):
+    # format the (lower, upper) interval into a string with 4 digits
+    return '[' + formatFloatTo4DigitsString(interval[0]) + ', ' + formatFloatTo4DigitsString(interval[1]) + ']'
+
 def formatFloatTo2DigitsString(input):
     # format the float input into a string with 2 digits string
     if abs(input) < 0.01:
@@ -36,8 +40,9 @@ def formatFloatTo2DigitsString(input):
     else:
         return  str('{:4.2f}'.format(float(input)))
 
-def ImportFile(path, nrOfRows, nrOfColumns, patchLen, mode):
+def ImportFile(path, nrOfRows, nrOfColumns, patchLen, mode, memoryMap = False):
     # import a file.  Pre-process so that different file types have the same structure.
+    # with memoryMap, binary files are returned as read-only memory-mapped arrays, so only the pages being accessed are loaded.
 
     fileName, fileExtension = os.path.splitext(path)
     if fileExtension == '.dcm':
@@ -45,22 +50,12 @@ def ImportFile(path, nrOfRows, nrOfColumns, patchLen, mode):
         imArray = RescaleDICOM(ds, patchLen)
         return imArray
     elif fileExtension in ['.bin', '.raw']:
-        binaryData = []
-        rawData = open(path, 'rb').read()
-        fileLength = os.stat(path).st_size
-        if mode == 'GKM':
-            dataLength = fileLength / ((nrOfRows + 2) * nrOfColumns * patchLen * patchLen)
-        else:
-            dataLength = fileLength / ((nrOfRows + 1) * nrOfColumns * patchLen * patchLen)
-        if dataLength == 4:
-            dataType = 'f'
-        elif dataLength == 8:
-            dataType = 'd'
+        sidecar = ReadRawSidecar(path)
+        if sidecar:
+            binaryData = DecodeBinary(path, sidecar['dataType'], sidecar['byteOrder'], memoryMap)
         else:
-            dataType = 'f'
-        for i in range(fileLength / dataLength):
-            data = rawData[i * dataLength : (i + 1) * dataLength]
-            binaryData.append(struct.unpack(dataType, data)[0])
+            dataType = BinaryDataType(path, nrOfRows, nrOfColumns, patchLen, mode)
+            binaryData = DecodeBinary(path, dataType, memoryMap = memoryMap)
         imArray = SectionBin(binaryData, nrOfRows, nrOfColumns, patchLen, mode)
         return imArray
     elif fileExtension == '.tif':
@@ -72,6 +67,79 @@ def ImportFile(path, nrOfRows, nrOfColumns, patchLen, mode):
     else:
         return [], ''
 
+def MapConcurrently(function, argumentsList, nrOfWorkers = None):
+    # call the function once for each set of arguments at the same time on a thread pool, with one thread per call unless the number of workers is given.
+    # the results are returned in the order of the arguments.
+    pool = ThreadPool(nrOfWorkers or max(len(argumentsList), 1))
+    try:
+        return pool.map(lambda arguments: function(*arguments), argumentsList)
+    finally:
+        pool.close()
+        pool.join()
+
+def ImportFilesConcurrently(paths, nrOfRows, nrOfColumns, patchLen, mode, memoryMap = False):
+    # import several files with the same dimension at the same time, and return the imported maps in the order of the paths.
+    return MapConcurrently(ImportFile, [(path, nrOfRows, nrOfColumns, patchLen, mode, memoryMap) for path in paths])
+
+def ProbeFile(path):
+    # read only the header of a file, without the pixel data. return a dictionary with the 'fileType' and the number of pixel 'rows' and 'columns',
+    # for DICOM also the rescale 'slope' and 'intercept' and the 'bitsAllocated', for binary files with a sidecar also the 'dataType' and 'byteOrder'.
+    # the rows and columns are 0 if they can not be read from the file, e.g. for binary files without a sidecar.
+    fileName, fileExtension = os.path.splitext(path)
+    if fileExtension == '.dcm':
+        ds = dicom.read_file(path, stop_before_pixels = True)
+        return {'fileType': 'DICOM', 'rows': int(ds.Rows), 'columns': int(ds.Columns),
+                'slope': float(getattr(ds, 'RescaleSlope', 1)), 'intercept': float(getattr(ds, 'RescaleIntercept', 0)),
+                'bitsAllocated': int(getattr(ds, 'BitsAllocated', 0))}
+    elif fileExtension in ['.bin', '.raw']:
+        sidecar = ReadRawSidecar(path)
+        if sidecar:
+            sidecar['fileType'] = 'BINARY'
+            return sidecar
+        return {'fileType': 'BINARY', 'rows': 0, 'columns': 0}
+    elif fileExtension == '.tif':
+        im = Image.open(path) # the pixel data is not loaded until it is accessed
+        nrOfColumn, nrOfRow = im.size
+        return {'fileType': 'TIFF', 'rows': nrOfRow, 'columns': nrOfColumn}
+    else:
+        return {'fileType': '', 'rows': 0, 'columns': 0}
+
+def ReadRawSidecar(path):
+    # read the MetaImage header (.mhd) next to a binary file, e.g. 'Ktrans.mhd' for 'Ktrans.raw', which describes the dimension and the data type of the binary file.
+    # return None if there is no sidecar. the keys used are DimSize (columns rows), ElementType and BinaryDataByteOrderMSB.
+    fileName, fileExtension = os.path.splitext(path)
+    sidecarPath = fileName + '.mhd'
+    if not os.path.isfile(sidecarPath):
+        return None
+    elementTypes = {'MET_CHAR': 'i1', 'MET_UCHAR': 'u1', 'MET_SHORT': 'i2', 'MET_USHORT': 'u2', 'MET_INT': 'i4', 'MET_UINT': 'u4', 'MET_FLOAT': 'f4', 'MET_DOUBLE': 'f8'}
+    fields = {}
+    with open(sidecarPath, 'r') as sidecarFile:
+        for line in sidecarFile:
+            if '=' in line:
+                key, value = line.split('=', 1)
+                fields[key.strip()] = value.strip()
+    nrOfColumn, nrOfRow = [int(size) for size in fields['DimSize'].split()[:2]]
+    if fields.get('BinaryDataByteOrderMSB', 'False').lower() == 'true':
+        byteOrder = '>'
+    else:
+        byteOrder = '<'
+    return {'rows': nrOfRow, 'columns': nrOfColumn, 'dataType': elementTypes[fields.get('ElementType', 'MET_FLOAT')], 'byteOrder': byteOrder}
+
+def ProbeGrid(paths, patchLen):
+    # probe the headers of the files, to check if their dimensions agree. return whether they agree, and the number of rows and columns of patches.
+    # the files whose dimension can not be probed are not checked.
+    dimensions = set()
+    for path in paths:
+        header = ProbeFile(path)
+        if header['rows'] and header['columns']:
+            dimensions.add((header['rows'], header['columns']))
+    if len(dimensions) > 1:
+        return False, 0, 0
+    elif len(dimensions) == 0:
+        return True, 0, 0
+    nrOfRow, nrOfColumn = dimensions.pop()
+    return True, nrOfRow / patchLen, nrOfColumn / patchLen
+
 def ImportRawFile(path, patchLen):
     # import a file without cutting the head and tail lines, nor rescale. And return the dimension of the image.
     fileName, fileExtension = os.path.splitext(path)
@@ -96,77 +164,77 @@ def ImportBinaryFile(path, nrOfRows, nrOfColumns, patchLen, mode):
     '''
     import binary file
     '''
-
-    if mode == 'GKM':
-        bias = 2
-    else:
-        bias = 1
-
-    binaryData = []
-    rawData = open(path, 'rb').read()
-    fileLength = os.stat(path).st_size
-    dataLength = fileLength / ((nrOfRows + bias) * nrOfColumns * patchLen * patchLen)
-    if dataLength == 4:
-        dataType = 'f'
-    elif dataLength == 8:
-        dataType = 'd'
-    else:
-        dataType = 'f'
-    for i in range(fileLength / dataLength):
-        data = rawData[i * dataLength : (i + 1) * dataLength]
-        binaryData.append(struct.unpack(dataType, data)[0])
+    dataType = BinaryDataType(path, nrOfRows, nrOfColumns, patchLen, mode)
+    binaryData = DecodeBinary(path, dataType)
     sectioned = SectionBin(binaryData, nrOfRows, nrOfColumns, patchLen, mode)
     if mode == 'GKM':
         sectioned = sectioned[patchLen:-patchLen] # get rid of the first and the last row
     else:
         sectioned = sectioned[patchLen:]
-    rearranged = Rearrange(sectioned, nrOfRows, nrOfColumns, patchLen)
+    rearranged = PatchView(sectioned, nrOfRows, nrOfColumns, patchLen)
     return sectioned, rearranged
 
-def RescaleDICOM(ds, patchLen):
-    # rescale the DICOM file to remove the intercept and the slope. the 'pixel' in DICOM file means a row of pixels.
+def RescaleDICOM(ds, patchLen, dataType = numpy.float64):
+    # rescale the DICOM file to remove the intercept and the slope. the whole pixel array is rescaled at once and returned as a contiguous float array of dataType (float32 or float64).
     try:
-        rescaleIntercept = ds.RescaleIntercept
-        rescaleSlope = ds.RescaleSlope
+        rescaleIntercept = float(ds.RescaleIntercept)
+        rescaleSlope = float(ds.RescaleSlope)
     except:
         rescaleIntercept = 0
         rescaleSlope = 1
-        return ds.pixel_array
-    pixelFlow = []
-    for row in ds.pixel_array:
-        temp = []
-        for pixel in row:
-            temp.append(pixel * rescaleSlope + rescaleIntercept)
-        pixelFlow.append(temp)
-    return pixelFlow
+    pixelFlow = numpy.array(ds.pixel_array, dtype = dataType)
+    pixelFlow *= rescaleSlope
+    pixelFlow += rescaleIntercept
+    return numpy.ascontiguousarray(pixelFlow)
+
+def BinaryDataType(path, nrOfRows, nrOfColumns, patchLen, mode):
+    # decide the data type of a binary file from its size. 4 bytes per pixel are read as float, 8 bytes as double.
+    if mode == 'GKM':
+        bias = 2
+    else:
+        bias = 1
+    fileLength = os.stat(path).st_size
+    dataLength = fileLength / ((nrOfRows + bias) * nrOfColumns * patchLen * patchLen)
+    if dataLength == 8:
+        return 'f8'
+    else:
+        return 'f4'
+
+def DecodeBinary(path, dataType, byteOrder = '<', memoryMap = False):
+    # decode the whole binary file into a typed pixel flow in one call. the byte order is little-endian by default, use '>' for big-endian files.
+    # with memoryMap, the file is mapped read-only instead of being read into memory.
+    if memoryMap:
+        return numpy.memmap(path, dtype = numpy.dtype(byteOrder + dataType), mode = 'r')
+    return numpy.fromfile(path, dtype = numpy.dtype(byteOrder + dataType))
 
 def SectionBin(pixelFlow, nrOfRows, nrOfColumns, patchLen, mode):
-    # section the binary flow into DICOM fashioned order
+    # section the binary flow into DICOM fashioned order. memory-mapped flows are reshaped without being copied.
     if mode == 'GKM':
         bias = 2
     else:
         bias = 1
-    sectioned = [[]for i in range((nrOfRows + bias) * patchLen)]
-
-    for i in range ((nrOfRows+bias) * patchLen):
-        sectioned[i].extend(pixelFlow[nrOfColumns * patchLen * i : nrOfColumns * patchLen * (i + 1)] )
-    return sectioned
-
-
-def Rearrange(pixelFlow, nrOfRows, nrOfColumns, patchLen):
-    # rearrange the DICOM file so that the file can be accessed in patches and the top and bottom strips are removed as they are not used here.
-    tempAll = []
-    tempRow = []
-    tempPatch = []
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            for k in range(patchLen):
-                tempPatch.extend(pixelFlow[i * patchLen + k][j * patchLen : (j + 1) * patchLen])
-            tempRow.append(tempPatch)
-            tempPatch = []
-        tempAll.append(tempRow)
-        tempRow = []
-    return tempAll
+    nrOfPixelRows = (nrOfRows + bias) * patchLen
+    nrOfPixelColumns = nrOfColumns * patchLen
+    pixelFlow = numpy.asarray(pixelFlow)
+    return pixelFlow[:nrOfPixelRows * nrOfPixelColumns].reshape(nrOfPixelRows, nrOfPixelColumns)
+
+
+def PatchView(pixelFlow, nrOfRows, nrOfColumns, patchLen):
+    # view the image in row order as patches, so that the file can be accessed in patches as [row][column] without copying any pixel.
+    # the view has the shape (nrOfRows, nrOfColumns, patchLen, patchLen) and shares the memory with the image, so writing to a patch writes to the image.
+    # a flat (nrOfRows, nrOfColumns, patchLen * patchLen) layout can not be expressed with strides on a row ordered image.
+    pixelFlow = numpy.asarray(pixelFlow)
+    pixelFlow = pixelFlow[:nrOfRows * patchLen, :nrOfColumns * patchLen]
+    return pixelFlow.reshape(nrOfRows, patchLen, nrOfColumns, patchLen).swapaxes(1, 2)
+
+def WritableMap(inMap, copy = False):
+    # return the map itself if it can be written and holds floats, otherwise a copy of it (e.g. for read-only memory-mapped maps).
+    # maps of integers (e.g. binary files of MET_SHORT) are copied as float64, so that they can hold NaN.
+    inMap = numpy.asarray(inMap)
+    isFloat = numpy.issubdtype(inMap.dtype, numpy.floating)
+    if copy or not isFloat or not inMap.flags.writeable:
+        inMap = numpy.array(inMap, dtype = inMap.dtype if isFloat else numpy.float64)
+    return inMap
 
 def CalculateError(cal, ref):
     # compare the calculated and reference files, and return the error
@@ -208,145 +276,273 @@ def EstimatePatch(dataInPatch, patchValueMethod, nrOfRows, nrOfColumns):
                 temp[i].append(numpy.median(DealNaN(dataInPatch[i][j])[0]))
     return temp
 
-def FittingLinearModel(calculated, reference, dimensionIndex):
-    # fitting the linear model
-    temp_slope = []
-    temp_intercept = []
-    temp_rSquared = []
-
-    for i in range(dimensionIndex):
-        slope, intercept, r, p, stderr = stats.linregress(reference[i], calculated[i])
-        temp_slope.append(slope)
-        temp_intercept.append(intercept)
-        temp_rSquared.append(r**2)
-
-    return temp_slope, temp_intercept, temp_rSquared
-
-def func_for_log_calculation(x, a, b):
-    # assistant function for calculating logarithmic model fitting
-    return a + b * numpy.log10(x)
-
-def FittingLogarithmicModel(calculated, reference, dimensionIndex):
-    # fit the calculated data with reference data in logarithmic model
-
-    temp_a = []
-    temp_b = []
-
-    for i in range(dimensionIndex):
-        postCal = numpy.array(calculated[i])
-        postCal = DealNaN(postCal)[0]
-        postRef = numpy.array(reference[i])
-        postRef = postRef[~DealNaN(calculated[i])[1]]
-        if len(postRef)in (0,1):
-            popt = [numpy.nan, numpy.nan]
-        else:
-            popt, pcov = optimize.curve_fit(func_for_log_calculation, postRef, postCal)
-        temp_a.append(popt[0])
-        temp_b.append(popt[1])
-
-    return temp_a, temp_b
-
-def CalCorrMatrix(calculatedPatchValue, referencePatchValue):
-    # calculate the correlation matrix of the calculated and reference DICOMs
-    return numpy.corrcoef(calculatedPatchValue, referencePatchValue)
-
-def CalCovMatrix(calculatedPatchValue, referencePatchValue):
-    # calculate the covariance matrix of the calculated and reference DICOMs
-    return  numpy.cov(calculatedPatchValue, referencePatchValue)
-
-def CalculateMean(inPatch, nrOfRows, nrOfColumns):
-    # calculate the mean value of each patch
-    temp = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            temp[i].append(numpy.mean(DealNaN(inPatch[i][j])[0]))
-    return temp
-
-def CalculateMedian(inPatch, nrOfRows, nrOfColumns):
-    # calculate the median value of each patch
-    temp = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            temp[i].append(numpy.median(DealNaN(inPatch[i][j])[0]))
-    return temp
-
-def CalculateSTDDeviation(inPatch, nrOfRows, nrOfColumns):
-    # calculate the std deviation of each patch
-    temp = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            temp[i].append(numpy.std(DealNaN(inPatch[i][j])[0]))
-    return temp
-
-def Calculate1stAnd3rdQuartile(inPatch, nrOfRows, nrOfColumns):
-    # calculate the 1st and 3rd quartile of each patch
-    temp1stQuartile = [[]for i in range(nrOfRows) ]
-    temp3rdQuartile = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            temp1stQuartile[i].append(stats.mstats.mquantiles(DealNaN(inPatch[i][j])[0],prob = 0.25))
-            temp3rdQuartile[i].append(stats.mstats.mquantiles(DealNaN(inPatch[i][j])[0],prob = 0.75))
-    return temp1stQuartile, temp3rdQuartile
-
-def CalculateMinAndMax(inPatch, nrOfRows, nrOfColumns):
-    # calculated the min. and max value of each patch
-    tempMin = [[]for i in range(nrOfRows) ]
-    tempMax = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            tempMin[i].append(numpy.min(DealNaN(inPatch[i][j])[0]))
-            tempMax[i].append(numpy.max(DealNaN(inPatch[i][j])[0]))
-    return tempMin, tempMax
+def FittingLinearModel(calculated, reference, axis):
+    # fit calculated = slope * reference + intercept for each row (axis = 1) or each column (axis = 0) of the patch values at once. the patches with NaN are left out.
+    # return the slope, intercept, r squared, the standard errors of the slope and intercept, and their 95% confidence intervals of each row or column
+    return FittingLinearModelFromSums(PairSums(reference, calculated, axis))
+
+def FittingLogarithmicModel(calculated, reference, axis):
+    # fit calculated = a + b * log10(reference) for each row (axis = 1) or each column (axis = 0) of the patch values at once. the model is linear in log10(reference),
+    # so it is solved in closed form by least squares. the patches with NaN, or with a reference value which is not positive, are left out.
+    # return a, b, the standard errors of a and b, and the r squared of each row or column
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        logReference = numpy.log10(numpy.asarray(reference, dtype = float))
+    slope, intercept, slopeStdErr, interceptStdErr, rSquared = FittingLeastSquaresFromSums(PairSums(logReference, calculated, axis))
+    return list(intercept), list(slope), list(interceptStdErr), list(slopeStdErr), list(rSquared)
+
+def PairSums(x, y, axis):
+    # the sums of the (x, y) pairs along an axis: count, mean of x, mean of y, and the centred sums of squares of x, of y and of the products,
+    # i.e. sum((x - mean x)^2), sum((y - mean y)^2) and sum((x - mean x) * (y - mean y)). the pairs with NaN or infinite values are skipped.
+    x = numpy.asarray(x, dtype = float)
+    y = numpy.asarray(y, dtype = float)
+    valid = numpy.isfinite(x) & numpy.isfinite(y)
+    n = numpy.sum(valid, axis = axis)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        meanX = numpy.where(n > 0, numpy.sum(numpy.where(valid, x, 0), axis = axis) / n, 0)
+        meanY = numpy.where(n > 0, numpy.sum(numpy.where(valid, y, 0), axis = axis) / n, 0)
+        deviationX = numpy.where(valid, x - numpy.expand_dims(meanX, axis), 0)
+        deviationY = numpy.where(valid, y - numpy.expand_dims(meanY, axis), 0)
+    return numpy.array([n, meanX, meanY, numpy.sum(deviationX * deviationX, axis = axis), numpy.sum(deviationY * deviationY, axis = axis), numpy.sum(deviationX * deviationY, axis = axis)])
+
+def MergePairSums(sums, other):
+    # merge two sums of PairSums of disjoint pairs, as the pairwise update of Chan et al.: the centred sums grow by
+    # deltaX * deltaY * n_a * n_b / n, where the deltas are the differences of the two means
+    n_a, meanX, meanY, squaresX, squaresY, products = sums
+    n_b = other[0]
+    n = n_a + n_b
+    deltaX = other[1] - meanX
+    deltaY = other[2] - meanY
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        fraction = numpy.where(n > 0, n_b / n, 0)
+    return numpy.array([n, meanX + deltaX * fraction, meanY + deltaY * fraction, squaresX + other[3] + deltaX * deltaX * n_a * fraction,
+                        squaresY + other[4] + deltaY * deltaY * n_a * fraction, products + other[5] + deltaX * deltaY * n_a * fraction])
+
+def AccumulatePairSums(sums, x, y):
+    # add the (x, y) pairs of each column to the running sums of the column. the sums have the shape (6, nrOfColumns). used to fit and correlate along the columns band by band.
+    sums[:] = MergePairSums(sums, PairSums(x, y, 0))
+    return sums
+
+def FittingLeastSquaresFromSums(sums):
+    # fit y = intercept + slope * x by least squares from the sums of PairSums. return the slope, intercept, their standard errors and the r squared.
+    # the standard errors are derived from r as in scipy.stats.linregress, so that an exact line has no error.
+    n, meanX, meanY, squaresX, squaresY, products = sums
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        slope = products / squaresX
+        intercept = meanY - slope * meanX
+        r = numpy.clip(products / numpy.sqrt(squaresX * squaresY), -1, 1) # rounding may push r of an exact line just past 1
+        rSquared = r * r
+        residualVariance = numpy.where(squaresY > 0, (1 - rSquared) * squaresY, 0) / (n - 2)
+        slopeStdErr = numpy.sqrt(residualVariance / squaresX)
+        interceptStdErr = numpy.sqrt(residualVariance * (1.0 / n + meanX * meanX / squaresX))
+    return slope, intercept, slopeStdErr, interceptStdErr, rSquared
+
+def ConfidenceInterval(estimate, stdErr, degreesOfFreedom, confidence = 0.95):
+    # the two-sided confidence interval of an estimate with the student t distribution. return the lower and upper limits
+    with numpy.errstate(invalid = 'ignore'):
+        halfWidth = stats.t.ppf(0.5 + confidence / 2.0, degreesOfFreedom) * stdErr
+    return estimate - halfWidth, estimate + halfWidth
+
+def FittingLinearModelFromSums(sums):
+    # fit y = intercept + slope * x from the sums of PairSums or AccumulatePairSums. return the slope, intercept, r squared,
+    # the standard errors of the slope and intercept, and their 95% confidence intervals as (lower, upper) pairs
+    slope, intercept, slopeStdErr, interceptStdErr, rSquared = FittingLeastSquaresFromSums(sums)
+    degreesOfFreedom = numpy.maximum(sums[0] - 2, 0)
+    slopeCI = zip(*ConfidenceInterval(slope, slopeStdErr, degreesOfFreedom))
+    interceptCI = zip(*ConfidenceInterval(intercept, interceptStdErr, degreesOfFreedom))
+    return list(slope), list(intercept), list(rSquared), list(slopeStdErr), list(interceptStdErr), slopeCI, interceptCI
+
+def CalCorrAndCovFromSums(sums):
+    # the correlation coefficient and the covariance of each column from the sums of AccumulatePairSums
+    n, meanX, meanY, squaresX, squaresY, products = sums
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        correlation = products / numpy.sqrt(squaresX * squaresY)
+        covariance = products / (n - 1)
+    return list(correlation), list(covariance)
+
+def CalCorrAndCov(calculated, reference, axis):
+    # the correlation coefficient and the covariance between the calculated and reference patch values of each row (axis = 1) or each column (axis = 0),
+    # all at once from the pair sums. the patches with NaN are left out.
+    return CalCorrAndCovFromSums(PairSums(reference, calculated, axis))
+
+def PatchGroupSums(inPatch):
+    # the statistics of each patch as a group of the one-way ANOVA: group size, group mean (0 for an empty group) and the sum of squares within the group.
+    # each has the shape (nrOfRows, nrOfColumns), NaN are skipped. the pixels are shifted by the minimum of their patch first, so that a constant patch
+    # has exactly its value as the mean and no squares within.
+    pixels, valid = PixelsInPatch(inPatch)
+    groupSize = numpy.sum(valid, axis = 2)
+    shift = numpy.min(numpy.where(valid, pixels, numpy.inf), axis = 2)
+    shift = numpy.where(groupSize > 0, shift, 0)
+    deviations = numpy.where(valid, pixels - shift[:, :, numpy.newaxis], 0)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        meanDeviation = numpy.where(groupSize > 0, numpy.sum(deviations, axis = 2) / groupSize, 0)
+    squaresWithin = numpy.sum(numpy.where(valid, (deviations - meanDeviation[:, :, numpy.newaxis]) ** 2, 0), axis = 2)
+    return groupSize, shift + meanDeviation, squaresWithin
+
+def ANOVASums(groupSums, axis):
+    # combine the group statistics along an axis of the patches into the sums of the one-way ANOVA: number of groups, number of values, grand mean,
+    # the sum of squares between the groups and the sum of squares within the groups. the squares between the groups are summed from the centred
+    # group means, sum(n_i * (mean_i - grand mean)^2), so that they do not cancel out when the groups are nearly equal.
+    groupSize, groupMean, squaresWithin = groupSums
+    n = numpy.sum(groupSize, axis = axis)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        grandMean = numpy.where(n > 0, numpy.sum(groupSize * groupMean, axis = axis) / n, 0)
+    squaresBetween = numpy.sum(groupSize * (groupMean - numpy.expand_dims(grandMean, axis)) ** 2, axis = axis)
+    return numpy.array([numpy.sum(groupSize > 0, axis = axis), n, grandMean, squaresBetween, numpy.sum(squaresWithin, axis = axis)])
+
+def MergeANOVASums(sums, other):
+    # merge two sums of ANOVASums of disjoint groups, as the pairwise update of Chan et al.: the squares between the groups grow by
+    # delta^2 * n_a * n_b / n, where delta is the difference of the two grand means
+    nrOfGroups, n_a, mean_a, squaresBetween, squaresWithin = sums
+    n_b, mean_b = other[1], other[2]
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        fraction = numpy.where(n > 0, n_b / n, 0)
+    return numpy.array([nrOfGroups + other[0], n, mean_a + delta * fraction, squaresBetween + other[3] + delta * delta * n_a * fraction, squaresWithin + other[4]])
+
+def AccumulateANOVASums(sums, inPatch):
+    # add the patches of a band to the running sums of the one-way ANOVA along each column, where each patch is a group.
+    # the sums have the shape (5, nrOfColumns)
+    sums[:] = MergeANOVASums(sums, ANOVASums(PatchGroupSums(inPatch), 0))
+    return sums
+
+def ANOVA_OneWayFromSums(sums):
+    # the f-value and p-value of the one-way ANOVA of each column from the sums of AccumulateANOVASums.
+    # as scipy.stats.f_oneway, they are NaN if there is no variance within the groups.
+    nrOfGroups, n, grandMean, squaresBetween, squaresWithin = sums
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        f = (numpy.maximum(squaresBetween, 0) / (nrOfGroups - 1)) / (squaresWithin / (n - nrOfGroups))
+        f = numpy.where(squaresWithin > 0, f, numpy.nan)
+        p = stats.f.sf(f, nrOfGroups - 1, n - nrOfGroups)
+    return list(f), list(p)
+
+def CalculatePatchStatistics(inPatch):
+    '''
+    calculate the descriptive statistics of all the patches in one pass: the mean, median, std. deviation, 1st and 3rd quartile, min. and max. value of each patch.
+    the NaN in the patches are left out. the quartiles are estimated in the same way as scipy.stats.mstats.mquantiles.
+    return a dictionary of maps in the shape (nrOfRows, nrOfColumns)
+    '''
+    inPatch = numpy.asarray(inPatch, dtype = numpy.float64)
+    pixels = inPatch.reshape(inPatch.shape[0], inPatch.shape[1], -1)
+    valid = ~numpy.isnan(pixels)
+    n = numpy.sum(valid, axis = 2)
+    empty = (n == 0)
+    sortedPixels = numpy.sort(pixels, axis = 2) # the NaN are sorted to the end of each patch
+    rowIndex, columnIndex = numpy.indices(n.shape)
+
+    def SortedValue(k):
+        # the k-th smallest value of each patch
+        k = numpy.clip(k, 0, pixels.shape[2] - 1).astype(int)
+        return sortedPixels[rowIndex, columnIndex, k]
+
+    def Quantile(prob):
+        # mquantiles with the default alphap = betap = 0.4
+        aleph = n * prob + 0.4 + prob * (1 - 0.4 - 0.4)
+        k = numpy.floor(numpy.clip(aleph, 1, numpy.maximum(n - 1, 1)))
+        gamma = numpy.clip(aleph - k, 0, 1)
+        quantile = (1 - gamma) * SortedValue(k - 1) + gamma * SortedValue(k)
+        return numpy.where(n == 1, SortedValue(0), quantile)
+
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = numpy.sum(numpy.where(valid, pixels, 0), axis = 2) / n
+        deviation = numpy.sqrt(numpy.sum(numpy.where(valid, (pixels - mean[:, :, numpy.newaxis]) ** 2, 0), axis = 2) / n)
+        statistics = {'mean': mean,
+                      'median': (SortedValue((n - 1) // 2) + SortedValue(n // 2)) / 2,
+                      'deviation': deviation,
+                      '1stQuartile': Quantile(0.25),
+                      '3rdQuartile': Quantile(0.75),
+                      'min': SortedValue(0),
+                      'max': SortedValue(n - 1)}
+    for name in statistics:
+        statistics[name] = numpy.where(empty, numpy.nan, statistics[name])
+    return statistics
+
+def PixelsInPatch(inPatch):
+    # the pixels of each patch along the last axis, in the shape (nrOfRows, nrOfColumns, nrOfPixels), and the mask of the pixels which are not NaN
+    inPatch = numpy.asarray(inPatch, dtype = numpy.float64)
+    pixels = inPatch.reshape(inPatch.shape[0], inPatch.shape[1], -1)
+    return pixels, ~numpy.isnan(pixels)
+
+def RankPatches(pixels, valid):
+    '''
+    rank the valid pixels of each patch (the last axis) as scipy.stats.rankdata, with the average rank for ties. all the patches are ranked with one sort.
+    return the ranks (0 for the invalid pixels) and the tie correction factor of each patch as scipy.stats.tiecorrect
+    '''
+    patchIndex = numpy.indices(pixels.shape)[:-1]
+    patchIndex = numpy.ravel_multi_index(tuple(patchIndex), pixels.shape[:-1])[valid]
+    values = pixels[valid]
+    order = numpy.lexsort((values, patchIndex))
+    sortedValues = values[order]
+    sortedPatches = patchIndex[order]
+
+    # the groups of equal values in the same patch
+    newGroup = numpy.r_[True, (sortedValues[1:] != sortedValues[:-1]) | (sortedPatches[1:] != sortedPatches[:-1])]
+    groupStart = numpy.nonzero(newGroup)[0]
+    groupEnd = numpy.r_[groupStart[1:], len(sortedValues)]
+    groupOfValue = numpy.cumsum(newGroup) - 1
+    nrOfPatches = int(numpy.prod(pixels.shape[:-1]))
+    patchStart = numpy.searchsorted(sortedPatches, numpy.arange(nrOfPatches))
+
+    ranks = numpy.zeros(pixels.shape)
+    validRanks = numpy.empty(len(values))
+    validRanks[order] = (groupStart + groupEnd - 1)[groupOfValue] / 2.0 - patchStart[sortedPatches] + 1
+    ranks[valid] = validRanks
+
+    groupSize = (groupEnd - groupStart).astype(numpy.float64)
+    ties = numpy.bincount(sortedPatches[groupStart], weights = groupSize ** 3 - groupSize, minlength = nrOfPatches)
+    n = numpy.sum(valid, axis = -1).ravel().astype(numpy.float64)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        tieCorrection = numpy.where(n < 2, 1.0, 1.0 - ties / (n ** 3 - n))
+    return ranks, tieCorrection.reshape(pixels.shape[:-1])
 
 def T_Test_OneSample(dataToBeTested, expectedMean, nrOfRows, nrOfColumns):
-    # do 1 sample t-test
-    temp_t = [[]for i in range(nrOfRows) ]
-    temp_p = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            temp_t[i].append(stats.ttest_1samp(DealNaN(dataToBeTested[i][j])[0], expectedMean[i][j])[0])
-            temp_p[i].append(stats.ttest_1samp(DealNaN(dataToBeTested[i][j])[0], expectedMean[i][j])[1])
-    return temp_t, temp_p
+    # do 1 sample t-test of all the patches at once, as scipy.stats.ttest_1samp. the NaN are left out
+    pixels, valid = PixelsInPatch(dataToBeTested)
+    n = numpy.sum(valid, axis = 2)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = numpy.sum(numpy.where(valid, pixels, 0), axis = 2) / n
+        variance = numpy.sum(numpy.where(valid, (pixels - mean[:, :, numpy.newaxis]) ** 2, 0), axis = 2) / (n - 1)
+        t = (mean - numpy.asarray(expectedMean, dtype = numpy.float64)) / numpy.sqrt(variance / n)
+        p = stats.t.sf(numpy.abs(t), n - 1) * 2
+    return t, p
 
 def U_Test(dataToBeTested, referenceData, nrOfRows, nrOfColumns):
-    # do Mann-Whitney U test
-    temp_u = [[]for i in range(nrOfRows) ]
-    temp_p = [[]for i in range(nrOfRows) ]
-    for i in range(nrOfRows):
-        for j in range(nrOfColumns):
-            refData = numpy.array(referenceData[i][j])
-            refData = refData[~DealNaN(dataToBeTested[i][j])[1]]
-            temp_u[i].append(stats.mannwhitneyu(DealNaN(dataToBeTested[i][j])[0], refData)[0])
-            temp_p[i].append(stats.mannwhitneyu(DealNaN(dataToBeTested[i][j])[0], refData)[1])
-    return temp_u, temp_p
-
-def ANOVA_OneWay(inPatch, dimensionIndex1, dimensionIndex2):
-    # do ANOVA for each row of calculated Ktrans, to see if there is significant difference with regarding to Ve, or other way around
-    # for Ktrans, dimensionIndex1, 2 are nrOfRows and nrOfColumns respectively
-    temp_f = []
-    temp_p = []
-    for i in range(dimensionIndex1):
-        temp = []
-        for element in inPatch[i]:
-            temp.append(DealNaN(element)[0])
-        # temp_f.append(stats.f_oneway(*inPatch[i])[0])
-        # temp_p.append(stats.f_oneway(*inPatch[i])[1])
-        temp_f.append(stats.f_oneway(*temp)[0])
-        temp_p.append(stats.f_oneway(*temp)[1])
-
-    return temp_f, temp_p
+    # do Mann-Whitney U test of all the patches at once, as scipy.stats.mannwhitneyu. the pixels which are NaN in either map are left out.
+    # the patches in which all the numbers are identical get NaN
+    pixels, valid = PixelsInPatch(dataToBeTested)
+    refPixels, refValid = PixelsInPatch(referenceData)
+    valid = valid & refValid
+    ranks, tieCorrection = RankPatches(numpy.concatenate((pixels, refPixels), axis = 2), numpy.concatenate((valid, valid), axis = 2))
+    n = numpy.sum(valid, axis = 2).astype(numpy.float64)
+    u1 = n * n + n * (n + 1) / 2.0 - numpy.sum(ranks[:, :, :pixels.shape[2]], axis = 2)
+    u2 = n * n - u1
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        sd = numpy.sqrt(tieCorrection * n * n * (2 * n + 1) / 12.0)
+        z = (numpy.maximum(u1, u2) - (n * n / 2.0 + 0.5)) / sd
+        p = stats.norm.sf(numpy.abs(z))
+    identical = (tieCorrection == 0) | (n == 0)
+    return numpy.where(identical, numpy.nan, numpy.minimum(u1, u2)), numpy.where(identical, numpy.nan, p)
+
+def ANOVA_OneWay(inPatch):
+    # do the one-way ANOVA of each row and of each column of the patches, where each patch is a group, to see if there is significant difference
+    # with regarding to the other parameter. the groups are summed up once, and may have different sizes as the NaN are left out.
+    # return the f-values and p-values of the rows, and the f-values and p-values of the columns
+    groupSums = PatchGroupSums(inPatch)
+    rows_f, rows_p = ANOVA_OneWayFromSums(ANOVASums(groupSums, 1))
+    columns_f, columns_p = ANOVA_OneWayFromSums(ANOVASums(groupSums, 0))
+    return rows_f, rows_p, columns_f, columns_p
 
 def ChiSquare_Test(inPatch, nrR, nrC):
     '''
-    chi-square test
+    chi-square test of all the patches at once, as scipy.stats.chisquare with the mean of each patch as the expected frequency. the NaN are left out
     '''
-    temp_c = [[]for i in range(nrR) ]
-    temp_p = [[]for i in range(nrR) ]
-    for i in range(nrR):
-        for j in range(nrC):
-            temp_c[i].append(stats.chisquare(DealNaN(inPatch[i][j])[0])[0])
-            temp_p[i].append(stats.chisquare(DealNaN(inPatch[i][j])[0])[1])
-    return temp_c, temp_p
+    pixels, valid = PixelsInPatch(inPatch)
+    n = numpy.sum(valid, axis = 2)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        expected = numpy.sum(numpy.where(valid, pixels, 0), axis = 2) / n
+        chisq = numpy.sum(numpy.where(valid, (pixels - expected[:, :, numpy.newaxis]) ** 2, 0), axis = 2) / expected
+        p = stats.chi2.sf(chisq, n - 1)
+    return chisq, p
 
 def EditTable(caption, headersHorizontal, headersVertical, entryName, entryData):
         # edit a table of certain scale in html. return the table part html
@@ -698,83 +894,59 @@ def WriteToExcelSheet_T1_A(sheet, headerH, headerV, data, titlePos, nrR, nrC):
         sheet.write(0*nrR+3+j, 0, item)
         sheet.write(0*nrR+3+j, 1, 'f-value = ' + str(formatFloatTo4DigitsString(data[0][j])) + ', p-value = ' + str(formatFloatTo4DigitsString(data[1][j])))
 
-def CCC(calData, refData, nrR, nrC):
-    '''
-    concoedace correlation coefficients
-    '''
-    temp = [[]for i in range(nrR) ]
-    for i in range(nrR):
-        for j in range(nrC):
-            sx_q = numpy.var(calData[i][j])
-            sy_q = numpy.var(refData[i][j])
-            s_xy = numpy.cov(calData[i][j], refData[i][j])[0][1]
-            x_mean = numpy.mean(calData[i][j])
-            y_mean = numpy.mean(refData[i][j])
-            ccc = 2*s_xy/(sx_q + sy_q + (x_mean - y_mean)**2)
-            temp[i].append(ccc)
-    return temp
-
-def RMS(calData, nrR, nrC):
-    '''
-    Root mean square
-    '''
-    patchSize = 100
-    returnValue = [[]for i in range(nrR)]
-    for i in range(nrR):
-        for j in range(nrC):
-            temp = 0
-            for n in range(patchSize):
-                temp += calData[i][j][n]**2
-            returnValue[i].append(numpy.sqrt(numpy.sum(temp)/patchSize))
-    return returnValue
-
-def TDI(calValue, refValue, nrR, nrC):
-    '''
-    The approximation for the TDI, described in Lin LI: Total deviation index for measuring individual agreement with applications in laboratory performance and bioequivalence. Statistics in Medicine. 2000, 19: 255-270. 10.1002/(SICI)1097-0258(20000130)19:2<255::AID-SIM293>3.0.CO;2-8.
-
-    :param calValue: calculated value
-    :param refValue: reference value
-    :param nrR: number of rows in the map
-    :param nrC: number of columns in the map
-    :return: the map of TDI with the dimension of nrR*nrC
-    '''
-    returnValue = [[]for i in range(nrR)]
-    for i in range(nrR):
-        for j in range(nrC):
-            x = numpy.asarray(calValue[i][j])
-            y = numpy.asarray(refValue[i][j])
-            returnValue[i].append(1.96 * (numpy.var(x - y))**0.5)
-    return returnValue
-
-
-def DefineNaN(inMap, mode, threshold, replaceVal):
-    '''
-    filter the map, to define the NaN in it.
-    mode1: clamp; mode2: outside range
-    '''
-    patchSize = 100
-    outMap = inMap
-    percentMap = [[] for i in range(len(inMap))]
-
-    if mode == 'MODE1':
-        for i, row in enumerate(inMap):
-            for j, patch in enumerate(row):
-                count = 0
-                for p, pixel in enumerate(patch):
-                    if  ((pixel > threshold[0]) and (pixel < threshold[1])):
-                        count += 1
-                        outMap[i][j][p] = replaceVal
-                percentMap[i].append(count/patchSize)
-    elif mode == 'MODE2':
-        for i, row in enumerate(inMap):
-            for j, patch in enumerate(row):
-                count = 0
-                for p, pixel in enumerate(patch):
-                    if ((pixel > threshold[1]) or (pixel < threshold[0])):
-                        count += 1
-                        outMap[i][j][p] = replaceVal
-                percentMap[i].append(count/patchSize)
-    return outMap, percentMap
+def CalculateAgreement(calData, refData, probability = 0.95):
+    '''
+    the agreement between the calculated and reference values of all the patches at once. the pixels which are NaN in either map are left out.
+    return a dictionary of maps in the shape (nrOfRows, nrOfColumns):
+    'ccc': the concordance correlation coefficient, Lin LI: A concordance correlation coefficient to evaluate reproducibility. Biometrics. 1989, 45: 255-268.
+    'rms': the root mean square of the calculated values
+    'bias': the mean of the differences between the calculated and reference values
+    'TDI': the approximation for the total deviation index, described in Lin LI: Total deviation index for measuring individual agreement with applications
+           in laboratory performance and bioequivalence. Statistics in Medicine. 2000, 19: 255-270. 10.1002/(SICI)1097-0258(20000130)19:2<255::AID-SIM293>3.0.CO;2-8.
+    'TDI_exact': the exact total deviation index under the normal distribution of the differences, i.e. the bound which contains the given probability of the absolute differences
+    '''
+    x, validX = PixelsInPatch(calData)
+    y, validY = PixelsInPatch(refData)
+    valid = validX & validY
+    n = numpy.sum(valid, axis = 2)
+    x = numpy.where(valid, x, 0)
+    y = numpy.where(valid, y, 0)
+
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        meanX = numpy.sum(x, axis = 2) / n
+        meanY = numpy.sum(y, axis = 2) / n
+        deviationX = numpy.where(valid, x - meanX[:, :, numpy.newaxis], 0)
+        deviationY = numpy.where(valid, y - meanY[:, :, numpy.newaxis], 0)
+        varianceX = numpy.sum(deviationX * deviationX, axis = 2) / n
+        varianceY = numpy.sum(deviationY * deviationY, axis = 2) / n
+        covariance = numpy.sum(deviationX * deviationY, axis = 2) / n
+
+        bias = meanX - meanY
+        differenceSD = numpy.sqrt(numpy.maximum(varianceX + varianceY - 2 * covariance, 0))
+        normalizedBias = (bias / differenceSD) ** 2
+        exactQuantile = numpy.where(normalizedBias > 0, stats.ncx2.ppf(probability, 1, normalizedBias), stats.chi2.ppf(probability, 1))
+        agreement = {'ccc': 2 * covariance / (varianceX + varianceY + bias * bias),
+                     'rms': numpy.sqrt(numpy.sum(x * x, axis = 2) / n),
+                     'bias': bias,
+                     'TDI': stats.norm.ppf(0.5 + probability / 2.0) * numpy.sqrt(bias * bias + differenceSD * differenceSD),
+                     'TDI_exact': numpy.where(differenceSD > 0, differenceSD * numpy.sqrt(exactQuantile), numpy.abs(bias))}
+    return agreement
+
+def DefineNaN(inMap, sentinels, replaceVal = numpy.nan):
+    '''
+    define the NaN in a map in patches (e.g. a view from PatchView, so that the map in row gets the NaN as well), with one mask over the whole map.
+    a sentinel is either a value (e.g. -9999 or numpy.inf) or a range (low, high) excluding its ends. the pixels matching any sentinel, and the pixels
+    which are already NaN, are set to replaceVal in place. return the map and the fraction of NaN in each patch.
+    '''
+    isNaN = numpy.isnan(inMap)
+    for sentinel in sentinels:
+        if numpy.ndim(sentinel) == 0:
+            isNaN |= (inMap == sentinel)
+        else:
+            isNaN |= (inMap > sentinel[0]) & (inMap < sentinel[1])
+    inMap[isNaN] = replaceVal
+    percentMap = numpy.mean(isNaN.reshape(isNaN.shape[0], isNaN.shape[1], -1), axis = 2)
+    return inMap, percentMap
 
 def DealNaN(data):
     '''
@@ -782,7 +954,7 @@ def DealNaN(data):
     '''
     Data = numpy.array(data)
     if ~numpy.any(Data[~numpy.isnan(data)]):
-        return data, numpy.isnan(data)
+        return Data.ravel(), numpy.isnan(data)
     else:
         return Data[~numpy.isnan(data)], numpy.isnan(data)
 
@@ -792,20 +964,3 @@ def DropNaN(data):
     '''
     data = numpy.array(data)
     return data[~numpy.isnan(data)]
-
-def DefineNaN_InRow(inMap, mode, threshold, replaceVal):
-    '''
-    deal with the NaN in the map which is in the row order
-    '''
-    if mode == 'MODE1':
-        for i, row in enumerate(inMap):
-            for p, pixel in enumerate(row):
-                if  ((pixel > threshold[0]) and (pixel < threshold[1])):
-                    inMap[i][p] = replaceVal
-    if mode == 'MODE2':
-        for i, row in enumerate(inMap):
-            for p, pixel in enumerate(row):
-                if  ((pixel < threshold[0]) and (pixel > threshold[1])):
-                    inMap[i][p] = replaceVal
-    return inMap
-
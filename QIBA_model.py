@@ -1,34 +1,229 @@
 # this package contains the models to be evaluated, with respect to the parameter of Ktrans-Ve or T1.
 import QIBA_functions
+import QIBA_cache
 import numpy
 
+class ParameterMap():
+    '''
+    the class for a parameter map. the map is kept as one array in row order together with its NaN mask and the grid of the patches,
+    the views in patches and the patch values are provided on demand.
+    '''
+    def __init__(self, image, nrOfRows, nrOfColumns, patchLen):
+        # initializes the class
+        self.image = numpy.asarray(image)
+        self.nrOfRows = nrOfRows
+        self.nrOfColumns = nrOfColumns
+        self.patchLen = patchLen
+        self.NaNMask = None # found when it is first used, so that a memory-mapped map is not read at once
+        self.patchValue = {} # the patch values already estimated, by method
+
+    def InRow(self):
+        # the map in row order
+        return self.image
+
+    def InPatch(self):
+        # the map in patches, indexed as [row][column]. a view on the map in row.
+        return QIBA_functions.PatchView(self.image, self.nrOfRows, self.nrOfColumns, self.patchLen)
+
+    def NaNMaskInPatch(self):
+        # the NaN mask in patches
+        if self.NaNMask is None:
+            self.NaNMask = numpy.isnan(self.image)
+        return QIBA_functions.PatchView(self.NaNMask, self.nrOfRows, self.nrOfColumns, self.patchLen)
+
+    def PatchValue(self, patchValueMethod):
+        # the value representing each patch, 'MEAN' or 'MEDIAN', as an array of nrOfRows * nrOfColumns
+        if patchValueMethod not in self.patchValue:
+            self.patchValue[patchValueMethod] = numpy.array(QIBA_functions.EstimatePatch(self.InPatch(), patchValueMethod, self.nrOfRows, self.nrOfColumns))
+        return self.patchValue[patchValueMethod]
+
+    def DefineNaN(self, sentinels, replaceVal = numpy.nan):
+        # define the NaN in the map from the sentinel values and ranges, and return the NaN fraction of each patch. a read-only or integer map is copied first.
+        self.image = QIBA_functions.WritableMap(self.image)
+        inPatch, percentage = QIBA_functions.DefineNaN(self.InPatch(), sentinels, replaceVal)
+        self.NaNMask = None
+        self.patchValue = {}
+        return percentage
+
+    def Band(self, rows, sentinels, replaceVal = numpy.nan):
+        # copy the patch rows of the slice rows into memory and define the NaN in the copy, leaving the map itself (e.g. a read-only memory map) untouched.
+        # return the copy in row order, in patches, and the NaN fraction of each patch.
+        inRow = QIBA_functions.WritableMap(self.image[rows.start * self.patchLen:rows.stop * self.patchLen], copy = True)
+        inPatch, percentage = QIBA_functions.DefineNaN(QIBA_functions.PatchView(inRow, rows.stop - rows.start, self.nrOfColumns, self.patchLen), sentinels, replaceVal)
+        return inRow, inPatch, percentage
+
+def ImportParameterMaps(paths, isReference, nrOfRows, nrOfColumns, patchLen, mode, memoryMap = False):
+    # import the files as parameter maps, without the strips on top (and bottom for GKM) which are not used. the files are imported at the same time.
+    # the reference maps are taken from the reference cache or the cache files on disk when they were imported before, and are put into them otherwise.
+    if not QIBA_functions.ProbeGrid(paths, patchLen)[0]:
+        raise ValueError('The dimensions of the input files do not agree.')
+
+    maps = [None] * len(paths)
+    keys = [None] * len(paths)
+    for i, path in enumerate(paths):
+        if isReference[i]:
+            keys[i] = QIBA_cache.FileKey(path, nrOfRows, nrOfColumns, patchLen, mode)
+            maps[i] = QIBA_cache.referenceCache.Get(keys[i])
+            if maps[i] is None:
+                maps[i] = LoadReferenceMapFromDisk(path, keys[i], nrOfRows, nrOfColumns, patchLen, mode)
+
+    toImport = [i for i in range(len(paths)) if maps[i] is None]
+    images = QIBA_functions.ImportFilesConcurrently([paths[i] for i in toImport], nrOfRows, nrOfColumns, patchLen, mode, memoryMap)
+    for i, image in zip(toImport, images):
+        if mode == 'GKM':
+            image = image[patchLen:-patchLen]
+        else:
+            image = image[patchLen:]
+        maps[i] = ParameterMap(image, nrOfRows, nrOfColumns, patchLen)
+        if isReference[i]:
+            maps[i].image.flags.writeable = False # the cached reference maps are shared by the models
+            SaveReferenceMapToDisk(paths[i], keys[i], maps[i], mode)
+            QIBA_cache.referenceCache.Put(keys[i], maps[i])
+    return maps
+
+def LoadReferenceMapFromDisk(path, key, nrOfRows, nrOfColumns, patchLen, mode):
+    # load a reference map with its patch values from its cache file. return None if there is no valid cache file.
+    arrays = QIBA_cache.LoadFromDiskCache(QIBA_cache.DiskCachePath(path, mode), key)
+    if arrays is None:
+        return None
+    referenceMap = ParameterMap(arrays['image'], nrOfRows, nrOfColumns, patchLen)
+    referenceMap.patchValue = {'MEAN': arrays['MEAN'], 'MEDIAN': arrays['MEDIAN']}
+    QIBA_cache.referenceCache.Put(key, referenceMap)
+    return referenceMap
+
+def SaveReferenceMapToDisk(path, key, referenceMap, mode):
+    # write a reference map with its patch values to its cache file
+    arrays = {'image': referenceMap.InRow(), 'MEAN': referenceMap.PatchValue('MEAN'), 'MEDIAN': referenceMap.PatchValue('MEDIAN')}
+    QIBA_cache.SaveToDiskCache(QIBA_cache.DiskCachePath(path, mode), key, arrays)
+
+def EvaluateMetrics(model, metrics, nrOfWorkers = 1, calculate = True):
+    # evaluate the metrics of a model from its metricRegistry, level by level: a step runs when all the steps it depends on are evaluated.
+    # the steps are recorded in model.evaluated, so each step runs once per model. with more than one worker, the calculations of a level run
+    # at the same time on a thread pool, as they only read the shared maps and each sets its own results. the HTML is written in order afterwards.
+    steps = []
+    def CollectSteps(metric):
+        if metric in model.evaluated or metric in steps:
+            return
+        if metric not in model.metricRegistry:
+            raise ValueError('Unknown metric: ' + str(metric))
+        for dependency in model.metricRegistry[metric][0]:
+            CollectSteps(dependency)
+        steps.append(metric)
+    for metric in metrics:
+        CollectSteps(metric)
+
+    while steps:
+        level = [step for step in steps if all(dependency in model.evaluated for dependency in model.metricRegistry[step][0])]
+        calculations = [getattr(model, model.metricRegistry[step][1]) for step in level if model.metricRegistry[step][1] and calculate]
+        if nrOfWorkers > 1 and len(calculations) > 1:
+            QIBA_functions.MapConcurrently(lambda calculation: calculation(), [(calculation,) for calculation in calculations], nrOfWorkers)
+        else:
+            for calculation in calculations:
+                calculation()
+        for step in level:
+            html = model.metricRegistry[step][2]
+            if html:
+                getattr(model, html)()
+            model.evaluated.add(step)
+            steps.remove(step)
+
+# the version of the evaluation. it is part of the key of the cached results, so it has to be changed when the results of the evaluation change
+toolVersion = '0.1'
+
+def ResultKey(model, paths, metrics):
+    # the key of the results of a model in the result cache: the version of the evaluation, the kind of the model, the content of the evaluated files
+    # and the settings of the evaluation, including its mode (in memory, or memory-mapped in bands of bandSize patch rows)
+    return [toolVersion, model.__class__.__name__, [QIBA_cache.FileDigest(path) for path in paths], model.nrOfRows, model.nrOfColumns,
+            model.patchLen, str(model.NaNSentinels), model.memoryMap, model.bandSize, sorted(set(metrics))]
+
+def PackResults(results):
+    # convert the results of an evaluation to arrays for the result cache. the kind of each result is kept in its name, to convert it back.
+    # return None if a result can not be converted.
+    arrays = {}
+    for name, value in results.items():
+        if isinstance(value, numpy.ndarray):
+            arrays['array:' + name] = value
+        elif isinstance(value, basestring):
+            arrays['str:' + name] = numpy.frombuffer(value.encode('utf-8') if isinstance(value, unicode) else value, dtype = numpy.uint8)
+        elif isinstance(value, (set, frozenset)):
+            arrays['set:' + name] = numpy.array(sorted(value), dtype = str)
+        else:
+            array = numpy.asarray(value)
+            if array.dtype == object:
+                return None
+            arrays['value:' + name] = array
+    return arrays
+
+def UnpackResults(model, arrays):
+    # set the results from the result cache on the model, converted back from the arrays
+    for name, array in arrays.items():
+        kind, name = name.split(':', 1)
+        if kind == 'array':
+            setattr(model, name, numpy.array(array)) # a copy, which does not hold the cache file open
+        elif kind == 'str':
+            setattr(model, name, array.tostring())
+        elif kind == 'set':
+            setattr(model, name, set(array.tolist()))
+        else:
+            setattr(model, name, array.tolist())
+
+def EvaluateWithResultCache(model, paths, metrics, resultCache, evaluate):
+    # evaluate the model by calling evaluate(), unless the results of the same evaluation of the same files are in the result cache.
+    # the results are the attributes which the evaluation sets, or the lists and sets which it extends. only a model which is not evaluated yet is cached.
+    if resultCache is None or model.evaluated:
+        evaluate()
+        return
+    key = ResultKey(model, paths, metrics)
+    arrays = resultCache.Get(key)
+    if arrays is not None:
+        UnpackResults(model, arrays)
+        return
+    before = dict((name, (value, len(value) if isinstance(value, (list, set)) else None)) for name, value in model.__dict__.items())
+    evaluate()
+    results = dict((name, value) for name, value in model.__dict__.items()
+                   if name not in before or before[name][0] is not value or (before[name][1] is not None and len(value) != before[name][1]))
+    arrays = PackResults(results)
+    if arrays is not None:
+        resultCache.Put(key, arrays)
+
+# the number of patch rows evaluated at a time when the maps are memory-mapped and no band size is given
+defaultBandSize = 8
+
 class Model_KV():
     '''
     the class for Ktrans-Ve model.
     '''
-    def __init__(self, path_ref_K, path_ref_V, path_cal_K, path_cal_V, dimension):
+    def __init__(self, path_ref_K, path_ref_V, path_cal_K, path_cal_V, dimension, memoryMap = False, bandSize = 0, NaNSentinels = None):
         # initializes the class
         self.path_ref_K = path_ref_K
         self.path_ref_V = path_ref_V
         self.path_cal_K = path_cal_K
         self.path_cal_V = path_cal_V
+        self.memoryMap = memoryMap # map binary files read-only instead of reading them into memory
+
+        # the values and ranges (low, high) in the calculated maps which stand for NaN, e.g. fill values of a vendor
+        if NaNSentinels is None:
+            NaNSentinels = [[-10001, -9999]]
+        self.NaNSentinels = NaNSentinels
+
+        # out-of-core evaluation: the number of patch rows evaluated at a time. 0 evaluates the whole maps at once.
+        # the memory-mapped maps are always evaluated in bands, so that they are never copied into memory as a whole.
+        self.bandSize = bandSize
+        if self.bandSize:
+            self.memoryMap = True
+        elif self.memoryMap:
+            self.bandSize = defaultBandSize
 
         # parameters of the image size
         self.nrOfRows, self.nrOfColumns = dimension
         self.patchLen = 10
         self.METHOD = '' # for patch value decision
 
-        # the raw image data as pixel flow
-        self.Ktrans_ref = []
-        self.Ve_ref = []
-        self.Ktrans_cal = []
-        self.Ve_cal = []
-
-        # the image data in row, for showing the preview of the images
-        self.Ktrans_ref_inRow = [[]for i in range(self.nrOfRows * self.patchLen)]
-        self.Ve_ref_inRow = [[]for i in range(self.nrOfRows * self.patchLen)]
-        self.Ktrans_cal_inRow = [[]for i in range(self.nrOfRows * self.patchLen)]
-        self.Ve_cal_inRow = [[]for i in range(self.nrOfRows * self.patchLen)]
+        # the parameter maps. the maps in row (*_inRow, for showing the preview of the images) and in patches (e.g. Ktrans_ref) are views on them
+        self.Ktrans_ref_map = None
+        self.Ve_ref_map = None
+        self.Ktrans_cal_map = None
+        self.Ve_cal_map = None
 
         # the error map between calculated and reference file
         self.Ktrans_error = []
@@ -115,48 +310,50 @@ class Model_KV():
         # the result in HTML
         self.resultInHTML = ''
 
+        # the metrics and steps which are evaluated
+        self.evaluated = set()
+
         # import files
         self.ImportFiles()
         self.PreprocessFilesForGKM()
 
-    def Evaluate(self):
-        # evaluation
-
-        # pre-process for the imported files
-        self.CalculateErrorForModel()
-        self.EstimatePatchForModel('MEAN')
-        self.PrepareHeaders()
-
-        # evaluation operations
-        self.FittingLinearModelForModel()
-        self.FittingLogarithmicModelForModel()
-        self.CalculateCorrelationForModel()
-        self.CalculateCovarianceForModel()
-        self.CalculateCCCForModel()
-        self.CalculateRMSForModel()
-        self.CalculateTDIForModel()  # based on the results from RMS and linear model
-        self.CalculateMeanForModel()
-        self.CalculateMedianForModel()
-        self.CalculateSTDDeviationForModel()
-        self.Calculate1stAnd3rdQuartileForModel()
-        self.CalculateMinAndMaxForModel()
-        self.T_TestForModel()
-        self.U_TestForModel()
-        self.ANOVAForModel()
-        self.ChiSquareTestForModel()
-
-        # write HTML result
-        self.htmlNaN()
-        self.htmlCovCorrResults()
-        self.htmlModelFitting()
-        self.htmlT_TestResults()
-        self.htmlU_TestResults()
-        self.htmlCCCResults()
-        self.htmlRMSResults()
-        self.htmlTDIResults()
-        self.htmlStatistics()
-        self.htmlANOVAResults()
-        self.htmlChiqResults()
+    # the registry of the metrics and of the steps they depend on: name -> (dependencies, calculation method, HTML method)
+    metricRegistry = {
+        'error': ([], 'CalculateErrorForModel', None),
+        'patchValue': ([], 'EstimatePatchValueForModel', None),
+        'headers': (['patchValue'], 'PrepareHeaders', None),
+        'linearFit': (['patchValue'], 'FittingLinearModelForModel', None),
+        'logFit': (['patchValue'], 'FittingLogarithmicModelForModel', None),
+        'agreement': ([], 'CalculateAgreementForModel', None),
+        'NaN': (['headers'], None, 'htmlNaN'),
+        'correlation': (['patchValue', 'headers'], 'CalculateCorrelationAndCovarianceForModel', 'htmlCovCorrResults'),
+        'fit': (['headers', 'linearFit', 'logFit'], None, 'htmlModelFitting'),
+        't-test': (['patchValue', 'headers'], 'T_TestForModel', 'htmlT_TestResults'),
+        'U-test': (['headers'], 'U_TestForModel', 'htmlU_TestResults'),
+        'CCC': (['headers', 'agreement'], None, 'htmlCCCResults'),
+        'RMS': (['headers', 'agreement'], None, 'htmlRMSResults'),
+        'TDI': (['headers', 'agreement'], None, 'htmlTDIResults'),
+        'bias': (['agreement'], None, None),
+        'statistics': (['headers'], 'CalculatePatchStatisticsForModel', 'htmlStatistics'),
+        'ANOVA': (['headers'], 'ANOVAForModel', 'htmlANOVAResults'),
+        'chi-square': (['headers'], 'ChiSquareTestForModel', 'htmlChiqResults'),
+    }
+
+    # the metrics evaluated by default
+    defaultMetrics = ['error', 'NaN', 'correlation', 'fit', 't-test', 'U-test', 'CCC', 'RMS', 'TDI', 'statistics', 'ANOVA', 'chi-square']
+
+    def Evaluate(self, metrics = None, nrOfWorkers = 1, resultCache = None):
+        # evaluate the metrics (all the default metrics if None), e.g. ['CCC', 'bias'], and write their HTML results. only the steps the metrics depend on are run,
+        # and each step runs once per model, so requesting a metric again is free. the evaluation in bands calculates all the metrics in one pass.
+        # with more than one worker, the independent metrics are calculated at the same time. with a result cache (QIBA_cache.ResultCache),
+        # the results of an earlier evaluation of the same files are taken from the cache.
+        if metrics is None:
+            metrics = self.defaultMetrics
+        def Calculate():
+            if self.bandSize and not self.evaluated:
+                self.EvaluateInBands()
+            EvaluateMetrics(self, metrics, nrOfWorkers, calculate = not self.bandSize)
+        EvaluateWithResultCache(self, [self.path_ref_K, self.path_ref_V, self.path_cal_K, self.path_cal_V], metrics, resultCache, Calculate)
 
     def PrepareHeaders(self):
         # prepare the headers for table editing
@@ -224,6 +421,8 @@ class Model_KV():
             KtransLinearFitting += ') * Ktrans_ref + ('
             KtransLinearFitting += QIBA_functions.formatFloatTo4DigitsString(self.b_lin_Ktrans[j])
             KtransLinearFitting += '), R-squared value: ' + QIBA_functions.formatFloatTo4DigitsString(self.r_squared_lin_K[j])
+            KtransLinearFitting += '<br>standard errors: ' + QIBA_functions.formatFloatTo4DigitsString(self.a_lin_Ktrans_stderr[j]) + ', ' + QIBA_functions.formatFloatTo4DigitsString(self.b_lin_Ktrans_stderr[j])
+            KtransLinearFitting += '<br>95% confidence intervals: ' + QIBA_functions.formatIntervalTo4DigitsString(self.a_lin_Ktrans_CI[j]) + ', ' + QIBA_functions.formatIntervalTo4DigitsString(self.b_lin_Ktrans_CI[j])
             KtransLinearFitting += '</td>'
             KtransLinearFitting += '</tr>'
 
@@ -241,7 +440,8 @@ class Model_KV():
             KtransLogarithmicFitting += QIBA_functions.formatFloatTo4DigitsString(self.a_log_Ktrans[j])
             KtransLogarithmicFitting += ') + ('
             KtransLogarithmicFitting += QIBA_functions.formatFloatTo4DigitsString(self.b_log_Ktrans[j])
-            KtransLogarithmicFitting += ') * log10(Ktrans_ref)'
+            KtransLogarithmicFitting += ') * log10(Ktrans_ref), R-squared value: ' + QIBA_functions.formatFloatTo4DigitsString(self.r_squared_log_K[j])
+            KtransLogarithmicFitting += '<br>standard errors: ' + QIBA_functions.formatFloatTo4DigitsString(self.a_log_Ktrans_stderr[j]) + ', ' + QIBA_functions.formatFloatTo4DigitsString(self.b_log_Ktrans_stderr[j])
             KtransLogarithmicFitting += '</td>'
             KtransLogarithmicFitting += '</tr>'
 
@@ -261,6 +461,8 @@ class Model_KV():
             VeLinearFitting += ') * Ve_ref + ('
             VeLinearFitting += QIBA_functions.formatFloatTo4DigitsString(self.b_lin_Ve[i])
             VeLinearFitting += '), R-squared value: ' + QIBA_functions.formatFloatTo4DigitsString(self.r_squared_lin_V[i])
+            VeLinearFitting += '<br>standard errors: ' + QIBA_functions.formatFloatTo4DigitsString(self.a_lin_Ve_stderr[i]) + ', ' + QIBA_functions.formatFloatTo4DigitsString(self.b_lin_Ve_stderr[i])
+            VeLinearFitting += '<br>95% confidence intervals: ' + QIBA_functions.formatIntervalTo4DigitsString(self.a_lin_Ve_CI[i]) + ', ' + QIBA_functions.formatIntervalTo4DigitsString(self.b_lin_Ve_CI[i])
             VeLinearFitting += '</td>'
             VeLinearFitting += '</tr>'
         VeLinearFitting += '</table>'
@@ -277,7 +479,8 @@ class Model_KV():
             VeLogarithmicFitting += QIBA_functions.formatFloatTo4DigitsString(self.a_log_Ve[i])
             VeLogarithmicFitting += ') + ('
             VeLogarithmicFitting += QIBA_functions.formatFloatTo4DigitsString(self.b_log_Ve[i])
-            VeLogarithmicFitting += ') * log10(Ve_ref)'
+            VeLogarithmicFitting += ') * log10(Ve_ref), R-squared value: ' + QIBA_functions.formatFloatTo4DigitsString(self.r_squared_log_V[i])
+            VeLogarithmicFitting += '<br>standard errors: ' + QIBA_functions.formatFloatTo4DigitsString(self.a_log_Ve_stderr[i]) + ', ' + QIBA_functions.formatFloatTo4DigitsString(self.b_log_Ve_stderr[i])
             VeLogarithmicFitting += '</td>'
             VeLogarithmicFitting += '</tr>'
         VeLogarithmicFitting += '</table>'
@@ -448,15 +651,15 @@ class Model_KV():
         KtransTDITable = \
             '<h2>The total deviation index of each patch in calculated anf reference Ktrans:</h2>'
 
-        KtransTDITable += QIBA_functions.EditTable('', self.headersHorizontal, self.headersVertical, ['TDI'],
-                                                   [self.Ktrans_TDI])
+        KtransTDITable += QIBA_functions.EditTable('', self.headersHorizontal, self.headersVertical, ['TDI', 'exact TDI', 'bias'],
+                                                   [self.Ktrans_TDI, self.Ktrans_TDI_exact, self.Ktrans_bias])
 
         # Ve
         VeTDITable = \
             '<h2>The total deviation index of each patch in calculated anf reference Ve:</h2>'
 
-        VeTDITable += QIBA_functions.EditTable('', self.headersHorizontal, self.headersVertical, ['TDI'],
-                                                [self.Ve_TDI])
+        VeTDITable += QIBA_functions.EditTable('', self.headersHorizontal, self.headersVertical, ['TDI', 'exact TDI', 'bias'],
+                                                [self.Ve_TDI, self.Ve_TDI_exact, self.Ve_bias])
 
         # put the text into html structure
         self.TDIResultInHTML = self.packInHtml(KtransTDITable + '<br>' + VeTDITable)
@@ -588,32 +791,111 @@ class Model_KV():
         return self.ANOVAResultInHTML
 
     def ImportFiles(self):
-        # import files for evaluation.
-        self.Ktrans_ref_raw = QIBA_functions.ImportFile(self.path_ref_K, self.nrOfRows, self.nrOfColumns, self.patchLen, 'GKM')
-        self.Ve_ref_raw = QIBA_functions.ImportFile(self.path_ref_V, self.nrOfRows, self.nrOfColumns, self.patchLen, 'GKM')
-        self.Ktrans_cal_raw = QIBA_functions.ImportFile(self.path_cal_K, self.nrOfRows, self.nrOfColumns, self.patchLen, 'GKM')
-        self.Ve_cal_raw = QIBA_functions.ImportFile(self.path_cal_V, self.nrOfRows, self.nrOfColumns, self.patchLen, 'GKM')
+        # import files for evaluation. the four files are imported at the same time, the reference maps imported before are taken from the reference cache.
+        self.Ktrans_ref_map, self.Ve_ref_map, self.Ktrans_cal_map, self.Ve_cal_map = ImportParameterMaps(
+            [self.path_ref_K, self.path_ref_V, self.path_cal_K, self.path_cal_V], [True, True, False, False], self.nrOfRows, self.nrOfColumns, self.patchLen, 'GKM', self.memoryMap)
 
     def PreprocessFilesForGKM(self):
-        # pre-process
-        self.Ktrans_ref_inRow = self.Ktrans_ref_raw[self.patchLen:-self.patchLen]
-        self.Ktrans_ref = QIBA_functions.Rearrange(self.Ktrans_ref_inRow, self.nrOfRows, self.nrOfColumns, self.patchLen)
-
-        self.Ktrans_cal_inRow = self.Ktrans_cal_raw[self.patchLen:-self.patchLen]
-        self.Ktrans_cal_inPatch_raw = QIBA_functions.Rearrange(self.Ktrans_cal_inRow, self.nrOfRows, self.nrOfColumns, self.patchLen)
-
-        self.Ve_ref_inRow = self.Ve_ref_raw[self.patchLen:-self.patchLen]
-        self.Ve_ref = QIBA_functions.Rearrange(self.Ve_ref_inRow, self.nrOfRows, self.nrOfColumns, self.patchLen)
-
-        self.Ve_cal_inRow = self.Ve_cal_raw[self.patchLen:-self.patchLen]
-        self.Ve_cal_inPatch_raw = QIBA_functions.Rearrange(self.Ve_cal_inRow, self.nrOfRows, self.nrOfColumns, self.patchLen)
-
-        replaceValue = numpy.nan
-        self.Ktrans_cal, self.Ktrans_NaN_percentage = QIBA_functions.DefineNaN(self.Ktrans_cal_inPatch_raw, 'MODE1', [-10001, -9999], replaceValue)
-        self.Ve_cal, self.Ve_NaN_percentage = QIBA_functions.DefineNaN(self.Ve_cal_inPatch_raw, 'MODE1', [-10001, -9999], replaceValue)
+        # pre-process. in the out-of-core evaluation the NaN are defined band by band.
+        if not self.bandSize:
+            self.Ktrans_NaN_percentage = self.Ktrans_cal_map.DefineNaN(self.NaNSentinels)
+            self.Ve_NaN_percentage = self.Ve_cal_map.DefineNaN(self.NaNSentinels)
+
+        self.Ktrans_ref_inRow, self.Ktrans_ref = self.Ktrans_ref_map.InRow(), self.Ktrans_ref_map.InPatch()
+        self.Ve_ref_inRow, self.Ve_ref = self.Ve_ref_map.InRow(), self.Ve_ref_map.InPatch()
+        self.Ktrans_cal_inRow, self.Ktrans_cal = self.Ktrans_cal_map.InRow(), self.Ktrans_cal_map.InPatch()
+        self.Ve_cal_inRow, self.Ve_cal = self.Ve_cal_map.InRow(), self.Ve_cal_map.InPatch()
+
+    def EvaluateInBands(self):
+        # out-of-core evaluation. the calculated maps are evaluated one band of patch rows at a time from the memory maps, so that only one band is copied into memory.
+        # the results of the patches and of the rows and the error maps are collected band by band, the results along the columns are accumulated over the bands.
+        self.Ktrans_ref_patchValue = self.Ktrans_ref_map.PatchValue('MEAN')
+        self.Ve_ref_patchValue = self.Ve_ref_map.PatchValue('MEAN')
+        self.PrepareHeaders()
 
-        self.Ktrans_cal_inRow = QIBA_functions.DefineNaN_InRow(self.Ktrans_cal_inRow, 'MODE1', [-10001, -9999], numpy.nan)
-        self.Ve_cal_inRow = QIBA_functions.DefineNaN_InRow(self.Ve_cal_inRow, 'MODE1', [-10001, -9999], numpy.nan)
+        # the results collected row by row
+        rowResults = ['Ktrans_cal_patchValue', 'Ve_cal_patchValue', 'Ktrans_NaN_percentage', 'Ve_NaN_percentage',
+                      'Ktrans_cal_patch_mean', 'Ve_cal_patch_mean', 'Ktrans_cal_patch_median', 'Ve_cal_patch_median',
+                      'Ktrans_cal_patch_deviation', 'Ve_cal_patch_deviation', 'Ktrans_cal_patch_1stQuartile', 'Ve_cal_patch_1stQuartile',
+                      'Ktrans_cal_patch_3rdQuartile', 'Ve_cal_patch_3rdQuartile', 'Ktrans_cal_patch_min', 'Ve_cal_patch_min', 'Ktrans_cal_patch_max', 'Ve_cal_patch_max',
+                      'Ktrans_cal_patch_ttest_t', 'Ve_cal_patch_ttest_t', 'Ktrans_cal_patch_ttest_p', 'Ve_cal_patch_ttest_p',
+                      'Ktrans_cal_patch_Utest_u', 'Ve_cal_patch_Utest_u', 'Ktrans_cal_patch_Utest_p', 'Ve_cal_patch_Utest_p',
+                      'Ktrans_cal_patch_Chisquare_c', 'Ve_cal_patch_Chisquare_c', 'Ktrans_cal_patch_Chisquare_p', 'Ve_cal_patch_Chisquare_p',
+                      'Ktrans_ccc', 'Ve_ccc', 'Ktrans_rms', 'Ve_rms', 'Ktrans_bias', 'Ve_bias', 'Ktrans_TDI', 'Ve_TDI', 'Ktrans_TDI_exact', 'Ve_TDI_exact',
+                      'Ktrans_cal_patch_ANOVA_f', 'Ktrans_cal_patch_ANOVA_p',
+                      'a_lin_Ve', 'b_lin_Ve', 'r_squared_lin_V', 'a_lin_Ve_stderr', 'b_lin_Ve_stderr', 'a_lin_Ve_CI', 'b_lin_Ve_CI',
+                      'a_log_Ve', 'b_log_Ve', 'a_log_Ve_stderr', 'b_log_Ve_stderr', 'r_squared_log_V',
+                      'corr_VV', 'corr_KV', 'cov_VV', 'cov_KV', 'Ktrans_error', 'Ve_error', 'Ktrans_error_normalized', 'Ve_error_normalized']
+        for name in rowResults:
+            setattr(self, name, [])
+
+        # the running sums along the columns
+        sums_KK = numpy.zeros((6, self.nrOfColumns))
+        sums_VK = numpy.zeros((6, self.nrOfColumns))
+        sums_logK = numpy.zeros((6, self.nrOfColumns))
+        sums_ANOVA_V = numpy.zeros((5, self.nrOfColumns))
+
+        for firstRow in range(0, self.nrOfRows, self.bandSize):
+            rows = slice(firstRow, min(firstRow + self.bandSize, self.nrOfRows))
+            nrR = rows.stop - rows.start
+            nrC = self.nrOfColumns
+
+            Ktrans_ref_inRow = self.Ktrans_ref_inRow[rows.start * self.patchLen:rows.stop * self.patchLen]
+            Ve_ref_inRow = self.Ve_ref_inRow[rows.start * self.patchLen:rows.stop * self.patchLen]
+            Ktrans_ref = self.Ktrans_ref[rows]
+            Ve_ref = self.Ve_ref[rows]
+            Ktrans_ref_patchValue = self.Ktrans_ref_patchValue[rows]
+            Ve_ref_patchValue = self.Ve_ref_patchValue[rows]
+            Ktrans_cal_inRow, Ktrans_cal, Ktrans_NaN_percentage = self.Ktrans_cal_map.Band(rows, self.NaNSentinels)
+            Ve_cal_inRow, Ve_cal, Ve_NaN_percentage = self.Ve_cal_map.Band(rows, self.NaNSentinels)
+            Ktrans_cal_patchValue = QIBA_functions.EstimatePatch(Ktrans_cal, 'MEAN', nrR, nrC)
+            Ve_cal_patchValue = QIBA_functions.EstimatePatch(Ve_cal, 'MEAN', nrR, nrC)
+
+            band = {'Ktrans_cal_patchValue': Ktrans_cal_patchValue, 'Ve_cal_patchValue': Ve_cal_patchValue,
+                    'Ktrans_NaN_percentage': Ktrans_NaN_percentage, 'Ve_NaN_percentage': Ve_NaN_percentage}
+            for prefix, patches in (('Ktrans_cal_patch_', Ktrans_cal), ('Ve_cal_patch_', Ve_cal)):
+                for name, statistic in QIBA_functions.CalculatePatchStatistics(patches).items():
+                    band[prefix + name] = statistic
+            for prefix, calculated, reference in (('Ktrans_', Ktrans_cal, Ktrans_ref), ('Ve_', Ve_cal, Ve_ref)):
+                for name, agreement in QIBA_functions.CalculateAgreement(calculated, reference).items():
+                    band[prefix + name] = agreement
+            band['Ktrans_cal_patch_ttest_t'], band['Ktrans_cal_patch_ttest_p'] = QIBA_functions.T_Test_OneSample(Ktrans_cal, Ktrans_ref_patchValue, nrR, nrC)
+            band['Ve_cal_patch_ttest_t'], band['Ve_cal_patch_ttest_p'] = QIBA_functions.T_Test_OneSample(Ve_cal, Ve_ref_patchValue, nrR, nrC)
+            band['Ktrans_cal_patch_Utest_u'], band['Ktrans_cal_patch_Utest_p'] = QIBA_functions.U_Test(Ktrans_cal, Ktrans_ref, nrR, nrC)
+            band['Ve_cal_patch_Utest_u'], band['Ve_cal_patch_Utest_p'] = QIBA_functions.U_Test(Ve_cal, Ve_ref, nrR, nrC)
+            band['Ktrans_cal_patch_Chisquare_c'], band['Ktrans_cal_patch_Chisquare_p'] = QIBA_functions.ChiSquare_Test(Ktrans_cal, nrR, nrC)
+            band['Ve_cal_patch_Chisquare_c'], band['Ve_cal_patch_Chisquare_p'] = QIBA_functions.ChiSquare_Test(Ve_cal, nrR, nrC)
+
+            # the results along the rows: Ktrans ANOVA, Ve fitting, correlation and covariance
+            band['Ktrans_cal_patch_ANOVA_f'], band['Ktrans_cal_patch_ANOVA_p'] = QIBA_functions.ANOVA_OneWay(Ktrans_cal)[:2]
+            band['a_lin_Ve'], band['b_lin_Ve'], band['r_squared_lin_V'], band['a_lin_Ve_stderr'], band['b_lin_Ve_stderr'], band['a_lin_Ve_CI'], band['b_lin_Ve_CI'] = \
+                QIBA_functions.FittingLinearModel(Ve_cal_patchValue, Ve_ref_patchValue, 1)
+            band['a_log_Ve'], band['b_log_Ve'], band['a_log_Ve_stderr'], band['b_log_Ve_stderr'], band['r_squared_log_V'] = QIBA_functions.FittingLogarithmicModel(Ve_cal_patchValue, Ve_ref_patchValue, 1)
+            band['corr_VV'], band['cov_VV'] = QIBA_functions.CalCorrAndCov(Ve_cal_patchValue, Ve_ref_patchValue, 1)
+            band['corr_KV'], band['cov_KV'] = QIBA_functions.CalCorrAndCov(Ktrans_cal_patchValue, Ve_ref_patchValue, 1)
+
+            # the error maps in pixels
+            band['Ktrans_error'] = QIBA_functions.CalculateError(Ktrans_cal_inRow, Ktrans_ref_inRow)
+            band['Ve_error'] = QIBA_functions.CalculateError(Ve_cal_inRow, Ve_ref_inRow)
+            band['Ktrans_error_normalized'] = QIBA_functions.CalculateNormalizedError(Ktrans_cal_inRow, Ktrans_ref_inRow)
+            band['Ve_error_normalized'] = QIBA_functions.CalculateNormalizedError(Ve_cal_inRow, Ve_ref_inRow)
+            for name in rowResults:
+                getattr(self, name).extend(band[name])
+
+            # the results along the columns: Ktrans fitting, correlation and covariance, Ve ANOVA
+            QIBA_functions.AccumulatePairSums(sums_KK, Ktrans_ref_patchValue, Ktrans_cal_patchValue)
+            QIBA_functions.AccumulatePairSums(sums_VK, Ktrans_ref_patchValue, Ve_cal_patchValue)
+            with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+                QIBA_functions.AccumulatePairSums(sums_logK, numpy.log10(Ktrans_ref_patchValue), Ktrans_cal_patchValue)
+            QIBA_functions.AccumulateANOVASums(sums_ANOVA_V, Ve_cal)
+
+        self.Ktrans_cal_patchValue = numpy.array(self.Ktrans_cal_patchValue)
+        self.Ve_cal_patchValue = numpy.array(self.Ve_cal_patchValue)
+        self.a_lin_Ktrans, self.b_lin_Ktrans, self.r_squared_lin_K, self.a_lin_Ktrans_stderr, self.b_lin_Ktrans_stderr, self.a_lin_Ktrans_CI, self.b_lin_Ktrans_CI = QIBA_functions.FittingLinearModelFromSums(sums_KK)
+        self.b_log_Ktrans, self.a_log_Ktrans, self.b_log_Ktrans_stderr, self.a_log_Ktrans_stderr, self.r_squared_log_K = [list(result) for result in QIBA_functions.FittingLeastSquaresFromSums(sums_logK)]
+        self.corr_KK, self.cov_KK = QIBA_functions.CalCorrAndCovFromSums(sums_KK)
+        self.corr_VK, self.cov_VK = QIBA_functions.CalCorrAndCovFromSums(sums_VK)
+        self.Ve_cal_patch_ANOVA_f, self.Ve_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWayFromSums(sums_ANOVA_V)
 
     def CalculateErrorForModel(self):
         # calculate the error between calculated and reference files
@@ -623,83 +905,46 @@ class Model_KV():
         self.Ktrans_error_normalized = QIBA_functions.CalculateNormalizedError(self.Ktrans_cal_inRow, self.Ktrans_ref_inRow)
         self.Ve_error_normalized = QIBA_functions.CalculateNormalizedError(self.Ve_cal_inRow, self.Ve_ref_inRow)
 
+    def EstimatePatchValueForModel(self):
+        # represent the patches by their mean values
+        self.EstimatePatchForModel('MEAN')
+
     def EstimatePatchForModel(self, patchValueMethod):
         # estimate the value to represent the patches for each imported DICOM
-        self.Ktrans_ref_patchValue = QIBA_functions.EstimatePatch(self.Ktrans_ref, patchValueMethod, self.nrOfRows, self.nrOfColumns)
-        self.Ve_ref_patchValue = QIBA_functions.EstimatePatch(self.Ve_ref, patchValueMethod, self.nrOfRows, self.nrOfColumns)
-        self.Ktrans_cal_patchValue = QIBA_functions.EstimatePatch(self.Ktrans_cal, patchValueMethod, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patchValue = QIBA_functions.EstimatePatch(self.Ve_cal, patchValueMethod, self.nrOfRows, self.nrOfColumns)
+        self.Ktrans_ref_patchValue = self.Ktrans_ref_map.PatchValue(patchValueMethod)
+        self.Ve_ref_patchValue = self.Ve_ref_map.PatchValue(patchValueMethod)
+        self.Ktrans_cal_patchValue = self.Ktrans_cal_map.PatchValue(patchValueMethod)
+        self.Ve_cal_patchValue = self.Ve_cal_map.PatchValue(patchValueMethod)
 
     def FittingLinearModelForModel(self):
         # fit a planar for the calculated Ktrans and Ve maps
-        self.a_lin_Ktrans, self.b_lin_Ktrans, self.r_squared_lin_K = QIBA_functions.FittingLinearModel(zip(*self.Ktrans_cal_patchValue), zip(*self.Ktrans_ref_patchValue), self.nrOfColumns)
-        self.a_lin_Ve, self.b_lin_Ve, self.r_squared_lin_V = QIBA_functions.FittingLinearModel(self.Ve_cal_patchValue, self.Ve_ref_patchValue, self.nrOfRows)
+        self.a_lin_Ktrans, self.b_lin_Ktrans, self.r_squared_lin_K, self.a_lin_Ktrans_stderr, self.b_lin_Ktrans_stderr, self.a_lin_Ktrans_CI, self.b_lin_Ktrans_CI = QIBA_functions.FittingLinearModel(self.Ktrans_cal_patchValue, self.Ktrans_ref_patchValue, 0)
+        self.a_lin_Ve, self.b_lin_Ve, self.r_squared_lin_V, self.a_lin_Ve_stderr, self.b_lin_Ve_stderr, self.a_lin_Ve_CI, self.b_lin_Ve_CI = QIBA_functions.FittingLinearModel(self.Ve_cal_patchValue, self.Ve_ref_patchValue, 1)
 
     def FittingLogarithmicModelForModel(self):
         # fitting logarithmic model
-        self.a_log_Ktrans, self.b_log_Ktrans = QIBA_functions.FittingLogarithmicModel(zip(*self.Ktrans_cal_patchValue), zip(*self.Ktrans_ref_patchValue), self.nrOfColumns) # , self.c_log_Ktrans
-        self.a_log_Ve, self.b_log_Ve = QIBA_functions.FittingLogarithmicModel(self.Ve_cal_patchValue, self.Ve_ref_patchValue, self.nrOfRows) # , self.c_log_Ve
-
-    def CalculateCorrelationForModel(self):
-        # calculate the correlation between the calculated parameters and the reference parameters
-        # 'Corre_KV' stands for 'correlation coefficient between calculate Ktrans and reference Ve', etc.
-
-        for i in range(self.nrOfColumns):
-            self.corr_KK.append(QIBA_functions.CalCorrMatrix(zip(*self.Ktrans_cal_patchValue)[i], zip(*self.Ktrans_ref_patchValue)[i])[0][1])
-            self.corr_VK.append(QIBA_functions.CalCorrMatrix(zip(*self.Ve_cal_patchValue)[i], zip(*self.Ktrans_ref_patchValue)[i])[0][1])
-        for j in range(self.nrOfRows):
-            self.corr_VV.append(QIBA_functions.CalCorrMatrix(self.Ve_cal_patchValue[j], self.Ve_ref_patchValue[j])[0][1])
-            self.corr_KV.append(QIBA_functions.CalCorrMatrix(self.Ktrans_cal_patchValue[j], self.Ve_ref_patchValue[j])[0][1])
-
-    def CalculateCovarianceForModel(self):
-        # calculate the covariance between the calculated parameters and the reference parameters
-        # e.g. 'cov_KV' stands for 'correlation coefficient between calculate Ktrans and reference Ve', etc.
-
-        for i in range(self.nrOfColumns):
-            self.cov_KK.append(QIBA_functions.CalCovMatrix(zip(*self.Ktrans_cal_patchValue)[i], zip(*self.Ktrans_ref_patchValue)[i])[0][1])
-            self.cov_VK.append(QIBA_functions.CalCovMatrix(zip(*self.Ve_cal_patchValue)[i], zip(*self.Ktrans_ref_patchValue)[i])[0][1])
-        for j in range(self.nrOfRows):
-            self.cov_VV.append(QIBA_functions.CalCovMatrix(self.Ve_cal_patchValue[j], self.Ve_ref_patchValue[j])[0][1])
-            self.cov_KV.append(QIBA_functions.CalCovMatrix(self.Ktrans_cal_patchValue[j], self.Ve_ref_patchValue[j])[0][1])
-
-    def CalculateCCCForModel(self):
-        # calculate the concordance covariance coefficients between the calculated parameters and the reference parameters
-        self.Ktrans_ccc = QIBA_functions.CCC(self.Ktrans_cal, self.Ktrans_ref, self.nrOfRows, self.nrOfColumns)
-        self.Ve_ccc = QIBA_functions.CCC(self.Ve_cal, self.Ve_ref, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateRMSForModel(self):
-        # calculate the root mean squares of each the calculated parameters
-        self.Ktrans_rms = QIBA_functions.RMS(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_rms = QIBA_functions.RMS(self.Ve_cal, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateTDIForModel(self):
-        # calculate the root mean squares of each the calculated parameters
-        self.Ktrans_TDI = QIBA_functions.TDI(self.Ktrans_cal, self.Ktrans_ref, self.nrOfRows, self.nrOfColumns)
-        self.Ve_TDI = QIBA_functions.TDI(self.Ve_cal, self.Ve_ref, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateMeanForModel(self):
-        # call the mean calculation function
-        self.Ktrans_cal_patch_mean = QIBA_functions.CalculateMean(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patch_mean = QIBA_functions.CalculateMean(self.Ve_cal, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateMedianForModel(self):
-        # call the median calculation function
-        self.Ktrans_cal_patch_median = QIBA_functions.CalculateMedian(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patch_median = QIBA_functions.CalculateMedian(self.Ve_cal, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateSTDDeviationForModel(self):
-        # call the std deviation calculation function
-        self.Ktrans_cal_patch_deviation = QIBA_functions.CalculateSTDDeviation(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patch_deviation = QIBA_functions.CalculateSTDDeviation(self.Ve_cal, self.nrOfRows, self.nrOfColumns)
-
-    def Calculate1stAnd3rdQuartileForModel(self):
-        # call the 1st and 3rd quartile calculation function
-        self.Ktrans_cal_patch_1stQuartile, self.Ktrans_cal_patch_3rdQuartile = QIBA_functions.Calculate1stAnd3rdQuartile(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patch_1stQuartile, self.Ve_cal_patch_3rdQuartile = QIBA_functions.Calculate1stAnd3rdQuartile(self.Ve_cal, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateMinAndMaxForModel(self):
-        self.Ktrans_cal_patch_min, self.Ktrans_cal_patch_max = QIBA_functions.CalculateMinAndMax(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patch_min, self.Ve_cal_patch_max = QIBA_functions.CalculateMinAndMax(self.Ve_cal, self.nrOfRows, self.nrOfColumns)
+        self.a_log_Ktrans, self.b_log_Ktrans, self.a_log_Ktrans_stderr, self.b_log_Ktrans_stderr, self.r_squared_log_K = QIBA_functions.FittingLogarithmicModel(self.Ktrans_cal_patchValue, self.Ktrans_ref_patchValue, 0)
+        self.a_log_Ve, self.b_log_Ve, self.a_log_Ve_stderr, self.b_log_Ve_stderr, self.r_squared_log_V = QIBA_functions.FittingLogarithmicModel(self.Ve_cal_patchValue, self.Ve_ref_patchValue, 1)
+
+    def CalculateCorrelationAndCovarianceForModel(self):
+        # calculate the correlation and covariance between the calculated parameters and the reference parameters, of all the rows and columns at once
+        # e.g. 'corr_KV' stands for 'correlation coefficient between calculate Ktrans and reference Ve', etc. Ktrans reference changes along the rows, Ve reference along the columns.
+        self.corr_KK, self.cov_KK = QIBA_functions.CalCorrAndCov(self.Ktrans_cal_patchValue, self.Ktrans_ref_patchValue, 0)
+        self.corr_VK, self.cov_VK = QIBA_functions.CalCorrAndCov(self.Ve_cal_patchValue, self.Ktrans_ref_patchValue, 0)
+        self.corr_VV, self.cov_VV = QIBA_functions.CalCorrAndCov(self.Ve_cal_patchValue, self.Ve_ref_patchValue, 1)
+        self.corr_KV, self.cov_KV = QIBA_functions.CalCorrAndCov(self.Ktrans_cal_patchValue, self.Ve_ref_patchValue, 1)
+
+    def CalculateAgreementForModel(self):
+        # calculate the agreement between the calculated parameters and the reference parameters of each patch: CCC, RMS, bias and TDI, in one pass for each map
+        for prefix, calculated, reference in (('Ktrans_', self.Ktrans_cal, self.Ktrans_ref), ('Ve_', self.Ve_cal, self.Ve_ref)):
+            for name, agreement in QIBA_functions.CalculateAgreement(calculated, reference).items():
+                setattr(self, prefix + name, agreement)
+
+    def CalculatePatchStatisticsForModel(self):
+        # calculate the mean, median, std. deviation, 1st and 3rd quartile, min. and max. value of each patch, in one pass for each map
+        for prefix, patches in (('Ktrans_cal_patch_', self.Ktrans_cal), ('Ve_cal_patch_', self.Ve_cal)):
+            for name, statistic in QIBA_functions.CalculatePatchStatistics(patches).items():
+                setattr(self, prefix + name, statistic)
 
     def T_TestForModel(self):
         # call the Ttest function
@@ -718,33 +963,44 @@ class Model_KV():
 
     def ANOVAForModel(self):
         # call the ANOVA function
-        self.Ktrans_cal_patch_ANOVA_f, self.Ktrans_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.Ve_cal_patch_ANOVA_f, self.Ve_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(zip(*self.Ve_cal), self.nrOfColumns, self.nrOfRows)
+        # Ktrans along each row, Ve along each column
+        self.Ktrans_cal_patch_ANOVA_f, self.Ktrans_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(self.Ktrans_cal)[:2]
+        self.Ve_cal_patch_ANOVA_f, self.Ve_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(self.Ve_cal)[2:]
 
 
 class Model_T1():
     '''
     the class for T1 model.
     '''
-    def __init__(self, path_ref_T1, path_cal_T1, dimension):
+    def __init__(self, path_ref_T1, path_cal_T1, dimension, memoryMap = False, NaNSentinels = None, bandSize = 0):
         # initializes the class
 
         # pass the paths
         self.path_ref_T1 = path_ref_T1
         self.path_cal_T1 = path_cal_T1
+        self.memoryMap = memoryMap # map binary files read-only instead of reading them into memory
+
+        # the values and ranges (low, high) in the calculated map which stand for NaN, e.g. fill values of a vendor
+        if NaNSentinels is None:
+            NaNSentinels = [[-0.001, 0.001]]
+        self.NaNSentinels = NaNSentinels
+
+        # out-of-core evaluation: the number of patch rows evaluated at a time. 0 evaluates the whole maps at once.
+        # the memory-mapped maps are always evaluated in bands, so that they are never copied into memory as a whole.
+        self.bandSize = bandSize
+        if self.bandSize:
+            self.memoryMap = True
+        elif self.memoryMap:
+            self.bandSize = defaultBandSize
 
         # parameters of the image size
         self.nrOfRows, self.nrOfColumns = dimension
         self.patchLen = 10
         self.METHOD = '' # for patch value decision
 
-        # the raw image data as pixel flow
-        self.T1_ref = []
-        self.T1_cal = []
-
-        # the image data in row, for showing the preview of the images
-        self.T1_ref_inRow = [[]for i in range(self.nrOfRows * self.patchLen)]
-        self.T1_cal_inRow = [[]for i in range(self.nrOfRows * self.patchLen)]
+        # the parameter maps. the maps in row (*_inRow, for showing the preview of the images) and in patches (e.g. T1_ref) are views on them
+        self.T1_ref_map = None
+        self.T1_cal_map = None
 
         # the error map between calculated and reference file
         self.T1_error = []
@@ -803,6 +1059,9 @@ class Model_T1():
         self.headersVertical = []
         self.headersHorizontal = []
 
+        # the metrics and steps which are evaluated
+        self.evaluated = set()
+
         # import the files
         self.ImportFiles()
         self.PreprocessFilesForT1()
@@ -811,41 +1070,44 @@ class Model_T1():
         self.R1_cal = []
         self.R1_ref = []
 
-    def Evaluate(self):
-        # evaluation
-
-        # pre-process for the imported files
-        self.CalculateErrorForModel()
-        self.EstimatePatchForModel('MEAN')
-        self.CalculateR1()
-        self.PrepareHeaders()
-
-        # evaluation operations
-        self.FittingLinearModelForModel()
-        self.FittingLogarithmicModelForModel()
-        self.CalculateCorrelationForModel()
-        self.CalculateCovarianceForModel()
-        self.CalculateCCCForModel()
-        self.CalculateMeanForModel()
-        self.CalculateMedianForModel()
-        self.CalculateSTDDeviationForModel()
-        self.Calculate1stAnd3rdQuartileForModel()
-        self.CalculateMinAndMaxForModel()
-        self.T_TestForModel()
-        self.U_TestForModel()
-        self.ChiSquareTestForModel()
-        # self.ANOVAForModel()
-
-        # write HTML result
-        self.htmlNaN()
-        self.htmlCovCorrResults()
-        self.htmlModelFitting()
-        self.htmlT_TestResults()
-        self.htmlU_TestResults()
-        self.htmlCCCResults()
-        self.htmlStatistics()
-        self.htmlChiq_TestResults()
-        # self.htmlANOVAResults()
+    # the registry of the metrics and of the steps they depend on: name -> (dependencies, calculation method, HTML method)
+    metricRegistry = {
+        'error': ([], 'CalculateErrorForModel', None),
+        'patchValue': ([], 'EstimatePatchValueForModel', None),
+        'R1': ([], 'CalculateR1', None),
+        'headers': (['R1'], 'PrepareHeaders', None),
+        'linearFit': (['patchValue'], 'FittingLinearModelForModel', None),
+        'logFit': (['patchValue'], 'FittingLogarithmicModelForModel', None),
+        'agreement': ([], 'CalculateAgreementForModel', None),
+        'NaN': (['headers'], None, 'htmlNaN'),
+        'correlation': (['patchValue', 'headers'], 'CalculateCorrelationAndCovarianceForModel', 'htmlCovCorrResults'),
+        'fit': (['headers', 'linearFit', 'logFit'], None, 'htmlModelFitting'),
+        't-test': (['patchValue', 'headers'], 'T_TestForModel', 'htmlT_TestResults'),
+        'U-test': (['headers'], 'U_TestForModel', 'htmlU_TestResults'),
+        'CCC': (['headers', 'agreement'], None, 'htmlCCCResults'),
+        'RMS': (['agreement'], None, None),
+        'TDI': (['agreement'], None, None),
+        'bias': (['agreement'], None, None),
+        'statistics': (['headers'], 'CalculatePatchStatisticsForModel', 'htmlStatistics'),
+        'ANOVA': (['headers'], 'ANOVAForModel', 'htmlANOVAResults'),
+        'chi-square': (['headers'], 'ChiSquareTestForModel', 'htmlChiq_TestResults'),
+    }
+
+    # the metrics evaluated by default
+    defaultMetrics = ['error', 'NaN', 'correlation', 'fit', 't-test', 'U-test', 'CCC', 'statistics', 'chi-square']
+
+    def Evaluate(self, metrics = None, nrOfWorkers = 1, resultCache = None):
+        # evaluate the metrics (all the default metrics if None) and write their HTML results. only the steps the metrics depend on are run,
+        # and each step runs once per model, so requesting a metric again is free. with more than one worker, the independent metrics are calculated at the same time.
+        # with a result cache (QIBA_cache.ResultCache), the results of an earlier evaluation of the same files are taken from the cache.
+        # the evaluation in bands calculates all the metrics in one pass.
+        if metrics is None:
+            metrics = self.defaultMetrics
+        def Calculate():
+            if self.bandSize and not self.evaluated:
+                self.EvaluateInBands()
+            EvaluateMetrics(self, metrics, nrOfWorkers, calculate = not self.bandSize)
+        EvaluateWithResultCache(self, [self.path_ref_T1, self.path_cal_T1], metrics, resultCache, Calculate)
 
     def PrepareHeaders(self):
         # prepare the headers for table editing
@@ -853,7 +1115,7 @@ class Model_T1():
         #     self.headersVertical.append('Row = ' + str(i+1))
         self.headersVertical = ['S0 = 500', 'S0 = 1000', 'S0 = 2000', 'S0 = 5000', 'S0 = 10000', 'S0 = 20000', 'S0 = 50000']
         for j in range(self.nrOfColumns):
-            self.headersHorizontal.append('R1 = ' + QIBA_functions.formatFloatTo4DigitsString(self.R1_ref[0][j][0]))
+            self.headersHorizontal.append('R1 = ' + QIBA_functions.formatFloatTo4DigitsString(self.R1_ref[0][j][0][0]))
 
     def htmlStatistics(self):
         # write the statistics to html form
@@ -898,6 +1160,8 @@ class Model_T1():
             T1LinearFitting += ') * T1_ref + ('
             T1LinearFitting += QIBA_functions.formatFloatTo4DigitsString(self.b_lin_T1[i])
             T1LinearFitting += '), R-squared value: ' + QIBA_functions.formatFloatTo4DigitsString(self.r_squared_lin_T1[i])
+            T1LinearFitting += '<br>standard errors: ' + QIBA_functions.formatFloatTo4DigitsString(self.a_lin_T1_stderr[i]) + ', ' + QIBA_functions.formatFloatTo4DigitsString(self.b_lin_T1_stderr[i])
+            T1LinearFitting += '<br>95% confidence intervals: ' + QIBA_functions.formatIntervalTo4DigitsString(self.a_lin_T1_CI[i]) + ', ' + QIBA_functions.formatIntervalTo4DigitsString(self.b_lin_T1_CI[i])
             T1LinearFitting += '</td>'
             T1LinearFitting += '</tr>'
 
@@ -916,7 +1180,8 @@ class Model_T1():
             T1LogarithmicFitting += QIBA_functions.formatFloatTo4DigitsString(self.a_log_T1[i])
             T1LogarithmicFitting += ') + ('
             T1LogarithmicFitting += QIBA_functions.formatFloatTo4DigitsString(self.b_log_T1[i])
-            T1LogarithmicFitting += ') * log10(T1_ref)'
+            T1LogarithmicFitting += ') * log10(T1_ref), R-squared value: ' + QIBA_functions.formatFloatTo4DigitsString(self.r_squared_log_T1[i])
+            T1LogarithmicFitting += '<br>standard errors: ' + QIBA_functions.formatFloatTo4DigitsString(self.a_log_T1_stderr[i]) + ', ' + QIBA_functions.formatFloatTo4DigitsString(self.b_log_T1_stderr[i])
             T1LogarithmicFitting += '</td>'
             T1LogarithmicFitting += '</tr>'
 
@@ -1068,76 +1333,119 @@ class Model_T1():
         return self.ANOVAResultInHTML
 
     def ImportFiles(self):
-        # import files for evaluation.
-        self.T1_ref_raw = QIBA_functions.ImportFile(self.path_ref_T1, self.nrOfRows, self.nrOfColumns, self.patchLen, 'T1')
-        self.T1_cal_raw = QIBA_functions.ImportFile(self.path_cal_T1, self.nrOfRows, self.nrOfColumns, self.patchLen, 'T1')
+        # import files for evaluation. the two files are imported at the same time, the reference map imported before is taken from the reference cache.
+        self.T1_ref_map, self.T1_cal_map = ImportParameterMaps(
+            [self.path_ref_T1, self.path_cal_T1], [True, False], self.nrOfRows, self.nrOfColumns, self.patchLen, 'T1', self.memoryMap)
 
     def PreprocessFilesForT1(self):
-        self.T1_ref_inRow = self.T1_ref_raw[self.patchLen:]
-        self.T1_ref = QIBA_functions.Rearrange(self.T1_ref_inRow, self.nrOfRows, self.nrOfColumns, self.patchLen)
-
-        self.T1_cal_inRow = self.T1_cal_raw[self.patchLen:]
-        self.T1_cal_inPatch_raw = QIBA_functions.Rearrange(self.T1_cal_inRow, self.nrOfRows, self.nrOfColumns, self.patchLen)
+        # pre-process. in the out-of-core evaluation the NaN are defined band by band.
+        if not self.bandSize:
+            self.T1_NaN_percentage = self.T1_cal_map.DefineNaN(self.NaNSentinels)
+
+        self.T1_ref_inRow, self.T1_ref = self.T1_ref_map.InRow(), self.T1_ref_map.InPatch()
+        self.T1_cal_inRow, self.T1_cal = self.T1_cal_map.InRow(), self.T1_cal_map.InPatch()
+
+    def EvaluateInBands(self):
+        # out-of-core evaluation. the calculated map is evaluated one band of patch rows at a time from the memory map, so that only one band is copied into memory.
+        # the results of the patches and of the rows, the error maps and R1 are collected band by band, the ANOVA along the columns is accumulated over the bands.
+        self.T1_ref_patchValue = self.T1_ref_map.PatchValue('MEAN')
+        self.R1_ref = 1 / numpy.asarray(self.T1_ref, dtype = float)
+        self.PrepareHeaders()
 
-        # mode1: clamp; mode2: outside
-        self.T1_cal, self.T1_NaN_percentage = QIBA_functions.DealWithNaN(self.T1_cal_inPatch_raw, 'MODE1', [-0.001, 0.001])
+        # the results collected row by row
+        rowResults = ['T1_cal_patchValue', 'T1_NaN_percentage', 'T1_cal_patch_mean', 'T1_cal_patch_median', 'T1_cal_patch_deviation',
+                      'T1_cal_patch_1stQuartile', 'T1_cal_patch_3rdQuartile', 'T1_cal_patch_min', 'T1_cal_patch_max',
+                      'T1_cal_patch_ttest_t', 'T1_cal_patch_ttest_p', 'T1_cal_patch_Utest_u', 'T1_cal_patch_Utest_p',
+                      'T1_cal_patch_chisquare_c', 'T1_cal_patch_chisquare_p', 'T1_ccc', 'T1_rms', 'T1_bias', 'T1_TDI', 'T1_TDI_exact',
+                      'a_lin_T1', 'b_lin_T1', 'r_squared_lin_T1', 'a_lin_T1_stderr', 'b_lin_T1_stderr', 'a_lin_T1_CI', 'b_lin_T1_CI',
+                      'a_log_T1', 'b_log_T1', 'a_log_T1_stderr', 'b_log_T1_stderr', 'r_squared_log_T1', 'corr_T1T1', 'cov_T1T1',
+                      'T1_error', 'T1_error_normalized', 'R1_cal']
+        for name in rowResults:
+            setattr(self, name, [])
+
+        # the running sums of the ANOVA along the columns
+        sums_ANOVA = numpy.zeros((5, self.nrOfColumns))
+
+        for firstRow in range(0, self.nrOfRows, self.bandSize):
+            rows = slice(firstRow, min(firstRow + self.bandSize, self.nrOfRows))
+            nrR = rows.stop - rows.start
+            nrC = self.nrOfColumns
+
+            T1_ref_inRow = self.T1_ref_inRow[rows.start * self.patchLen:rows.stop * self.patchLen]
+            T1_ref = self.T1_ref[rows]
+            T1_ref_patchValue = self.T1_ref_patchValue[rows]
+            T1_cal_inRow, T1_cal, T1_NaN_percentage = self.T1_cal_map.Band(rows, self.NaNSentinels)
+            T1_cal_patchValue = QIBA_functions.EstimatePatch(T1_cal, 'MEAN', nrR, nrC)
+
+            band = {'T1_cal_patchValue': T1_cal_patchValue, 'T1_NaN_percentage': T1_NaN_percentage}
+            for name, statistic in QIBA_functions.CalculatePatchStatistics(T1_cal).items():
+                band['T1_cal_patch_' + name] = statistic
+            for name, agreement in QIBA_functions.CalculateAgreement(T1_cal, T1_ref).items():
+                band['T1_' + name] = agreement
+            band['T1_cal_patch_ttest_t'], band['T1_cal_patch_ttest_p'] = QIBA_functions.T_Test_OneSample(T1_cal, T1_ref_patchValue, nrR, nrC)
+            band['T1_cal_patch_Utest_u'], band['T1_cal_patch_Utest_p'] = QIBA_functions.U_Test(T1_cal, T1_ref, nrR, nrC)
+            band['T1_cal_patch_chisquare_c'], band['T1_cal_patch_chisquare_p'] = QIBA_functions.ChiSquare_Test(T1_cal, nrR, nrC)
+
+            # the results along the rows: fitting, correlation and covariance
+            band['a_lin_T1'], band['b_lin_T1'], band['r_squared_lin_T1'], band['a_lin_T1_stderr'], band['b_lin_T1_stderr'], band['a_lin_T1_CI'], band['b_lin_T1_CI'] = \
+                QIBA_functions.FittingLinearModel(T1_cal_patchValue, T1_ref_patchValue, 1)
+            band['a_log_T1'], band['b_log_T1'], band['a_log_T1_stderr'], band['b_log_T1_stderr'], band['r_squared_log_T1'] = QIBA_functions.FittingLogarithmicModel(T1_cal_patchValue, T1_ref_patchValue, 1)
+            band['corr_T1T1'], band['cov_T1T1'] = QIBA_functions.CalCorrAndCov(T1_cal_patchValue, T1_ref_patchValue, 1)
+
+            # the error maps in pixels and R1
+            band['T1_error'] = QIBA_functions.CalculateError(T1_cal_inRow, T1_ref_inRow)
+            band['T1_error_normalized'] = QIBA_functions.CalculateNormalizedError(T1_cal_inRow, T1_ref_inRow)
+            band['R1_cal'] = 1 / numpy.asarray(T1_cal, dtype = float)
+            for name in rowResults:
+                getattr(self, name).extend(band[name])
+
+            # the ANOVA along the columns
+            QIBA_functions.AccumulateANOVASums(sums_ANOVA, T1_cal)
+
+        self.T1_cal_patchValue = numpy.array(self.T1_cal_patchValue)
+        self.R1_cal = numpy.array(self.R1_cal)
+        self.T1_cal_patch_ANOVA_f, self.T1_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWayFromSums(sums_ANOVA)
 
     def CalculateErrorForModel(self):
         # calculate the error between calculated and reference files
         self.T1_error = QIBA_functions.CalculateError(self.T1_cal_inRow, self.T1_ref_inRow)
         self.T1_error_normalized = QIBA_functions.CalculateNormalizedError(self.T1_cal_inRow, self.T1_ref_inRow)
 
+    def EstimatePatchValueForModel(self):
+        # represent the patches by their mean values
+        self.EstimatePatchForModel('MEAN')
+
     def EstimatePatchForModel(self, patchValueMethod):
         # estimate the value to represent the patches for each imported DICOM
-        self.T1_ref_patchValue = QIBA_functions.EstimatePatch(self.T1_ref, patchValueMethod, self.nrOfRows, self.nrOfColumns)
-        self.T1_cal_patchValue = QIBA_functions.EstimatePatch(self.T1_cal, patchValueMethod, self.nrOfRows, self.nrOfColumns)
+        self.T1_ref_patchValue = self.T1_ref_map.PatchValue(patchValueMethod)
+        self.T1_cal_patchValue = self.T1_cal_map.PatchValue(patchValueMethod)
 
     def FittingLinearModelForModel(self):
         # fit a planar for the calculated Ktrans and Ve maps
-        self.a_lin_T1, self.b_lin_T1, self.r_squared_lin_T1 = QIBA_functions.FittingLinearModel(self.T1_cal_patchValue,self.T1_ref_patchValue, self.nrOfRows)
+        self.a_lin_T1, self.b_lin_T1, self.r_squared_lin_T1, self.a_lin_T1_stderr, self.b_lin_T1_stderr, self.a_lin_T1_CI, self.b_lin_T1_CI = QIBA_functions.FittingLinearModel(self.T1_cal_patchValue, self.T1_ref_patchValue, 1)
 
     def FittingLogarithmicModelForModel(self):
         # fitting logarithmic model
-        self.a_log_T1,self.b_log_T1 = QIBA_functions.FittingLogarithmicModel(self.T1_cal_patchValue, self.T1_ref_patchValue, self.nrOfRows) # , self.c_log_Ve
-
-    def CalculateCorrelationForModel(self):
-        # calculate the correlation between the calculated parameters and the reference parameter.
-        for j in range(self.nrOfRows):
-            self.corr_T1T1.append(QIBA_functions.CalCorrMatrix(self.T1_cal_patchValue[j], self.T1_ref_patchValue[j])[0][1])
-
-    def CalculateCovarianceForModel(self):
-        # calculate the covariance between the calculated parameters and the reference parameters
-
-        for j in range(self.nrOfRows):
-            self.cov_T1T1.append(QIBA_functions.CalCovMatrix(self.T1_cal_patchValue[j], self.T1_ref_patchValue[j])[0][1])
+        self.a_log_T1, self.b_log_T1, self.a_log_T1_stderr, self.b_log_T1_stderr, self.r_squared_log_T1 = QIBA_functions.FittingLogarithmicModel(self.T1_cal_patchValue, self.T1_ref_patchValue, 1)
 
-    def CalculateCCCForModel(self):
-        # calculate the concordance covariance coefficients between the calculated parameters and the reference parameters
-        self.T1_ccc = QIBA_functions.CCC(self.T1_cal, self.T1_ref, self.nrOfRows, self.nrOfColumns)
+    def CalculateCorrelationAndCovarianceForModel(self):
+        # calculate the correlation and covariance between the calculated parameters and the reference parameter, of all the rows at once
+        self.corr_T1T1, self.cov_T1T1 = QIBA_functions.CalCorrAndCov(self.T1_cal_patchValue, self.T1_ref_patchValue, 1)
 
-    def CalculateMeanForModel(self):
-        # call the mean calculation function
-        self.T1_cal_patch_mean = QIBA_functions.CalculateMean(self.T1_cal, self.nrOfRows, self.nrOfColumns)
+    def CalculateAgreementForModel(self):
+        # calculate the agreement between the calculated parameters and the reference parameters of each patch: CCC, RMS, bias and TDI, in one pass
+        for name, agreement in QIBA_functions.CalculateAgreement(self.T1_cal, self.T1_ref).items():
+            setattr(self, 'T1_' + name, agreement)
 
-    def CalculateMedianForModel(self):
-        # call the median calculation function
-        self.T1_cal_patch_median = QIBA_functions.CalculateMedian(self.T1_cal, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateSTDDeviationForModel(self):
-        # call the std deviation calculation function
-        self.T1_cal_patch_deviation = QIBA_functions.CalculateSTDDeviation(self.T1_cal, self.nrOfRows, self.nrOfColumns)
+    def CalculatePatchStatisticsForModel(self):
+        # calculate the mean, median, std. deviation, 1st and 3rd quartile, min. and max. value of each patch, in one pass
+        for name, statistic in QIBA_functions.CalculatePatchStatistics(self.T1_cal).items():
+            setattr(self, 'T1_cal_patch_' + name, statistic)
 
     def ChiSquareTestForModel(self):
         # call the std deviation calculation function
         self.T1_cal_patch_chisquare_c, self.T1_cal_patch_chisquare_p = QIBA_functions.ChiSquare_Test(self.T1_cal, self.nrOfRows, self.nrOfColumns)
 
-    def Calculate1stAnd3rdQuartileForModel(self):
-        # call the 1st and 3rd quartile calculation function
-        self.T1_cal_patch_1stQuartile, self.T1_cal_patch_3rdQuartile = QIBA_functions.Calculate1stAnd3rdQuartile(self.T1_cal, self.nrOfRows, self.nrOfColumns)
-
-    def CalculateMinAndMaxForModel(self):
-        self.T1_cal_patch_min, self.T1_cal_patch_max = QIBA_functions.CalculateMinAndMax(self.T1_cal, self.nrOfRows, self.nrOfColumns)
-
     def T_TestForModel(self):
         # call the T test function
         self.T1_cal_patch_ttest_t, self.T1_cal_patch_ttest_p = QIBA_functions.T_Test_OneSample(self.T1_cal, self.T1_ref_patchValue, self.nrOfRows, self.nrOfColumns)
@@ -1149,28 +1457,9 @@ class Model_T1():
     def ANOVAForModel(self):
         # call the ANOVA function
         #self.Ktrans_cal_patch_ANOVA_f, self.Ktrans_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(self.Ktrans_cal, self.nrOfRows, self.nrOfColumns)
-        self.T1_cal_patch_ANOVA_f, self.T1_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(zip(*self.T1_cal), self.nrOfColumns, self.nrOfRows)
+        self.T1_cal_patch_ANOVA_f, self.T1_cal_patch_ANOVA_p = QIBA_functions.ANOVA_OneWay(self.T1_cal)[2:]
 
     def CalculateR1(self):
         # calculate the R1 from T1, as R1 = 1 / T1
-        tempPatch_cal = []
-        tempPatch_ref = []
-        tempRow_cal = []
-        tempRow_ref = []
-        temp_cal = []
-        temp_ref = []
-        for i in range(self.nrOfRows):
-            for j in range(self.nrOfColumns):
-                for k in range(self.patchLen*self.patchLen):
-                    tempPatch_cal.append(1 / self.T1_cal[i][j][k])
-                    tempPatch_ref.append(1 / self.T1_ref[i][j][k])
-                tempRow_cal.append(tempPatch_cal)
-                tempRow_ref.append(tempPatch_ref)
-                tempPatch_cal = []
-                tempPatch_ref = []
-            temp_cal.append(tempRow_cal)
-            temp_ref.append(tempRow_ref)
-            tempRow_cal = []
-            tempRow_ref = []
-        self.R1_cal = temp_cal
-        self.R1_ref = temp_ref
\ No newline at end of file
+        self.R1_cal = 1 / numpy.asarray(self.T1_cal, dtype = float)
+        self.R1_ref = 1 / numpy.asarray(self.T1_ref, dtype = float)
\ No newline at end of file
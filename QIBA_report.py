@@ -0,0 +1,385 @@
+# this package draws the figures of the evaluated models and puts them together with the result tables into the HTML report.
+# it is used by the main windows and by the headless evaluation (QIBA_batch). no wx module and no pyplot are imported, the figures are
+# drawn on the matplotlib Figure objects which are given, so they can be shown on the wx canvases or rendered on Agg canvases without display.
+# the calculated maps of a model evaluated in bands (e.g. memory-mapped) are never copied as a whole for the figures: the patches are read band by band,
+# and the map previews and scatter plots are drawn from a downsampled copy.
+import numpy
+from mpl_toolkits.axes_grid1 import make_axes_locatable
+import matplotlib.ticker as ticker
+from matplotlib import cbook, rcParams
+
+import QIBA_functions
+
+previewSize = 1000 # the largest number of pixels on a side of the map previews and scatter plots. larger maps are downsampled to it.
+
+class PatchRows():
+    '''
+    the patches of a calculated map of a model evaluated in bands, indexed as [row][column], with the NaN defined. a band of patch rows is copied and
+    its NaN are defined when one of its rows is indexed, and only the last band is kept. reading the patches row by row keeps the memory bounded by the band size.
+    '''
+    def __init__(self, model, parameterMap):
+        # initializes the class
+        self.parameterMap = parameterMap
+        self.NaNSentinels = model.NaNSentinels
+        self.nrOfRows = model.nrOfRows
+        self.bandSize = model.bandSize
+        self.firstRow = None
+        self.band = None
+
+    def __len__(self):
+        return self.nrOfRows
+
+    def __getitem__(self, i):
+        # the row i of patches, from the band which holds it
+        firstRow = i - i % self.bandSize
+        if firstRow != self.firstRow:
+            self.band = None # release the previous band first
+            self.band = self.parameterMap.Band(slice(firstRow, min(firstRow + self.bandSize, self.nrOfRows)), self.NaNSentinels)[1]
+            self.firstRow = firstRow
+        return self.band[i - firstRow]
+
+def CalculatedPatches(model, parameter):
+    # the calculated patches of a parameter with the NaN defined. for a model evaluated in bands, they are defined band by band when they are read, see PatchRows.
+    if not model.bandSize:
+        return getattr(model, parameter + '_cal')
+    return PatchRows(model, getattr(model, parameter + '_cal_map'))
+
+def Preview(model, data, calculated = False):
+    # the map in row order downsampled to at most previewSize pixels on a side, by taking every n-th pixel. the NaN of a calculated map of
+    # a model evaluated in bands are defined in the downsampled copy.
+    step = max(1, int(numpy.ceil(max(model.nrOfRows, model.nrOfColumns) * model.patchLen / float(previewSize))))
+    data = numpy.asarray(data)[::step, ::step]
+    if calculated and model.bandSize:
+        data = QIBA_functions.DefineNaN(QIBA_functions.WritableMap(data, copy = True), model.NaNSentinels)[0]
+    return data
+
+def PatchBoxStats(patches, nrOfRows, nrOfColumns):
+    # the statistics of the box plot of each patch, indexed as [row][column]. the patches are read row by row.
+    return [[cbook.boxplot_stats(QIBA_functions.DealNaN(patches[i][j])[0], whis = 1.5)[0] for j in range(nrOfColumns)] for i in range(nrOfRows)]
+
+def PlotBoxes(subPlot, boxStats):
+    # draw the box plots from their statistics, as subPlot.boxplot(data, notch = 1, sym = 'r+', whis = 1.5) would. the boxes get the line width
+    # of boxplot, which bxp leaves at the one of the lines.
+    subPlot.clear()
+    subPlot.bxp(boxStats, shownotches = True, boxprops = dict(linewidth = rcParams.get('boxplot.boxprops.linewidth', rcParams['lines.linewidth'])),
+                flierprops = dict(linestyle = 'none', marker = '+', color = 'r', markerfacecolor = 'r', markeredgecolor = 'r'))
+
+def PlotPreview(figure, dataList, titleList, colorMapList, unitList):
+    # show calculated images and the error images
+    nrOfSubFigRows = len(dataList)
+    nrOfSubFigColumns = len(dataList[0])
+
+    for i in range(nrOfSubFigRows):
+        for j in range(nrOfSubFigColumns):
+            subPlot = figure.add_subplot(nrOfSubFigRows, nrOfSubFigColumns, i * nrOfSubFigColumns + j + 1)
+            lmin = numpy.nanmin(dataList[i][j]) - 0.01
+            lmax = numpy.nanmax(dataList[i][j]) + 0.01
+            handler = subPlot.imshow(dataList[i][j], cmap = colorMapList[i][j], interpolation = 'nearest', vmin = lmin, vmax = lmax)
+            divider = make_axes_locatable(subPlot) # for tight up the color bar
+            cax = divider.append_axes("right", "5%", pad = "3%")
+            figure.colorbar(handler, cax = cax).set_label(unitList[i][j]) # show color bar and the label
+            subPlot.set_title(titleList[i][j])
+    figure.tight_layout()
+
+def PlotScatter(figure, dataList, refDataList, xLabelList, yLabelList, titleList, xLim, yLim):
+    # the scatter plots to show the distribution of the calculated values
+    nrOfSubFigRows = len(dataList)
+    nrOfSubFigColumns = len(dataList[0])
+    figure.clear()
+
+    for i in range(nrOfSubFigRows):
+        for j in range(nrOfSubFigColumns):
+            subPlot = figure.add_subplot(nrOfSubFigRows, nrOfSubFigColumns, i * nrOfSubFigColumns + j + 1)
+            subPlot.scatter(refDataList[i][j], dataList[i][j], color = 'b', alpha = 1, label = 'calculated value')
+            subPlot.scatter(refDataList[i][j], refDataList[i][j], color = 'r', alpha = 1, label = 'reference value')
+            subPlot.legend(loc = 'upper left')
+            subPlot.set_xlim(xLim[i])
+            subPlot.set_ylim(yLim[i])
+            subPlot.set_xlabel(xLabelList[i][j])
+            subPlot.set_ylabel(yLabelList[i][j])
+            subPlot.set_title(titleList[i][j])
+    figure.tight_layout()
+
+def PlotHistograms(figure, patches, patchLen, headersHorizontal, headersVertical, title):
+    # draw the histogram of each patch of a calculated map, with the same y-axis limits for all patches and a dash line at the mean value
+    pixelCountInPatch = patchLen ** 2
+    nrOfBins = 10
+    nrOfRows, nrOfColumns = len(headersVertical), len(headersHorizontal)
+
+    figure.suptitle(title)
+
+    for i in range(nrOfRows):
+        for j in range(nrOfColumns):
+            subPlot = figure.add_subplot(nrOfRows, nrOfColumns, i * nrOfColumns + j + 1)
+            processedData = QIBA_functions.DropNaN(QIBA_functions.DealNaN(patches[i][j])[0])
+            if len(processedData) == 0:
+                subPlot.plot([])
+                subPlot.xaxis.set_ticks([])
+                subPlot.yaxis.set_ticks([])
+            else:
+                subPlot.hist(processedData, nrOfBins)
+                minPatch = QIBA_functions.formatFloatTo2DigitsString(numpy.min(processedData))
+                maxPatch = QIBA_functions.formatFloatTo2DigitsString(numpy.max(processedData))
+                meanPatch = QIBA_functions.formatFloatTo2DigitsString(numpy.mean(processedData))
+
+                subPlot.set_xticks([float(minPatch), float(maxPatch)])
+                subPlot.set_xticklabels([minPatch, maxPatch])
+                subPlot.axvline(float(meanPatch), color = 'r', linestyle = 'dashed', linewidth = 1) # draw a vertical line at the mean value
+                subPlot.set_ylim([0, pixelCountInPatch])
+                subPlot.text(float(meanPatch) + 0.01 * float(meanPatch), 0.9 * pixelCountInPatch, meanPatch, size = 'x-small') # parameters: location_x, location_y, text, size
+            if i == 0:
+                subPlot.set_xlabel(headersHorizontal[j])
+                subPlot.xaxis.set_label_position('top')
+            if j == 0:
+                subPlot.set_ylabel(headersVertical[i])
+
+def PlotBlandAltman(figure, calPatches, refPatches, headersHorizontal, headersVertical, title):
+    # draw the Bland-Altman plot of each patch, the difference against the mean of the calculated and reference pixels,
+    # with a solid line at the mean difference and dash lines at the limits of agreement
+    nrOfRows, nrOfColumns = len(headersVertical), len(headersHorizontal)
+
+    figure.suptitle(title)
+
+    for i in range(nrOfRows):
+        for j in range(nrOfColumns):
+            subPlot = figure.add_subplot(nrOfRows, nrOfColumns, i * nrOfColumns + j + 1)
+            cal = numpy.ravel(calPatches[i][j])
+            ref = numpy.ravel(refPatches[i][j])
+            diff = cal - ref
+            mean = (cal + ref) / 2
+            md = numpy.mean(diff)
+            sd = numpy.std(diff)
+
+            subPlot.scatter(mean, diff, color = 'b', alpha = 0.2)
+
+            subPlot.set_xticks([float(numpy.median(mean))])
+            subPlot.set_xticklabels([QIBA_functions.formatFloatTo2DigitsString(numpy.median(mean))])
+
+            subPlot.axhline(float(md), color = 'g', linestyle = 'solid', linewidth = 1) # draw a horizontal line at the mean of difference
+            subPlot.axhline(float(md + 1.96 * sd), color = 'r', linestyle = 'dashed', linewidth = 1) # draw a horizontal line for limits of agreement
+            subPlot.axhline(float(md - 1.96 * sd), color = 'r', linestyle = 'dashed', linewidth = 1) # draw a horizontal line for limits of agreement
+            if i == 0:
+                subPlot.set_xlabel(headersHorizontal[j])
+                subPlot.xaxis.set_label_position('top')
+            if j == 0:
+                subPlot.set_ylabel(headersVertical[i])
+
+def DrawMaps(figure, model, mode):
+    # draw the maps of the preview and error
+    if mode == 'GKM':
+        PlotPreview(figure, [[Preview(model, model.Ktrans_cal_inRow, True), Preview(model, model.Ktrans_error), Preview(model, model.Ktrans_error_normalized)],
+                             [Preview(model, model.Ve_cal_inRow, True), Preview(model, model.Ve_error), Preview(model, model.Ve_error_normalized)]],
+
+                    [['Calculated Ktrans', 'Error map of Ktrans', 'Normalized Error map of Ktrans'],
+                     ['Calculated Ve', 'Error map of Ve', 'Normalized Error map of Ve']],
+
+                    [['bone', 'rainbow', 'rainbow'], ['bone', 'rainbow', 'rainbow']],
+
+                    [['Ktrans[1/min]', 'Delta Ktrans[1/min.]', 'Normalized error[%]'], ['Ve[]', 'Delta Ve[]', 'Normalized error[%]']])
+    else:
+        PlotPreview(figure, [[Preview(model, model.T1_cal_inRow, True)], [Preview(model, model.T1_error)], [Preview(model, model.T1_error_normalized)]],
+
+                    [['Calculated T1'], ['Error map of T1'], ['Normalized Error map of T1']],
+
+                    [['bone'], ['rainbow'], ['rainbow']],
+
+                    [['T1[ms]'], ['Delta T1[ms]'], ['Normalized error[%]']])
+
+def DrawScatter(figure, model, mode, inPixel = True):
+    # draw the scatters. the axes are limited to the range of the pixels, or of the patch values if not inPixel
+    if mode == 'GKM':
+        parameters = ['Ktrans', 'Ve']
+    else:
+        parameters = ['T1']
+
+    dataList, refDataList, xLim, yLim = [], [], [], []
+    for parameter in parameters:
+        cal = Preview(model, getattr(model, parameter + '_cal_inRow'), True)
+        refPixels = Preview(model, getattr(model, parameter + '_ref_inRow'))
+        if inPixel:
+            ref = refPixels
+            calValues = cal
+        else:
+            ref = getattr(model, parameter + '_ref_patchValue')
+            calValues = getattr(model, parameter + '_cal_patchValue')
+        minLim_x = numpy.nanmin(ref)
+        maxLim_x = numpy.nanmax(ref)
+        minLim_y = numpy.nanmin([numpy.min(ref), numpy.min(calValues)])
+        maxLim_y = numpy.nanmax([numpy.max(ref), numpy.max(calValues)])
+        spacing_x = (maxLim_x - minLim_x) * 0.05
+        spacing_y = (maxLim_y - minLim_y) * 0.05
+
+        dataList.append([cal])
+        refDataList.append([refPixels])
+        xLim.append([minLim_x - spacing_x, maxLim_x + spacing_x])
+        yLim.append([minLim_y - spacing_y, maxLim_y + 2 * spacing_y])
+
+    PlotScatter(figure, dataList, refDataList,
+                [['Reference ' + parameter] for parameter in parameters],
+                [['Calculated ' + parameter] for parameter in parameters],
+                [['Distribution plot of ' + parameter] for parameter in parameters],
+                xLim, yLim)
+
+def DrawHistograms(figures, model, mode):
+    # draw histograms of the calculated maps, so that the user can have a look of the distribution of each patch. for GKM the figures are
+    # the ones of Ktrans and Ve, for T1 the one of T1.
+    if mode == 'GKM':
+        figureHist_Ktrans, figureHist_Ve = figures
+        PlotHistograms(figureHist_Ktrans, CalculatedPatches(model, 'Ktrans'), model.patchLen, model.headersHorizontal, model.headersVertical, 'The histogram of the calculated Ktrans')
+        PlotHistograms(figureHist_Ve, CalculatedPatches(model, 'Ve'), model.patchLen, model.headersHorizontal, model.headersVertical, 'The histogram of the calculated Ve')
+        for figure in figures:
+            figure.tight_layout()
+            figure.subplots_adjust(top = 0.94, right = 0.95)
+    else:
+        figureHist_T1, = figures
+        PlotHistograms(figureHist_T1, CalculatedPatches(model, 'T1'), model.patchLen, model.headersHorizontal, model.headersVertical, 'The histogram of the calculated T1')
+        figureHist_T1.tight_layout(pad = 0.4, w_pad = 0.1, h_pad = 1.0)
+        figureHist_T1.subplots_adjust(top = 0.94)
+
+def DrawBlandAltmanPlots(figures, model):
+    # draw Bland-Altman plots of the calculated Ktrans and Ve maps, for viewing limits of agreement
+    figureLoA_Ktrans, figureLoA_Ve = figures
+    PlotBlandAltman(figureLoA_Ktrans, CalculatedPatches(model, 'Ktrans'), model.Ktrans_ref, model.headersHorizontal, model.headersVertical,
+                    'The Bland-Altman plots between the calculated and reference Ktrans')
+    PlotBlandAltman(figureLoA_Ve, CalculatedPatches(model, 'Ve'), model.Ve_ref, model.headersHorizontal, model.headersVertical,
+                    'The Bland-Altman plots between the calculated and reference Ve')
+    for figure in figures:
+        figure.tight_layout()
+        figure.subplots_adjust(top = 0.94, right = 0.95)
+
+def DrawBoxPlot(figure, model, mode):
+    # draw box plots of each patch. the dash lines separate the rows (or columns) of patches
+    nrOfRows, nrOfColumns = model.nrOfRows, model.nrOfColumns
+    if mode == 'GKM':
+        boxStatsK = PatchBoxStats(CalculatedPatches(model, 'Ktrans'), nrOfRows, nrOfColumns)
+        boxStatsV = PatchBoxStats(CalculatedPatches(model, 'Ve'), nrOfRows, nrOfColumns)
+        referValueK = [float('{0:.2f}'.format(model.Ktrans_ref[i][0][0][0])) for i in range(nrOfRows)]
+        referValueV = [float('{0:.2f}'.format(model.Ve_ref[0][j][0][0])) for j in range(nrOfColumns)]
+
+        subPlotK = figure.add_subplot(2, 1, 1)
+        PlotBoxes(subPlotK, [boxStatsK[i][j] for i in range(nrOfRows) for j in range(nrOfColumns)])
+
+        subPlotV = figure.add_subplot(2, 1, 2)
+        PlotBoxes(subPlotV, [boxStatsV[i][j] for j in range(nrOfColumns) for i in range(nrOfRows)])
+
+        # decorate Ktrans plot
+        subPlotK.set_title('Box plot of calculated Ktrans')
+        subPlotK.set_xlabel('In each column, each box plot denotes Ve = ' + str(referValueV) + ' respectively')
+        subPlotK.set_ylabel('Calculated values in patches')
+
+        subPlotK.xaxis.set_major_formatter(ticker.NullFormatter())
+        subPlotK.xaxis.set_minor_locator(ticker.FixedLocator([nrOfColumns * i + (nrOfColumns + 1) / 2.0 for i in range(nrOfRows)]))
+        subPlotK.xaxis.set_minor_formatter(ticker.FixedFormatter(['Ktrans = ' + str(value) for value in referValueK]))
+        for i in range(nrOfRows):
+            subPlotK.axvline(x = nrOfColumns * i + 0.5, color = 'green', linestyle = 'dashed')
+
+        # decorate Ve plot
+        subPlotV.set_title('Box plot of calculated Ve')
+        subPlotV.set_xlabel('In each column, each box plot denotes Ktrans = ' + str(referValueK) + ' respectively')
+        subPlotV.set_ylabel('Calculated values in patches')
+
+        subPlotV.xaxis.set_major_formatter(ticker.NullFormatter())
+        subPlotV.xaxis.set_minor_locator(ticker.FixedLocator([nrOfRows * j + (nrOfRows + 1) / 2.0 for j in range(nrOfColumns)]))
+        subPlotV.xaxis.set_minor_formatter(ticker.FixedFormatter(['Ve = ' + str(value) for value in referValueV]))
+        for j in range(nrOfColumns):
+            subPlotV.axvline(x = nrOfRows * j + 0.5, color = 'green', linestyle = 'dashed')
+    else:
+        boxStatsR1 = PatchBoxStats(model.R1_cal, nrOfRows, nrOfColumns)
+        subPlot_R1 = figure.add_subplot(1, 1, 1)
+        PlotBoxes(subPlot_R1, [boxStatsR1[i][j] for j in range(nrOfColumns) for i in range(nrOfRows)])
+
+        # decorate R1 plot
+        subPlot_R1.set_title('Box plot of R1 from calculated T1')
+        subPlot_R1.set_xlabel('The result shows the R1 patches from calculated T1, concatenated in columns')
+        subPlot_R1.set_ylabel('Calculated values in patches')
+
+        subPlot_R1.xaxis.set_major_formatter(ticker.NullFormatter())
+        subPlot_R1.xaxis.set_minor_locator(ticker.FixedLocator([nrOfRows * j + (nrOfRows + 1) / 2.0 for j in range(nrOfColumns)]))
+        subPlot_R1.xaxis.set_minor_formatter(ticker.FixedFormatter(model.headersHorizontal))
+        for j in range(nrOfColumns):
+            subPlot_R1.axvline(x = nrOfRows * j + 0.5, color = 'green', linestyle = 'dashed')
+    figure.tight_layout()
+
+def GetResultInHtml(model, mode, figurePaths):
+    '''
+    render the figures and the result tables of the evaluated model into html, for exporting to pdf. figurePaths are the paths of the saved figures by name:
+    'maps', 'scatters', 'hist_K', 'hist_V', 'LoA_K', 'LoA_V' and 'boxplot' for GKM, 'maps', 'scatters', 'histogram' and 'boxplot' for T1.
+    '''
+    htmlContent = ''
+    if mode == 'GKM':
+        htmlContent += model.packInHtml('<h1 align="center">QIBA DRO Evaluation Tool Results Report<br>(Ktrans-Ve)</h1>')
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The image view of calculated Ktrans and Ve</h2>''' +\
+        '''<img src="''' + figurePaths['maps'] + '''" style="width:100%"> <br>'''+\
+        '''<p><font face="verdana">* The first column shows the calculated Ktrans and Ve in black and white. You can have a general impression of the value distribution according to the changing of the parameters. Generally the brighter the pixel is, the higher the calculated value is.<br>
+        <br>The Second column shows the error map between calculated and reference data. Each pixel is the result of corresponding pixel in calculated data being subtracted with that in the reference data. Generally the more the color approaches to the red direction, the larger the error is.<br>
+        <br>The third column shows the normalized error. This is out of the consideration that the error could be related with the original value itself. Therefore normalized error may give a more uniformed standard of the error level. Each pixel's value comes from the division of the error by the reference pixel value. Similarly as the error map, the more the color approaches to the red direction, the larger the normalized error is.
+        </p>''' )
+
+        htmlContent += model.packInHtml( '''
+        <h2 align="center">The scatter plots of calculated Ktrans and Ve</h2>
+        <img src="''' + figurePaths['scatters'] + '''" style="width:100%"> <br>'''+\
+        '''<p><font face="verdana">* For the reference data, the pixel values in one row (for Ktrans) or column (for Ve) share the same constant value. Therefore in the scatter plot it shows that all green dots of a row (or column) overlap to each other. For the calculated data, as they share the same parameter, the blue dots align to the same x-axis. But they may scatter vertically, showing there's variance of the value in a row (or column).<br>
+        <br>From these plots you can see the trend of the values, which offer some information of which model (e.g. linear or logarithmic) the calculated parameter may fit. For example, with the artificial calculated data which were generated from the reference data by adding Gaussian noise, scaling by two and adding 0.5, it can be easily read from the plots that the calculated data follow the linear model, and have scaling factor and extra bias value.
+        </p>''' )
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The histograms of calculated Ktrans and Ve</h2>
+        <img src="''' + figurePaths['hist_K'] + '''" style="width:50%" align="left">''' + '''
+        <img src="''' + figurePaths['hist_V'] + '''" style="width:50%" align="right"> <br>'''+\
+        '''<p><font face="verdana">* All histograms have the uniformed y-axis limits, so that the comparison among different patched is easier.  The minimum and maximum values of a patch are denoted on the x-axis for reference.
+        </p>''')
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The Bland-Altman plots of calculated Ktrans and Ve</h2>
+        <img src="''' + figurePaths['LoA_K'] + '''" style="width:50%" align="left">''' + '''
+        <img src="''' + figurePaths['LoA_V'] + '''" style="width:50%" align="right"> <br>'''+\
+        '''<p><font face="verdana">* Each dot is a pixel of a patch, showing the difference between the calculated and the reference value against their mean. The green solid line denotes the mean difference, and the red dash lines denote the limits of agreement (the mean difference plus and minus 1.96 times the standard deviation of the difference). The median of the means is denoted on the x-axis for reference.
+        </p>''')
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The box plots of calculated Ktrans and Ve</h2>
+        <img src="''' + figurePaths['boxplot'] + '''" style="width:100%"> <br>'''+\
+        '''<p><font face="verdana">* The vertical dash lines are used to separate the rows (or columns), as each box plot is responsible for one patch. From these plots you could see (roughly) the statistics of each patch, like the mean value, the 1st and 3rd quartile, the minimum and maximum value. The more precise value of those statistics could be found in the tab "Result in HTML viewer".
+        </p>''')
+
+        sections = ['NaNPercentageInHTML', 'StatisticsInHTML', 'covCorrResultsInHtml', 'CCCResultInHTML', 'RMSResultInHTML', 'TDIResultInHTML',
+                    'ModelFittingInHtml', 'T_testResultInHTML', 'U_testResultInHTML', 'Chiq_testResultInHTML', 'ANOVAResultInHTML']
+    else:
+        htmlContent += model.packInHtml('<h1 align="center">QIBA DRO Evaluation Tool Results Report<br>(T1)</h1>')
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The image view of calculated T1</h2>''' +\
+        '''<img src="''' + figurePaths['maps'] + '''" style="width:100%"> <br>'''+\
+        '''<p><font face="verdana">* The first row shows the calculated T1 in black and white. You can have a general impression of the value distribution according to the changing of the parameters. Generally the brighter the pixel is, the higher the calculated value is.<br>
+        <br>The Second row shows the error map between calculated and reference data. Each pixel is the result of corresponding pixel in calculated data being subtracted with that in the reference data. Generally the more the color approaches to the red direction, the larger the error is.<br>
+        <br>The third row shows the normalized error. This is out of the consideration that the error could be related with the original value itself. Therefore normalized error may give a more uniformed standard of the error level. Each pixel's value comes from the division of the error by the reference pixel value. Similarly as the error map, the more the color approaches to the red direction, the larger the normalized error is.
+        </p>''' )
+
+        htmlContent += model.packInHtml( '''
+        <h2 align="center">The scatter plots of calculated T1</h2>
+        <img src="''' + figurePaths['scatters'] + '''" style="width:100%"> <br>'''+\
+        '''<p><font face="verdana">* For the reference data, the pixel values in rows contains different values(details please refer to the file description). Therefore in the scatter plot it shows that all green dots of a row (or column) overlap to each other. For the calculated data, as they share the same parameter, the blue dots align to the same x-axis. But they may scatter vertically, showing there's variance of the value in a row (or column).<br>
+        <br>From these plots you can see the trend of the values, which offer some information of which model (e.g. linear or logarithmic) the calculated parameter may fit. For example, with the artificial calculated data which were generated from the reference data by adding Gaussian noise, scaling by two and adding 0.5, it can be easily read from the plots that the calculated data follow the linear model, and have scaling factor and extra bias value.
+        </p>''' )
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The histograms of calculated T1</h2>
+        <img src="''' + figurePaths['histogram'] + '''" style="width:100%" align="right"> <br>'''+\
+        '''<p><font face="verdana">* All histograms have the uniformed y-axis limits, so that the comparison among different patched is easier.  The minimum and maximum values of a patch are denoted on the x-axis for reference.
+        </p>''')
+
+        htmlContent += model.packInHtml('''
+        <h2 align="center">The box plots of calculated T1</h2>
+        <img src="''' + figurePaths['boxplot'] + '''" style="width:100%"> <br>'''+\
+        '''<p><font face="verdana">* The vertical dash lines are used to separate the rows (or columns), as each box plot is responsible for one patch. From these plots you could see (roughly) the statistics of each patch, like the mean value, the 1st and 3rd quartile, the minimum and maximum value. The more precise value of those statistics could be found in the tab "Result in HTML viewer".
+        </p>''')
+
+        sections = ['NaNPercentageInHTML', 'StatisticsInHTML', 'covCorrResultsInHtml', 'CCCResultInHTML', 'ModelFittingInHtml',
+                    'T_testResultInHTML', 'U_testResultInHTML', 'ChiSquareTestResultInHTML']
+
+    # the result tables of the metrics which are not evaluated are left out
+    for section in sections:
+        htmlContent += getattr(model, section, '')
+    return htmlContent
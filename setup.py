@@ -42,7 +42,7 @@ msi_data = {"Shortcut": shortcut_table}
 bdist_msi_options = {'data': msi_data, "upgrade_code": "{96a85bac-52af-4019-9e94-3afcc9e1ad0c}"}
 
 # Declare the packages that will be loaded in the main script, and the files that should be packed with the installer
-build_exe_options = {"packages": ["os", "platform", "wx", "dicom", "pylab","numpy","scipy","matplotlib", "time", "struct", "subprocess", "QIBA_functions", "QIBA_model", "xlwt"],
+build_exe_options = {"packages": ["os", "platform", "wx", "dicom", "pylab","numpy","scipy","matplotlib", "time", "multiprocessing", "subprocess", "QIBA_functions", "QIBA_model", "QIBA_report", "QIBA_cache", "QIBA_batch", "QIBA_database", "sqlite3", "xlwt"],
 		"excludes": ["tkinter"],
 		'include_files': ["reference_data", "calculated_data", "splashImage_small.jpg", "logo.ico", "temp", "tools"]}
 
@@ -57,7 +57,8 @@ setup(  name = "QIBA evaluate tool",
         description = "QIBA evaluate tool",
         options = {"build_exe": build_exe_options,
 					"bdist_msi": bdist_msi_options},
-        executables = [Executable(script="QIBA_evaluate_tool.py", icon="logo.ico", base=base)]
+        executables = [Executable(script="QIBA_evaluate_tool.py", icon="logo.ico", base=base),
+					Executable(script="QIBA_batch.py", icon="logo.ico", base=None)] # the batch evaluation runs in the console
 	 )
 			
 			